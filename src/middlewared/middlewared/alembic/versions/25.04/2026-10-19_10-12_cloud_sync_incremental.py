@@ -0,0 +1,26 @@
+"""Cloud sync incremental mode
+
+Revision ID: bd687a3f45e0
+Revises: 2b59607575b8
+Create Date: 2026-10-19 10:12:41.302117+00:00
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = 'bd687a3f45e0'
+down_revision = '2b59607575b8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('tasks_cloudsync', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('incremental', sa.Boolean(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('incremental_full_interval', sa.Integer(), nullable=False, server_default='10'))
+        batch_op.add_column(sa.Column('incremental_state', sa.Text(), nullable=False, server_default='{}'))
+
+
+def downgrade():
+    pass
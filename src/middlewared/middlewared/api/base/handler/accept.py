@@ -1,3 +1,5 @@
+import functools
+
 from pydantic_core import ValidationError
 
 from middlewared.api.base.model import BaseModel
@@ -22,13 +24,26 @@ def accept_params(model: type[BaseModel], args: list, *, exclude_unset=False, ex
 
     dump = validate_model(model, args_as_dict, exclude_unset=exclude_unset, expose_secrets=expose_secrets)
 
-    fields = list(model.model_fields)
+    fields = model_field_names(model)
     if exclude_unset:
         fields = fields[:len(args)]
 
     return [dump[field] for field in fields]
 
 
+@functools.cache
+def model_field_names(model: type[BaseModel]) -> tuple[str, ...]:
+    """
+    Returns the names of the `model` fields in the order they are defined.
+
+    Models are immutable once defined, so the result is computed once per model and reused for every method call.
+
+    :param model: `BaseModel` subclass.
+    :return: a tuple of field names.
+    """
+    return tuple(model.model_fields.keys())
+
+
 def model_dict_from_list(model: type[BaseModel], args: list) -> dict:
     """
     Converts a list of `args` for a method call to a dictionary using `model`.
@@ -42,13 +57,11 @@ def model_dict_from_list(model: type[BaseModel], args: list) -> dict:
     :param args: a list of method args.
     :return: a dictionary of method args.
     """
-    if len(args) > len(model.model_fields):
-        raise CallError(f"Too many arguments (expected {len(model.model_fields)}, found {len(args)})")
+    fields = model_field_names(model)
+    if len(args) > len(fields):
+        raise CallError(f"Too many arguments (expected {len(fields)}, found {len(args)})")
 
-    return {
-        field: value
-        for field, value in zip(model.model_fields.keys(), args)
-    }
+    return dict(zip(fields, args))
 
 
 def validate_model(model: type[BaseModel], data: dict, *, exclude_unset=False, expose_secrets=True) -> dict:
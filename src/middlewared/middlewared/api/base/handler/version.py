@@ -1,7 +1,8 @@
+from dataclasses import dataclass
 import enum
-import functools
 from types import ModuleType
-from typing import Callable
+
+from pydantic.fields import FieldInfo
 
 from middlewared.api.base import BaseModel, ForUpdateMetaclass
 from .accept import validate_model
@@ -60,9 +61,39 @@ class APIVersion:
         return f"<APIVersion {self.version}>"
 
 
+@dataclass(slots=True)
+class ModelAdaptPlan:
+    """
+    Precomputed introspection results used to adapt a value from `current_model` to `new_model`.
+    """
+    current_model: type[BaseModel]
+    new_model: type[BaseModel]
+    nested_models: dict[str, tuple[type[BaseModel], type[BaseModel]]]
+    """Fields that are present in both models and contain compatible nested models."""
+    nested_lists_of_models: dict[str, tuple[type[BaseModel], type[BaseModel]]]
+    """Fields that are present in both models and contain compatible lists of nested models."""
+    defaults: list[tuple[str, FieldInfo]]
+    """Optional `new_model` fields which default values must be filled in."""
+    removed: list[str]
+    """`current_model` fields that do not exist in `new_model`."""
+
+
+@dataclass(slots=True)
+class ConversionPlan:
+    """
+    A list of steps required to convert a value of a specific model between two API versions.
+    """
+    model: type[BaseModel]
+    direction: Direction
+    steps: list[ModelAdaptPlan]
+
+
 class APIVersionsAdapter:
     """
     Converts method parameters and return results between different API versions.
+
+    Model introspection results are cached per `(model name, source version, target version)` so that adapting
+    legacy API calls only costs validation and the actual conversion.
     """
 
     def __init__(self, versions: list[APIVersion]):
@@ -72,6 +103,8 @@ class APIVersionsAdapter:
         self.versions: dict[str, APIVersion] = {version.version: version for version in versions}
         self.versions_history: list[str] = list(self.versions.keys())
         self.current_version: str = self.versions_history[-1]
+        self.conversion_plans: dict[tuple[str, str, str], ConversionPlan] = {}
+        self.model_adapt_plans: dict[tuple[type[BaseModel], type[BaseModel]], ModelAdaptPlan] = {}
 
     def adapt(self, value: dict, model_name: str, version1: str, version2: str) -> dict:
         """
@@ -84,6 +117,25 @@ class APIVersionsAdapter:
         :param version2: target API version that needs `value`
         :return: converted value
         """
+        plan = self.conversion_plan(model_name, version1, version2)
+
+        value = validate_model(plan.model, value)
+        for step in plan.steps:
+            value = self._adapt_value(value, step, plan.direction)
+
+        return value
+
+    def conversion_plan(self, model_name: str, version1: str, version2: str) -> ConversionPlan:
+        """
+        Returns (and caches) the `ConversionPlan` to convert a model identified by `model_name` from API `version1`
+        to API `version2`.
+        """
+        key = (model_name, version1, version2)
+        try:
+            return self.conversion_plans[key]
+        except KeyError:
+            pass
+
         try:
             version1_index = self.versions_history.index(version1)
         except ValueError:
@@ -94,14 +146,6 @@ class APIVersionsAdapter:
         except ValueError:
             raise APIVersionDoesNotExistException(version2) from None
 
-        current_version = self.versions[version1]
-        try:
-            current_version_model = current_version.models[model_name]
-        except KeyError:
-            raise APIVersionDoesNotContainModelException(current_version.version, model_name)
-
-        value_factory = functools.partial(validate_model, current_version_model, value)
-
         if version1_index < version2_index:
             step = 1
             direction = Direction.UPGRADE
@@ -109,71 +153,94 @@ class APIVersionsAdapter:
             step = -1
             direction = Direction.DOWNGRADE
 
-        for version_index in range(version1_index + step, version2_index + step, step):
-            new_version = self.versions[self.versions_history[version_index]]
-
-            value_factory = functools.partial(
-                self._adapt_model, value_factory, model_name, current_version, new_version, direction,
-            )
-
-            current_version = new_version
-
-        return value_factory()
-
-    def _adapt_model(self, value_factory: Callable[[], dict], model_name: str, current_version: APIVersion,
-                     new_version: APIVersion, direction: Direction):
-        try:
-            current_model = current_version.models[model_name]
-        except KeyError:
-            raise APIVersionDoesNotContainModelException(current_version.version, model_name) from None
+        versions = [
+            self.versions[self.versions_history[version_index]]
+            for version_index in range(version1_index, version2_index + step, step)
+        ]
+        models = []
+        for version in versions:
+            try:
+                models.append(version.models[model_name])
+            except KeyError:
+                raise APIVersionDoesNotContainModelException(version.version, model_name) from None
+
+        plan = ConversionPlan(
+            models[0],
+            direction,
+            [
+                self._model_adapt_plan(current_model, new_model)
+                for current_model, new_model in zip(models, models[1:])
+            ],
+        )
+        self.conversion_plans[key] = plan
+        return plan
 
+    def _model_adapt_plan(self, current_model: type[BaseModel], new_model: type[BaseModel]) -> ModelAdaptPlan:
+        key = (current_model, new_model)
         try:
-            new_model = new_version.models[model_name]
+            return self.model_adapt_plans[key]
         except KeyError:
-            raise APIVersionDoesNotContainModelException(new_version.version, model_name) from None
+            pass
+
+        nested_models = {}
+        nested_lists_of_models = {}
+        for k, current_model_field in current_model.model_fields.items():
+            if k not in new_model.model_fields:
+                continue
+
+            current_model_field = current_model_field.annotation
+            new_model_field = new_model.model_fields[k].annotation
+            if (
+                (current_nested_model := model_field_is_model(current_model_field)) and
+                (new_nested_model := model_field_is_model(new_model_field)) and
+                current_nested_model.__class__.__name__ == new_nested_model.__class__.__name__
+            ):
+                nested_models[k] = (current_nested_model, new_nested_model)
+            if (
+                (current_nested_model := model_field_is_list_of_models(current_model_field)) and
+                (current_nested_model := model_field_is_model(current_nested_model)) and
+                (new_nested_model := model_field_is_list_of_models(new_model_field)) and
+                (new_nested_model := model_field_is_model(new_nested_model)) and
+                current_nested_model.__class__.__name__ == new_nested_model.__class__.__name__
+            ):
+                nested_lists_of_models[k] = (current_nested_model, new_nested_model)
 
-        return self._adapt_value(value_factory(), current_model, new_model, direction)
+        if new_model.__class__ is not ForUpdateMetaclass:
+            defaults = [(k, field) for k, field in new_model.model_fields.items() if not field.is_required()]
+        else:
+            defaults = []
+
+        plan = ModelAdaptPlan(
+            current_model,
+            new_model,
+            nested_models,
+            nested_lists_of_models,
+            defaults,
+            [k for k in current_model.model_fields if k not in new_model.model_fields],
+        )
+        self.model_adapt_plans[key] = plan
+        return plan
 
-    def _adapt_value(self, value: dict, current_model: type[BaseModel], new_model: type[BaseModel],
-                     direction: Direction):
+    def _adapt_value(self, value: dict, plan: ModelAdaptPlan, direction: Direction):
         for k in value:
-            if k in current_model.model_fields and k in new_model.model_fields:
-                current_model_field = current_model.model_fields[k].annotation
-                new_model_field = new_model.model_fields[k].annotation
-                if (
-                    isinstance(value[k], dict) and
-                    (current_nested_model := model_field_is_model(current_model_field)) and
-                    (new_nested_model := model_field_is_model(new_model_field)) and
-                    current_nested_model.__class__.__name__ == new_nested_model.__class__.__name__
-                ):
-                    value[k] = self._adapt_value(value[k], current_nested_model, new_nested_model, direction)
-                elif (
-                    isinstance(value[k], list) and
-                    (current_nested_model := model_field_is_list_of_models(current_model_field)) and
-                    (current_nested_model := model_field_is_model(current_nested_model)) and
-                    (new_nested_model := model_field_is_list_of_models(new_model_field)) and
-                    (new_nested_model := model_field_is_model(new_nested_model)) and
-                    current_nested_model.__class__.__name__ == new_nested_model.__class__.__name__
-                ):
-                    value[k] = [
-                        self._adapt_value(v, current_nested_model, new_nested_model, direction)
-                        for v in value[k]
-                    ]
+            if isinstance(value[k], dict) and (nested := plan.nested_models.get(k)):
+                value[k] = self._adapt_value(value[k], self._model_adapt_plan(*nested), direction)
+            elif isinstance(value[k], list) and (nested := plan.nested_lists_of_models.get(k)):
+                nested_plan = self._model_adapt_plan(*nested)
+                value[k] = [self._adapt_value(v, nested_plan, direction) for v in value[k]]
 
-        if new_model.__class__ is not ForUpdateMetaclass:
-            for k, field in new_model.model_fields.items():
-                if k not in value and not field.is_required():
-                    value[k] = field.get_default()
+        for k, field in plan.defaults:
+            if k not in value:
+                value[k] = field.get_default()
 
         match direction:
             case Direction.DOWNGRADE:
-                value = current_model.to_previous(value)
+                value = plan.current_model.to_previous(value)
             case Direction.UPGRADE:
-                value = new_model.from_previous(value)
+                value = plan.new_model.from_previous(value)
 
-        for k in list(value):
-            if k in current_model.model_fields and k not in new_model.model_fields:
-                value.pop(k)
+        for k in plan.removed:
+            value.pop(k, None)
 
         for k, v in list(value.items()):
             if isinstance(v, Undefined):
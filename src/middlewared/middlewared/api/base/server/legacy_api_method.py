@@ -1,6 +1,6 @@
 from typing import TYPE_CHECKING
 
-from middlewared.api.base.handler.accept import model_dict_from_list
+from middlewared.api.base.handler.accept import model_dict_from_list, model_field_names
 from middlewared.api.base.handler.dump_params import dump_params
 from middlewared.api.base.handler.version import APIVersionsAdapter, APIVersionDoesNotContainModelException
 from middlewared.api.base.server.method import Method
@@ -42,6 +42,8 @@ class LegacyAPIMethod(Method):
             self.accepts_model = None
             self.returns_model = None
 
+        self._legacy_accepts_model = None
+
     async def call(self, app: "RpcWebSocketApp", params):
         if self.accepts_model:
             return self._adapt_result(await super().call(app, self._adapt_params(params)))
@@ -49,15 +51,18 @@ class LegacyAPIMethod(Method):
         return await super().call(app, params)
 
     def _adapt_params(self, params):
-        try:
-            legacy_accepts_model = self.adapter.versions[self.api_version].models[self.accepts_model.__name__]
-        except KeyError:
-            if self.passthrough_nonexistent_methods:
-                return params
+        if (legacy_accepts_model := self._legacy_accepts_model) is None:
+            try:
+                legacy_accepts_model = self.adapter.versions[self.api_version].models[self.accepts_model.__name__]
+            except KeyError:
+                if self.passthrough_nonexistent_methods:
+                    return params
+
+                # The legacy API does not contain signature definition for this method, which means it didn't exist
+                # when that API was released.
+                raise MethodNotFoundError(*self.name.rsplit(".", 1))
 
-            # The legacy API does not contain signature definition for this method, which means it didn't exist
-            # when that API was released.
-            raise MethodNotFoundError(*self.name.rsplit(".", 1))
+            self._legacy_accepts_model = legacy_accepts_model
 
         params_dict = model_dict_from_list(legacy_accepts_model, params)
 
@@ -68,7 +73,7 @@ class LegacyAPIMethod(Method):
             self.adapter.current_version,
         )
 
-        return [adapted_params_dict[field] for field in self.accepts_model.model_fields]
+        return [adapted_params_dict[field] for field in model_field_names(self.accepts_model)]
 
     def _adapt_result(self, result):
         try:
@@ -3,6 +3,7 @@ import binascii
 from collections import defaultdict
 import enum
 import errno
+import functools
 import pickle
 import sys
 import traceback
@@ -15,6 +16,7 @@ import jsonschema
 from truenas_api_client import json
 from truenas_api_client.jsonrpc import JSONRPCError
 
+from middlewared.job import JobEventsCoalescer
 from middlewared.schema import Error
 from middlewared.service_exception import (CallException, CallError, ValidationError, ValidationErrors, adapt_exception,
                                            get_errname)
@@ -59,6 +61,7 @@ class RpcWebSocketApp(App):
         self.softhardsemaphore = SoftHardSemaphore(10, 20)
         self.callbacks = defaultdict(list)
         self.subscriptions = {}
+        self.job_events = None
 
     def send(self, data):
         asyncio.run_coroutine_threadsafe(self.ws.send_str(json.dumps(data)), self.middleware.loop)
@@ -158,6 +161,13 @@ class RpcWebSocketApp(App):
         ):
             return
 
+        if name == "core.get_jobs" and self.job_events is not None:
+            self.job_events.send_event(event_type, **kwargs)
+            return
+
+        self.send_event_message(name, event_type, **kwargs)
+
+    def send_event_message(self, name: str, event_type: str, **kwargs):
         event = {
             "msg": event_type.lower(),
             "collection": name,
@@ -173,6 +183,23 @@ class RpcWebSocketApp(App):
 
         self.send_notification("collection_update", event)
 
+    def configure_job_events(self, *, interval: float, delta: bool):
+        """
+        Set up `core.get_jobs` events coalescing for this connection (see `JobEventsCoalescer`).
+        """
+        if self.job_events is not None:
+            self.job_events.close()
+
+        if interval or delta:
+            self.job_events = JobEventsCoalescer(
+                self.middleware.loop,
+                functools.partial(self.send_event_message, "core.get_jobs"),
+                interval=interval,
+                delta=delta,
+            )
+        else:
+            self.job_events = None
+
     def notify_unsubscribed(self, collection: str, error: Exception | None):
         params = {"collection": collection, "error": None}
         if error:
@@ -257,6 +284,9 @@ class RpcWebSocketHandler(BaseWebSocketHandler):
         finally:
             await app.run_callback(RpcWebSocketAppEvent.CLOSE)
 
+            if app.job_events is not None:
+                app.job_events.close()
+
             await self.middleware.event_source_manager.unsubscribe_app(app)
 
             self.middleware.unregister_wsclient(app)
@@ -242,6 +242,7 @@ class FilesystemSetAclOptions(BaseModel):
     traverse: bool = False
     canonicalize: bool = True
     validate_effective_acl: bool = True
+    skip_unchanged: bool = False
 
 
 @single_argument_args('filesystem_acl')
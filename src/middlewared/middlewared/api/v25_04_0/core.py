@@ -1,4 +1,6 @@
-from typing import Literal
+from typing import Annotated, Literal
+
+from pydantic import Field
 
 from middlewared.api.base import BaseModel, ForUpdateMetaclass, single_argument_result
 
@@ -24,6 +26,12 @@ class CorePingResult(BaseModel):
 
 class CoreSetOptionsOptions(BaseModel, metaclass=ForUpdateMetaclass):
     py_exceptions: bool
+    job_events_coalesce_interval: Annotated[float, Field(ge=0, le=60)]
+    """Send at most one `core.get_jobs` `CHANGED` event per job every this number of seconds. Job state changes are
+    always sent immediately. `0` disables coalescing."""
+    job_events_delta: bool
+    """`core.get_jobs` `CHANGED` events will only contain job `id` and the fields that have changed since the
+    previous event."""
 
 
 class CoreSetOptionsArgs(BaseModel):
@@ -1,10 +1,13 @@
 import asyncio
+import collections
 import contextlib
-from collections import OrderedDict
+from collections import defaultdict, OrderedDict
 import copy
 import enum
 import errno
 from functools import partial
+import heapq
+import itertools
 import logging
 import os
 import shutil
@@ -36,6 +39,126 @@ def should_send_job_event(job, wsclient):
     return True
 
 
+class JobEventsCoalescer:
+    """
+    Throttles `core.get_jobs` events sent to a single subscriber.
+
+    At most one `CHANGED` event per job is sent every `interval` seconds, the intermediate updates are merged into
+    the next event. Events that change the job state are never delayed, so the subscriber observes every state
+    transition in order.
+
+    If `delta` is `True` then `CHANGED` events only contain the job `id` and the fields that have changed since the
+    previous event sent to this subscriber.
+    """
+
+    def __init__(self, loop, send, *, interval=0, delta=False, max_jobs=1000):
+        self.loop = loop
+        self.send = send
+        self.interval = interval
+        self.delta = delta
+        # How many jobs to remember the last sent fields for (older jobs will receive full `CHANGED` events)
+        self.max_jobs = max_jobs
+        self.lock = threading.Lock()
+        # job id => (time sent, fields)
+        self.sent = OrderedDict()
+        # job id => (fields, kwargs)
+        self.pending = {}
+        self.flush_scheduled = False
+        self.closed = False
+
+    def send_event(self, event_type, id=None, fields=None, **kwargs):
+        with self.lock:
+            if self.closed:
+                return
+
+            if event_type != 'CHANGED' or id is None or fields is None:
+                self.pending.pop(id, None)
+                if event_type == 'REMOVED':
+                    self.sent.pop(id, None)
+                elif fields is not None:
+                    fields = self._snapshot(fields)
+                    self._remember(id, time.monotonic(), fields)
+
+                self._send(event_type, id, fields, kwargs)
+                return
+
+            fields = self._snapshot(fields)
+            now = time.monotonic()
+            sent = self.sent.get(id)
+            if sent is None or sent[0] + self.interval <= now or sent[1].get('state') != fields.get('state'):
+                self.pending.pop(id, None)
+                self._send_changed(id, fields, kwargs, now)
+            else:
+                self.pending[id] = (fields, kwargs)
+                self._schedule_flush(sent[0] + self.interval - now)
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+            self.pending.clear()
+            self.sent.clear()
+
+    def _snapshot(self, fields):
+        # `progress` is updated in-place by the job so we need to copy it in order to compare it later
+        fields = fields.copy()
+        if isinstance(fields.get('progress'), dict):
+            fields['progress'] = fields['progress'].copy()
+
+        return fields
+
+    def _remember(self, id_, now, fields):
+        self.sent[id_] = (now, fields)
+        self.sent.move_to_end(id_)
+        while len(self.sent) > self.max_jobs:
+            self.sent.popitem(last=False)
+
+    def _send_changed(self, id_, fields, kwargs, now):
+        event_fields = fields
+        if self.delta and (sent := self.sent.get(id_)) is not None:
+            event_fields = {k: v for k, v in fields.items() if k == 'id' or k not in sent[1] or sent[1][k] != v}
+            if event_fields.keys() == {'id'} and not kwargs:
+                return
+
+        self._remember(id_, now, fields)
+        self._send('CHANGED', id_, event_fields, kwargs)
+
+    def _send(self, event_type, id_, fields, kwargs):
+        if id_ is not None:
+            kwargs = {'id': id_, **kwargs}
+        if fields is not None:
+            kwargs['fields'] = fields
+
+        try:
+            self.send(event_type, **kwargs)
+        except Exception:
+            logger.warning('Failed to send job event', exc_info=True)
+
+    def _schedule_flush(self, delay):
+        if not self.flush_scheduled:
+            self.flush_scheduled = True
+            self.loop.call_soon_threadsafe(self.loop.call_later, max(delay, 0), self._flush)
+
+    def _flush(self):
+        with self.lock:
+            self.flush_scheduled = False
+            if self.closed:
+                return
+
+            now = time.monotonic()
+            next_flush = None
+            for id_, (fields, kwargs) in list(self.pending.items()):
+                sent = self.sent.get(id_)
+                delay = 0 if sent is None else sent[0] + self.interval - now
+                if delay <= 0:
+                    del self.pending[id_]
+                    self._send_changed(id_, fields, kwargs, now)
+                elif next_flush is None or delay < next_flush:
+                    next_flush = delay
+
+            if next_flush is not None:
+                self._schedule_flush(next_flush)
+
+
 class State(enum.Enum):
     WAITING = 1
     RUNNING = 2
@@ -57,6 +180,8 @@ class JobSharedLock:
         self.name = name
         self.jobs = set()
         self.lock = asyncio.Lock()
+        # Jobs that use this lock and were not dispatched yet (in FIFO order)
+        self.waiting = collections.deque()
 
     def add_job(self, job):
         self.jobs.add(job)
@@ -82,11 +207,64 @@ class JobAccess(enum.Enum):
     ABORT = "ABORT"
 
 
+class JobsQueueMethodStats:
+    """
+    Scheduling statistics for a single job method.
+    """
+
+    __slots__ = ('waiting', 'running', 'dispatched', 'wait_time_last', 'wait_time_total', 'wait_time_max')
+
+    def __init__(self):
+        self.waiting = 0
+        self.running = 0
+        self.dispatched = 0
+        self.wait_time_last = 0.0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+
+    def dispatch(self, wait_time):
+        self.waiting -= 1
+        self.running += 1
+        self.dispatched += 1
+        self.wait_time_last = wait_time
+        self.wait_time_total += wait_time
+        self.wait_time_max = max(self.wait_time_max, wait_time)
+
+    def __encode__(self):
+        return {
+            'waiting': self.waiting,
+            'running': self.running,
+            'dispatched': self.dispatched,
+            'wait_time_last': self.wait_time_last,
+            'wait_time_avg': self.wait_time_total / self.dispatched if self.dispatched else 0.0,
+            'wait_time_max': self.wait_time_max,
+        }
+
+
 class JobsQueue:
-    def __init__(self, middleware):
+    """
+    Jobs scheduler.
+
+    Jobs that are ready to be dispatched are kept in a heap ordered by (priority, submission order). A job that uses
+    a lock only enters that heap when it is the first job waiting for that lock and the lock is free, all other jobs
+    wait in the lock's own FIFO queue. This way dispatching a job never requires rescanning all the queued jobs.
+
+    :param max_concurrency: Maximum number of jobs that are allowed to run at the same time. `None` means no limit.
+        Please beware that a job waiting for another job (i.e. `job.wrap(subjob)`) still counts as a running one.
+    """
+
+    def __init__(self, middleware, max_concurrency=None):
         self.middleware = middleware
         self.deque = JobsDeque()
-        self.queue = []
+        self.max_concurrency = max_concurrency
+
+        # Jobs that can be dispatched as soon as concurrency limits allow that
+        self.ready = []
+        # Jobs that can't be dispatched because their method has reached its `max_concurrency`
+        self.concurrency_blocked = defaultdict(collections.deque)
+        self.running = 0
+        self.stats = defaultdict(JobsQueueMethodStats)
+        self.sequence = itertools.count()
 
         # Event responsible for the job queue schedule loop.
         # This event is set and a new job is potentially ready to run
@@ -121,38 +299,47 @@ class JobsQueue:
 
     def add(self, job):
         self.handle_lock(job)
-        if job.options["lock_queue_size"] is not None:
+        if (lock := job.lock) is not None and job.options["lock_queue_size"] is not None:
             if job.options["lock_queue_size"] == 0:
-                for another_job in self.all().values():
-                    if another_job.state == State.RUNNING and another_job.lock is job.lock:
-                        raise CallError("This job is already being performed", errno.EBUSY)
-            else:
-                queued_jobs = [another_job for another_job in self.queue if another_job.lock is job.lock]
-                if len(queued_jobs) >= job.options["lock_queue_size"]:
-                    for queued_job in reversed(queued_jobs):
-                        if not credential_is_limited_to_own_jobs(job.credentials):
-                            return queued_job
-                        if (
-                            job.credentials.is_user_session and
-                            queued_job.credentials.is_user_session and
-                            job.credentials.user['username'] == queued_job.credentials.user['username']
-                        ):
-                            return queued_job
-
-                    raise CallError('This job is already being performed by another user', errno.EBUSY)
+                if lock.locked():
+                    self.discard_lock(job)
+                    raise CallError("This job is already being performed", errno.EBUSY)
+            elif len(lock.waiting) >= job.options["lock_queue_size"]:
+                self.discard_lock(job)
+                for queued_job in reversed(lock.waiting):
+                    if not credential_is_limited_to_own_jobs(job.credentials):
+                        return queued_job
+                    if (
+                        job.credentials.is_user_session and
+                        queued_job.credentials.is_user_session and
+                        job.credentials.user['username'] == queued_job.credentials.user['username']
+                    ):
+                        return queued_job
+
+                raise CallError('This job is already being performed by another user', errno.EBUSY)
 
         self.deque.add(job)
-        self.queue.append(job)
+        job.queue_sequence = next(self.sequence)
+        job.time_queued = time.monotonic()
+        self.stats[job.method_name].waiting += 1
+        if job.lock is None:
+            self.push_ready(job)
+        else:
+            job.lock.waiting.append(job)
+            if len(job.lock.waiting) == 1 and not job.lock.locked():
+                self.push_ready(job)
         send_job_event(self.middleware, 'ADDED', job, job.__encode__())
 
-        # A job has been added to the queue, let the queue scheduler run
-        self.queue_event.set()
-
         return job
 
     def remove(self, job_id):
         self.deque.remove(job_id)
 
+    def push_ready(self, job):
+        heapq.heappush(self.ready, (-job.options.get('priority', 0), job.queue_sequence, job))
+        # A job is ready to run, let the queue scheduler run
+        self.queue_event.set()
+
     def handle_lock(self, job):
         name = job.get_lock_name()
         if name is None:
@@ -166,6 +353,28 @@ class JobsQueue:
         lock.add_job(job)
         job.lock = lock
 
+    def discard_lock(self, job):
+        # Job was rejected before it was queued
+        lock = job.lock
+        lock.remove_job(job)
+        if len(lock.get_jobs()) == 0:
+            self.job_locks.pop(lock.name)
+
+        job.lock = None
+
+    def job_finished(self, job):
+        self.running -= 1
+        self.stats[job.method_name].running -= 1
+        if blocked := self.concurrency_blocked.get(job.method_name):
+            # One more job of this method can run now
+            self.push_ready(blocked.popleft())
+            if not blocked:
+                self.concurrency_blocked.pop(job.method_name)
+        elif self.max_concurrency is not None:
+            self.queue_event.set()
+
+        self.release_lock(job)
+
     def release_lock(self, job):
         lock = job.lock
         if job.lock is None:
@@ -177,10 +386,9 @@ class JobsQueue:
 
         if len(lock.get_jobs()) == 0:
             self.job_locks.pop(lock.name)
-
-        # Once a lock is released there could be another job in the queue
-        # waiting for the same lock
-        self.queue_event.set()
+        elif lock.waiting:
+            # Once a lock is released the next job waiting for the same lock can be dispatched
+            self.push_ready(lock.waiting[0])
 
     async def next(self):
         """
@@ -189,21 +397,22 @@ class JobsQueue:
         while True:
             # Awaits a new event to look for a job
             await self.queue_event.wait()
-            found = None
-            for job in self.queue:
-                # Get job in the queue if it has no lock or its not locked
-                if job.lock is None or not job.lock.locked():
-                    found = job
-                    if job.lock:
-                        await job.lock.acquire()
-                    break
-            if found:
-                # Unlocked job found to run
-                self.queue.remove(found)
-                # If there are no more jobs in the queue, clear the event
-                if len(self.queue) == 0:
-                    self.queue_event.clear()
-                return found
+
+            if self.ready and (self.max_concurrency is None or self.running < self.max_concurrency):
+                job = heapq.heappop(self.ready)[2]
+
+                max_concurrency = job.options.get('max_concurrency')
+                if max_concurrency is not None and self.stats[job.method_name].running >= max_concurrency:
+                    self.concurrency_blocked[job.method_name].append(job)
+                    continue
+
+                if job.lock:
+                    job.lock.waiting.popleft()
+                    await job.lock.acquire()
+
+                self.running += 1
+                self.stats[job.method_name].dispatch(time.monotonic() - job.time_queued)
+                return job
             else:
                 # No jobs available to run, clear the event
                 self.queue_event.clear()
@@ -216,6 +425,17 @@ class JobsQueue:
     async def receive(self, job, logs):
         await self.deque.receive(self.middleware, job, logs)
 
+    def get_stats(self):
+        """
+        Returns queue depth, running jobs count and queue wait time for every job method that was ever queued.
+        """
+        return {
+            'running': self.running,
+            'waiting': sum(stats.waiting for stats in self.stats.values()),
+            'max_concurrency': self.max_concurrency,
+            'methods': {method: stats.__encode__() for method, stats in self.stats.items()},
+        }
+
 
 class JobsDeque:
     """
@@ -293,6 +513,8 @@ class Job:
 
         self.id = None
         self.lock = None
+        self.queue_sequence = None
+        self.time_queued = None
         self.result = None
         self.error = None
         self.exception = None
@@ -317,6 +539,8 @@ class Job:
         self.logs_path = None
         self.logs_fd = None
         self.logs_excerpt = None
+        # Job arguments never change so there is no need to sanitize them every time the job is encoded
+        self.encoded_arguments = None
 
         if self.options["check_pipes"]:
             for pipe in self.options["pipes"]:
@@ -527,7 +751,7 @@ class Job:
             await self.__close_logs()
             await self.__close_pipes()
 
-            queue.release_lock(self)
+            queue.job_finished(self)
             self._finished.set()
             await self.call_on_finish_cb()
             send_job_event(self.middleware, 'CHANGED', self, self.__encode__())
@@ -643,10 +867,13 @@ class Job:
         else:
             result = None
 
+        if self.encoded_arguments is None:
+            self.encoded_arguments = self.middleware.dump_args(self.args, method=self.method)
+
         return {
             'id': self.id,
             'method': self.method_name,
-            'arguments': self.middleware.dump_args(self.args, method=self.method),
+            'arguments': self.encoded_arguments,
             'transient': self.options['transient'],
             'description': self.description,
             'abortable': self.options['abortable'],
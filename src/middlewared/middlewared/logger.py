@@ -1,10 +1,14 @@
+import copy
 import logging
 import logging.handlers
 import os
 import queue
+import threading
+import time
 import typing
 import warnings
 from .logging.console_formatter import ConsoleLogFormatter
+from .logging.json_formatter import JsonLogFormatter
 
 # markdown debug is also considered useless
 logging.getLogger('MARKDOWN').setLevel(logging.INFO)
@@ -57,6 +61,12 @@ LOGFILE = '/var/log/middlewared.log'
 NETDATA_API_LOGFILE = '/var/log/netdata_api.log'
 ZETTAREPL_LOGFILE = '/var/log/zettarepl.log'
 
+# Maximum number of records waiting to be written to a log file. Records that do not fit are dropped (and counted).
+LOG_QUEUE_SIZE = 10000
+# Each logger can log this many records per second on average with bursts of up to `LOG_RATE_LIMIT_BURST` records.
+LOG_RATE_LIMIT = 100
+LOG_RATE_LIMIT_BURST = 1000
+
 
 def trace(self, message, *args, **kws):
     if self.isEnabledFor(logging.TRACE):
@@ -67,6 +77,94 @@ logging.addLevelName(logging.TRACE, "TRACE")
 logging.Logger.trace = trace
 
 
+class LogRateLimiter:
+    """Token bucket rate limit for each logger name"""
+
+    def __init__(self, rate: float = LOG_RATE_LIMIT, burst: int = LOG_RATE_LIMIT_BURST):
+        self.rate = rate
+        self.burst = burst
+        self.lock = threading.Lock()
+        self.buckets = {}  # logger name -> [tokens, updated_at, suppressed]
+
+    def acquire(self, name: str) -> tuple[bool, int]:
+        """
+        Returns whether a record of logger `name` can be logged and, if so, how many of its records were suppressed
+        since the last one that was logged.
+        """
+        now = time.monotonic()
+        with self.lock:
+            if (bucket := self.buckets.get(name)) is None:
+                bucket = self.buckets[name] = [self.burst, now, 0]
+
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if bucket[0] < 1:
+                bucket[2] += 1
+                return False, 0
+
+            bucket[0] -= 1
+            suppressed, bucket[2] = bucket[2], 0
+            return True, suppressed
+
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """
+    `QueueHandler` with a bounded queue. When the listener can't keep up, records are dropped instead of blocking
+    the caller or growing memory usage, and the number of dropped records is logged once there is room again.
+    """
+
+    def __init__(self, maxsize: int = LOG_QUEUE_SIZE, rate_limiter: typing.Optional[LogRateLimiter] = None):
+        super().__init__(queue.Queue(maxsize))
+        self.rate_limiter = rate_limiter
+        self.dropped = 0
+
+    def emit(self, record):
+        # `Handler.handle` serializes `emit` calls so the counters don't need a lock of their own
+        try:
+            # Warnings and errors are never rate limited (and do not use up the tokens)
+            if self.rate_limiter is not None and record.levelno < logging.WARNING:
+                allowed, suppressed = self.rate_limiter.acquire(record.name)
+                if not allowed:
+                    return
+
+                if suppressed:
+                    self._notice(record.name, '%d messages were suppressed by rate limiting', suppressed)
+
+            if self.dropped and self._notice(
+                'middlewared.logger', '%d messages were dropped because the log queue was full', self.dropped,
+            ):
+                self.dropped = 0
+
+            # Do not spend time formatting records that are going to be dropped anyway
+            if self.queue.full() or not self._put(self.prepare(record)):
+                self.dropped += 1
+        except Exception:
+            self.handleError(record)
+
+    def prepare(self, record):
+        # Unlike `QueueHandler.prepare`, keep the traceback separate from the message so that the file formatter
+        # can output it as it sees fit
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = record.exc_text or logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def _notice(self, name, msg, *args):
+        return self._put(logging.LogRecord(name, logging.WARNING, __file__, 0, msg % args, None, None))
+
+    def _put(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            return False
+        else:
+            return True
+
+
 class Logger:
     """Pseudo-Class for Logger - Wrapper for logging module"""
     def __init__(
@@ -83,7 +181,8 @@ class Logger:
     def configure_logging(self, output_option: str):
         """
         Configure the log output to file or console.
-            `output_option` str: Default is `file`, can be set to `console`.
+            `output_option` str: Default is `file`, can be set to `console` or `json` (file output with each record
+            written as a JSON object).
         """
         if output_option.lower() == 'console':
             console_handler = logging.StreamHandler()
@@ -102,18 +201,23 @@ class Logger:
                 ('zettarepl', ZETTAREPL_LOGFILE,
                  '[%(asctime)s] %(levelname)-8s [%(threadName)s] [%(name)s] %(message)s'),
             ]:
-                self.setup_file_logger(name, filename, log_format)
+                self.setup_file_logger(name, filename, log_format, output_option.lower() == 'json')
 
         logging.root.setLevel(getattr(logging, self.debug_level))
 
-    def setup_file_logger(self, name: typing.Optional[str], filename: str, log_format: typing.Optional[str]):
+    def setup_file_logger(
+        self, name: typing.Optional[str], filename: str, log_format: typing.Optional[str], json: bool = False
+    ):
         # Use `QueueHandler` to avoid blocking IO in asyncio main loop
-        log_queue = queue.Queue()
-        queue_handler = logging.handlers.QueueHandler(log_queue)
+        # Rate limiting would get in the way of debugging with the most verbose log level
+        queue_handler = BoundedQueueHandler(rate_limiter=None if self.debug_level == 'TRACE' else LogRateLimiter())
         file_handler = logging.handlers.RotatingFileHandler(filename, 'a', 10485760, 5, 'utf-8')
         file_handler.setLevel(logging.DEBUG)
-        file_handler.setFormatter(logging.Formatter(log_format, '%Y/%m/%d %H:%M:%S'))
-        queue_listener = logging.handlers.QueueListener(log_queue, file_handler)
+        if json:
+            file_handler.setFormatter(JsonLogFormatter())
+        else:
+            file_handler.setFormatter(logging.Formatter(log_format, '%Y/%m/%d %H:%M:%S'))
+        queue_listener = logging.handlers.QueueListener(queue_handler.queue, file_handler)
         queue_listener.start()
         logging.getLogger(name).addHandler(queue_handler)
         if name is not None:
@@ -132,7 +236,7 @@ def setup_logging(name: str, debug_level: typing.Optional[str], log_handler: typ
     _logger = Logger(name, debug_level)
     _logger.getLogger()
 
-    if log_handler == 'console':
-        _logger.configure_logging('console')
+    if log_handler in ('console', 'json'):
+        _logger.configure_logging(log_handler)
     else:
         _logger.configure_logging('file')
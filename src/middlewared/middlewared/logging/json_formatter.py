@@ -0,0 +1,26 @@
+from datetime import datetime, timezone
+import json
+import logging
+
+
+class JsonLogFormatter(logging.Formatter):
+    """Format log records as single line JSON objects"""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'function': record.funcName,
+            'line': record.lineno,
+            'thread': record.threadName,
+            'message': record.getMessage(),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        if record.stack_info:
+            entry['stack'] = self.formatStack(record.stack_info)
+
+        return json.dumps(entry, default=repr)
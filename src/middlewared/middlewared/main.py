@@ -12,7 +12,7 @@ from .common.event_source.manager import EventSourceManager
 from .event import Events
 from .job import Job, JobsQueue, State
 from .pipe import Pipes, Pipe
-from .restful import parse_credentials, authenticate, create_application, copy_multipart_to_pipe, RESTfulAPI
+from .restful import parse_credentials, authenticate, create_application, RESTfulAPI
 from .role import ROLES, RoleManager
 from .schema import Error as SchemaError, OROperator
 import middlewared.service
@@ -26,8 +26,11 @@ from .utils.debug import get_frame_details, get_threads_stacks
 from .utils.limits import MsgSizeError, MsgSizeLimit, parse_message
 from .utils.lock import SoftHardSemaphore, SoftHardSemaphoreLimit
 from .utils.origin import ConnectionOrigin
+from .utils.periodic import PeriodicTaskScheduler
 from .utils.os import close_fds
-from .utils.plugins import LoadPluginsMixin
+from .utils.plugins import (
+    LoadPluginsMixin, plugin_setup_graph, plugin_setup_profile, process_pool_modules, run_plugin_setups,
+)
 from .utils.privilege import credential_has_full_admin
 from .utils.profile import profile_wrap
 from .utils.rate_limit.cache import RateLimitCache
@@ -277,6 +280,14 @@ class Application(RpcWebSocketApp):
             )[0] not in self.middleware.event_source_manager.event_sources
         ):
             return
+
+        if name == 'core.get_jobs' and self.job_events is not None:
+            self.job_events.send_event(event_type, **kwargs)
+            return
+
+        self.send_event_message(name, event_type, **kwargs)
+
+    def send_event_message(self, name, event_type, **kwargs):
         event = {
             'msg': event_type.lower(),
             'collection': name,
@@ -318,6 +329,9 @@ class Application(RpcWebSocketApp):
     async def on_close(self):
         await self.run_callback(RpcWebSocketAppEvent.CLOSE)
 
+        if self.job_events is not None:
+            self.job_events.close()
+
         await self.middleware.event_source_manager.unsubscribe_app(self)
 
         self.middleware.unregister_wsclient(self)
@@ -374,12 +388,49 @@ class Application(RpcWebSocketApp):
         pass
 
 
+class FileTransferStats:
+    """
+    Throughput statistics of file downloads or uploads.
+    """
+
+    __slots__ = ('transfers', 'failed', 'bytes', 'time', 'throughput_last', 'throughput_max')
+
+    def __init__(self):
+        self.transfers = 0
+        self.failed = 0
+        self.bytes = 0
+        self.time = 0.0
+        self.throughput_last = 0.0
+        self.throughput_max = 0.0
+
+    def add(self, size, duration, success=True):
+        self.transfers += 1
+        if not success:
+            self.failed += 1
+        self.bytes += size
+        self.time += duration
+        if duration > 0:
+            self.throughput_last = size / duration
+            self.throughput_max = max(self.throughput_max, self.throughput_last)
+
+    def __encode__(self):
+        return {
+            'transfers': self.transfers,
+            'failed': self.failed,
+            'bytes': self.bytes,
+            'throughput_last': self.throughput_last,
+            'throughput_avg': self.bytes / self.time if self.time else 0.0,
+            'throughput_max': self.throughput_max,
+        }
+
+
 class FileApplication(object):
 
     def __init__(self, middleware, loop):
         self.middleware = middleware
         self.loop = loop
         self.jobs = {}
+        self.stats = {'download': FileTransferStats(), 'upload': FileTransferStats()}
 
     def register_job(self, job_id, buffered):
         self.jobs[job_id] = self.middleware.loop.call_later(
@@ -442,6 +493,9 @@ class FileApplication(object):
             resp.set_status(410)
             return resp
 
+        if job.pipes.output.buffered:
+            return await self._download_file(request, job, filename)
+
         resp = web.StreamResponse(status=200, reason='OK', headers={
             'Content-Type': 'application/octet-stream',
             'Content-Disposition': f'attachment; filename="{filename}"',
@@ -449,22 +503,104 @@ class FileApplication(object):
         })
         await resp.prepare(request)
 
-        def do_copy():
-            while True:
-                read = job.pipes.output.r.read(1048576)
-                if read == b'':
-                    break
-                asyncio.run_coroutine_threadsafe(resp.write(read), loop=self.loop).result()
-
+        started_at = time.monotonic()
+        copied = 0
+        success = False
         try:
             await self._cleanup_cancel(job_id)
-            await self.middleware.run_in_thread(do_copy)
+            copied = await job.pipes.output.copy_to_response(resp)
+            success = True
         finally:
             await job.pipes.close()
+            self._add_stats('download', job_id, copied, time.monotonic() - started_at, success)
 
         await resp.drain()
         return resp
 
+    async def _download_file(self, request, job, filename):
+        """
+        Buffered job output is a regular file. It is sent with `sendfile` and range requests are supported, so an
+        interrupted download can be resumed until the job is cleaned up.
+        """
+        # Job output is only complete once the job has finished
+        await job.wait()
+
+        if job.id not in self.jobs:
+            # Job was cleaned up while it was running
+            resp = web.Response()
+            resp.set_status(410)
+            return resp
+
+        resp = web.StreamResponse(headers={
+            'Content-Type': 'application/octet-stream',
+            'Content-Disposition': f'attachment; filename="{filename}"',
+            'Accept-Ranges': 'bytes',
+        })
+        # Reopen the pipe's open file rather than its path so that the download is not affected by the job being
+        # cleaned up (and the file unlinked) meanwhile. Unlike a duplicate descriptor, this one has its own offset
+        # so concurrent (range) downloads do not interfere.
+        with open(f'/proc/self/fd/{job.pipes.output.r.fileno()}', 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            try:
+                http_range = request.http_range
+            except ValueError:
+                http_range = None
+            else:
+                start, stop = http_range.start, http_range.stop
+                if start is None and stop is None:
+                    http_range = None
+                elif start is not None and start < 0:
+                    # Suffix range, the last `-start` bytes
+                    start, stop = max(size + start, 0), size
+                else:
+                    start, stop = start or 0, size if stop is None else min(stop, size)
+
+            if http_range is None:
+                start, stop = 0, size
+            elif start >= stop:
+                resp.set_status(416)
+                resp.headers['Content-Range'] = f'bytes */{size}'
+                await resp.prepare(request)
+                await resp.write_eof()
+                return resp
+            else:
+                resp.set_status(206)
+                resp.headers['Content-Range'] = f'bytes {start}-{stop - 1}/{size}'
+
+            resp.content_length = stop - start
+            await resp.prepare(request)
+
+            started_at = time.monotonic()
+            success = False
+            try:
+                if request.method != 'HEAD':
+                    if request.transport is None:
+                        raise ConnectionResetError('Connection lost')
+
+                    await self.loop.sendfile(request.transport, f, start, stop - start)
+                success = True
+            finally:
+                self._add_stats('download', job.id, stop - start if success else 0, time.monotonic() - started_at,
+                                success)
+
+        await resp.write_eof()
+
+        if http_range is None and request.method != 'HEAD':
+            # The whole file was downloaded, there is nothing to resume
+            await self._cleanup_job(job.id)
+
+        return resp
+
+    def _add_stats(self, direction, job_id, size, duration, success):
+        self.stats[direction].add(size, duration, success)
+        self.middleware.logger.debug(
+            '%s of job %d %s: %d bytes in %.2f seconds (%.2f MiB/s)', direction.capitalize(), job_id,
+            'finished' if success else 'failed', size, duration, size / duration / 1048576 if duration else 0.0,
+        )
+
+    def get_stats(self):
+        return {direction: stats.__encode__() for direction, stats in self.stats.items()}
+
     async def upload(self, request):
         reader = await request.multipart()
 
@@ -530,7 +666,9 @@ class FileApplication(object):
                 await self.middleware.log_audit_message_for_method(data['method'], methodobj, data.get('params') or [],
                                                                    app, True, False, False)
                 raise web.HTTPForbidden()
-            await self.middleware.run_in_thread(copy_multipart_to_pipe, self.loop, filepart, job.pipes.input)
+            started_at = time.monotonic()
+            copied = await job.pipes.input.copy_from_multipart(filepart)
+            self._add_stats('upload', job.id, copied, time.monotonic() - started_at, True)
         except CallError as e:
             if e.errno == CallError.ENOMETHOD:
                 status_code = 422
@@ -897,6 +1035,7 @@ class Middleware(LoadPluginsMixin, ServiceCallMixin):
         self.runner = None
         self.__thread_id = threading.get_ident()
         multiprocessing.set_start_method('spawn')  # Spawn new processes for ProcessPool instead of forking
+        self.__procpool_modules = None
         self.__init_procpool()
         self.__wsclients = {}
         self.role_manager = RoleManager(ROLES)
@@ -910,10 +1049,13 @@ class Middleware(LoadPluginsMixin, ServiceCallMixin):
         self.__console_io = False if os.path.exists(self.CONSOLE_ONCE_PATH) else None
         self.__terminate_task = None
         self.jobs = JobsQueue(self)
+        self.periodic_tasks = PeriodicTaskScheduler(self)
         self.mocks: typing.Dict[str, list[tuple[list, typing.Callable]]] = defaultdict(list)
         self.tasks = set()
         self.api_versions = None
         self.api_versions_adapter = None
+        self.plugins_setups = []
+        self.plugins_setup_started_at = None
 
     def create_task(self, coro, *, name=None):
         task = self.loop.create_task(coro, name=name)
@@ -1004,9 +1146,10 @@ class Middleware(LoadPluginsMixin, ServiceCallMixin):
             mod_name = mod.__name__.split('.')
             setup_plugin = '.'.join(mod_name[mod_name.index('plugins') + 1:])
 
-            setup_funcs.append((setup_plugin, mod.setup))
+            setup_funcs.append((setup_plugin, mod.setup, getattr(mod, 'SETUP_DEPENDS', None)))
 
         def on_modules_loaded():
+            self.__procpool_modules = process_pool_modules(self.get_services().values())
             self._console_write('resolving plugins schemas')
 
         self._load_plugins(
@@ -1015,6 +1158,11 @@ class Middleware(LoadPluginsMixin, ServiceCallMixin):
             on_modules_loaded=on_modules_loaded,
         )
 
+        # Workers are spawned on demand so none of them have been started yet. Recreate the pool so that
+        # they only import plugins they actually need.
+        self.__procpool.shutdown(wait=False)
+        self.__init_procpool()
+
         for namespace, service in self.get_services().items():
             self.role_manager.register_method(f'{service._config.namespace}.config', ['READONLY_ADMIN'])
             self.role_manager.register_method(f'{service._config.namespace}.get_instance', ['READONLY_ADMIN'])
@@ -1064,105 +1212,71 @@ class Middleware(LoadPluginsMixin, ServiceCallMixin):
         return setup_funcs
 
     async def __plugins_setup(self, setup_funcs):
-
-        # TODO: Rework it when we have order defined for setup functions
-        def sort_key(plugin__function):
-            plugin, function = plugin__function
-
-            beginning = [
-                # Move uploaded config files to their appropriate locations
-                'config',
-                # Connect to the database
-                'datastore',
-                # Allow internal UNIX socket authentication for plugins that run in separate pools
-                'auth',
-                # We need to register all services because pseudo-services can still be used by plugins setup functions
-                'service',
-                # We need to run pwenc first to ensure we have secret setup to work for encrypted fields which
-                # might be used in the setup functions.
-                'pwenc',
-                # We run boot plugin first to ensure we are able to retrieve
-                # BOOT POOL during system plugin initialization
-                'boot',
-                # We need to run system plugin setup's function first because when system boots, the right
-                # timezone is not configured. See #72131
-                'system',
-                # Initialize mail before other plugins try to send e-mail messages
-                'mail',
-                # We also need to load alerts first because other plugins can issue one-shot alerts during their
-                # initialization
-                'alert',
-                # Migrate users and groups ASAP
-                'account',
-                # Replication plugin needs to be initialized before zettarepl in order to register network activity
-                'replication',
-                # Migrate network interfaces ASAP
-                'network',
-                # catalog needs to be initialized before docker setup funcs are executed
-                # TODO: Remove this when we have upgrade alerts in place
-                'catalog',
-            ]
-            try:
-                return beginning.index(plugin)
-            except ValueError:
-                return len(beginning)
-        setup_funcs = sorted(setup_funcs, key=sort_key)
+        # Plugins that are set up before all other plugins. Other plugins may declare dependencies between
+        # themselves with module-level `SETUP_DEPENDS` list (see `plugin_setup_graph`).
+        beginning = [
+            # Move uploaded config files to their appropriate locations
+            'config',
+            # Connect to the database
+            'datastore',
+            # Allow internal UNIX socket authentication for plugins that run in separate pools
+            'auth',
+            # We need to register all services because pseudo-services can still be used by plugins setup functions
+            'service',
+            # We need to run pwenc first to ensure we have secret setup to work for encrypted fields which
+            # might be used in the setup functions.
+            'pwenc',
+            # We run boot plugin first to ensure we are able to retrieve
+            # BOOT POOL during system plugin initialization
+            'boot',
+            # We need to run system plugin setup's function first because when system boots, the right
+            # timezone is not configured. See #72131
+            'system',
+            # Initialize mail before other plugins try to send e-mail messages
+            'mail',
+            # We also need to load alerts first because other plugins can issue one-shot alerts during their
+            # initialization
+            'alert',
+            # Migrate users and groups ASAP
+            'account',
+            # Replication plugin needs to be initialized before zettarepl in order to register network activity
+            'replication',
+            # Migrate network interfaces ASAP
+            'network',
+            # catalog needs to be initialized before docker setup funcs are executed
+            # TODO: Remove this when we have upgrade alerts in place
+            'catalog',
+        ]
+
+        self.plugins_setups = plugin_setup_graph(setup_funcs, beginning)
 
         # Only call setup after all schemas have been resolved because
         # they can call methods with schemas defined.
-        setup_total = len(setup_funcs)
-        for i, setup_func in enumerate(setup_funcs):
-            name, f = setup_func
-            self._console_write(f'setting up plugins ({name}) [{i + 1}/{setup_total}]')
+        setup_total = len(self.plugins_setups)
+        setup_started = 0
+
+        def on_setup_begin(setup):
+            nonlocal setup_started
+            setup_started += 1
+            self._console_write(f'setting up plugins ({setup.name}) [{setup_started}/{setup_total}]')
             self.__notify_startup_progress()
-            call = f(self)
-            # Allow setup to be a coroutine
-            if asyncio.iscoroutinefunction(f):
-                await call
+
+        self.plugins_setup_started_at = time.monotonic()
+        await run_plugin_setups(self, self.plugins_setups, on_setup_begin)
 
         self.logger.debug('All plugins loaded')
 
+    def plugins_setup_profile(self):
+        return plugin_setup_profile(self.plugins_setups, self.plugins_setup_started_at)
+
     def _setup_periodic_tasks(self):
         for service_name, service_obj in self.get_services().items():
             for task_name in dir(service_obj):
                 method = getattr(service_obj, task_name)
                 if callable(method) and hasattr(method, "_periodic"):
-                    if method._periodic.run_on_start:
-                        delay = 0
-                    else:
-                        delay = method._periodic.interval
-
-                    method_name = f'{service_name}.{task_name}'
-                    self.logger.debug(
-                        f"Setting up periodic task {method_name} to run every {method._periodic.interval} seconds"
-                    )
-
-                    self.loop.call_soon_threadsafe(
-                        self.loop.call_later,
-                        delay,
-                        functools.partial(
-                            self.__call_periodic_task,
-                            method, service_name, service_obj, method_name, method._periodic.interval
-                        )
-                    )
-
-    def __call_periodic_task(self, method, service_name, service_obj, method_name, interval):
-        self.create_task(self.__periodic_task_wrapper(method, service_name, service_obj, method_name, interval))
-
-    async def __periodic_task_wrapper(self, method, service_name, service_obj, method_name, interval):
-        self.logger.trace("Calling periodic task %s", method_name)
-        try:
-            await self._call(method_name, service_obj, method, [])
-        except Exception:
-            self.logger.warning("Exception while calling periodic task", exc_info=True)
+                    self.periodic_tasks.add(f'{service_name}.{task_name}', service_obj, method)
 
-        self.loop.call_later(
-            interval,
-            functools.partial(
-                self.__call_periodic_task,
-                method, service_name, service_obj, method_name, interval
-            )
-        )
+        self.periodic_tasks.start()
 
     console_error_counter = 0
 
@@ -1383,7 +1497,7 @@ class Middleware(LoadPluginsMixin, ServiceCallMixin):
         self.__procpool = concurrent.futures.ProcessPoolExecutor(
             max_workers=5,
             max_tasks_per_child=20,
-            initializer=functools.partial(worker_init, self.debug_level, self.log_handler)
+            initializer=functools.partial(worker_init, self.debug_level, self.log_handler, self.__procpool_modules)
         )
 
     async def run_in_proc(self, method, *args, **kwargs):
@@ -1830,7 +1944,7 @@ class Middleware(LoadPluginsMixin, ServiceCallMixin):
 
         assert event_type in ('ADDED', 'CHANGED', 'REMOVED')
 
-        self.logger.trace(f'Sending event {name!r}:{event_type!r}:{kwargs!r}')
+        self.logger.trace('Sending event %r:%r:%r', name, event_type, kwargs)
 
         for session_id, wsclient in list(self.__wsclients.items()):
             try:
@@ -2274,6 +2388,7 @@ def main():
     parser.add_argument('--log-handler', choices=[
         'console',
         'file',
+        'json',
     ], default='console')
     args = parser.parse_args()
 
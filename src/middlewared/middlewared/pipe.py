@@ -1,6 +1,14 @@
+import asyncio
+import contextlib
+import fcntl
 import os
 import tempfile
 
+# Capacity of unbuffered pipes (the default is 64 KiB) so that the reader and the writer are woken up less often
+PIPE_SIZE = 1048576
+# Maximum amount of data that is copied between a pipe and an HTTP request/response at once
+PIPE_STREAM_CHUNK_SIZE = 4194304
+
 
 class Pipes:
     """
@@ -47,15 +55,98 @@ class Pipe:
     """
     def __init__(self, middleware, buffered=False):
         self.middleware = middleware
+        self.buffered = buffered
 
         if buffered:
             self.w = tempfile.NamedTemporaryFile(buffering=0)
             self.r = open(self.w.name, "rb")
         else:
             r, w = os.pipe()
+            with contextlib.suppress(OSError):
+                fcntl.fcntl(w, fcntl.F_SETPIPE_SZ, PIPE_SIZE)
             self.r = os.fdopen(r, "rb")
             self.w = os.fdopen(w, "wb")
 
     async def close(self):
         await self.middleware.run_in_thread(self.r.close)
         await self.middleware.run_in_thread(self.w.close)
+
+    async def copy_to_response(self, resp):
+        """
+        Copy everything written to an unbuffered pipe to the aiohttp `resp` (which must already be prepared) until
+        the writer closes it. The pipe is read in the event loop so no thread is blocked waiting for the writer.
+
+        Returns the number of bytes copied. Reading side of the pipe is closed afterwards.
+        """
+        loop = asyncio.get_running_loop()
+        reader = asyncio.StreamReader(limit=PIPE_STREAM_CHUNK_SIZE, loop=loop)
+        transport, _ = await loop.connect_read_pipe(lambda: asyncio.StreamReaderProtocol(reader, loop=loop), self.r)
+        copied = 0
+        try:
+            # Whatever is available is read at once so the chunk size adapts to how fast the writer is
+            while chunk := await reader.read(PIPE_STREAM_CHUNK_SIZE):
+                await resp.write(chunk)
+                copied += len(chunk)
+        finally:
+            transport.close()
+
+        return copied
+
+    async def copy_from_multipart(self, filepart):
+        """
+        Copy the aiohttp multipart `filepart` to an unbuffered pipe and close it. The pipe is written in the event
+        loop, waiting for the reader to catch up when the pipe is full.
+
+        Returns the number of bytes copied. Copying stops if the reader closes the pipe.
+        """
+        loop = asyncio.get_running_loop()
+        transport, protocol = await loop.connect_write_pipe(PipeWriteProtocol, self.w)
+        copied = 0
+        try:
+            while chunk := await filepart.read_chunk(PIPE_STREAM_CHUNK_SIZE):
+                await protocol.drain()
+                if transport.is_closing():
+                    # Writing has failed
+                    break
+
+                transport.write(chunk)
+                copied += len(chunk)
+        except BrokenPipeError:
+            pass
+        finally:
+            # Data that is still buffered is written before the pipe is closed
+            transport.close()
+
+        return copied
+
+
+class PipeWriteProtocol(asyncio.BaseProtocol):
+    """
+    Flow control for a pipe write transport.
+    """
+
+    def __init__(self):
+        self.waiter = None
+        self.lost = False
+
+    def pause_writing(self):
+        self.waiter = asyncio.get_running_loop().create_future()
+
+    def resume_writing(self):
+        self._wakeup()
+
+    def connection_lost(self, exc):
+        self.lost = True
+        self._wakeup()
+
+    async def drain(self):
+        if self.waiter is not None:
+            await self.waiter
+
+        if self.lost:
+            raise BrokenPipeError()
+
+    def _wakeup(self):
+        if self.waiter is not None and not self.waiter.done():
+            self.waiter.set_result(None)
+        self.waiter = None
@@ -1,3 +1,7 @@
+# Audit databases are set up in a thread and no other plugin setup depends on them
+SETUP_DEPENDS = []
+
+
 async def setup(middleware):
     try:
         # Set up connections to the auditing databases
@@ -0,0 +1,103 @@
+import hashlib
+import json
+import re
+
+from middlewared.utils import run
+
+# Task settings that affect the contents of the remote. Changes between previous snapshot and current snapshot can
+# only be transferred incrementally if these did not change since the previous snapshot was synchronized.
+INCREMENTAL_CONFIG_KEYS = [
+    "path", "attributes", "transfer_mode", "encryption", "filename_encryption", "encryption_password",
+    "encryption_salt", "include", "exclude", "args", "follow_symlinks", "create_empty_src_dirs",
+]
+# `zfs diff` escapes whitespace, non-printable characters and backslashes as `\NNNN` (octal)
+RE_ZFS_DIFF_ESCAPE = re.compile(rb"\\([0-7]{4})")
+ZFS_DIFF_CHANGES = {b"+": "created", b"M": "modified", b"-": "removed", b"R": "renamed"}
+
+
+def incremental_config_digest(cloud_sync):
+    return hashlib.sha256(json.dumps(
+        [cloud_sync["credentials"]["id"]] + [cloud_sync[k] for k in INCREMENTAL_CONFIG_KEYS],
+        sort_keys=True,
+    ).encode("utf-8")).hexdigest()
+
+
+def parse_zfs_diff(output, root):
+    """
+    Parses `zfs diff -F -H` `output` and returns paths (relative to `root`) of files that were created, modified,
+    removed or renamed and the counts of these changes.
+
+    Returns `None` if the changes can't be represented as a list of files (e.g. a directory was renamed, so the files
+    in it were not reported as changed).
+    """
+    root = root.rstrip("/") + "/"
+    paths = set()
+    counts = dict.fromkeys(ZFS_DIFF_CHANGES.values(), 0)
+    for line in output.split(b"\n"):
+        if not line:
+            continue
+
+        change, type_, *names = line.split(b"\t")
+        names = [
+            name[len(root):]
+            for name in map(zfs_diff_unescape, names)
+            if name.startswith(root)
+        ]
+        if not names:
+            continue
+
+        if type_ == b"/":
+            # Created and removed directories are reported along with their contents
+            if change == b"R":
+                return None
+
+            continue
+
+        if type_ not in (b"F", b"@"):
+            continue
+
+        if any("\n" in name for name in names):
+            return None
+
+        paths.update(names)
+        counts[ZFS_DIFF_CHANGES[change]] += 1
+
+    return sorted(paths), counts
+
+
+def zfs_diff_unescape(name):
+    return RE_ZFS_DIFF_ESCAPE.sub(lambda m: bytes([int(m.group(1), 8)]), name).decode("utf-8", "surrogateescape")
+
+
+async def incremental_files(cloud_sync, state, snapshot, recursive):
+    """
+    Returns files that have to be transferred to synchronize `snapshot` of `cloud_sync` task given the `state` of
+    the previous run, the counts of changes and the reason why all files must be compared if this is not possible.
+
+    `recursive` tells whether `snapshot` was taken recursively because there are child datasets in the path.
+    """
+    if not state.get("snapshot"):
+        return None, None, "there is no previous snapshot"
+
+    # `zfs diff` only reports changes in the dataset itself, not in its children. States stored before this was
+    # recorded are treated as recursive.
+    if recursive or state.get("recursive", True):
+        return None, None, "the path contains child datasets which zfs diff does not compare"
+
+    if state["config"] != incremental_config_digest(cloud_sync):
+        return None, None, "task settings were changed since the previous snapshot"
+
+    if state["runs"] + 1 >= cloud_sync["incremental_full_interval"]:
+        return None, None, f"full compare is performed every {cloud_sync['incremental_full_interval']} runs"
+
+    if state["snapshot"].split("@")[0] != snapshot.split("@")[0]:
+        return None, None, "the path was moved to a different dataset"
+
+    proc = await run(["zfs", "diff", "-F", "-H", state["snapshot"], snapshot], check=False)
+    if proc.returncode != 0:
+        return None, None, f"zfs diff failed: {proc.stderr.decode('utf-8', 'ignore').strip()}"
+
+    if (result := parse_zfs_diff(proc.stdout, cloud_sync["path"])) is None:
+        return None, None, "directories were renamed since the previous snapshot"
+
+    return *result, None
@@ -0,0 +1,225 @@
+import asyncio
+from collections.abc import Callable
+import contextlib
+from dataclasses import dataclass, field
+import errno
+import json
+import logging
+import os
+import subprocess
+import time
+
+import aiohttp
+
+from middlewared.service import CallError
+from middlewared.utils import MIDDLEWARE_RUN_DIR, Popen
+from middlewared.utils.prctl import die_with_parent
+
+RCD_DIR = os.path.join(MIDDLEWARE_RUN_DIR, "rclone")
+RCD_CONFIG = os.path.join(RCD_DIR, "rcd.conf")
+RCD_SOCKET = os.path.join(RCD_DIR, "rcd.sock")
+RCD_START_TIMEOUT = 10
+# Remotes (along with the connections and authentication state of their backends) are kept for this many seconds
+# after they were last used. The daemon itself exits when it has no remotes left.
+RCD_REMOTE_IDLE_TIMEOUT = 600
+
+logger = logging.getLogger(__name__)
+
+
+async def rc_call(socket_path, method, params=None, timeout=None):
+    """
+    Call rclone remote control `method` listening on unix socket `socket_path`.
+    """
+    try:
+        async with aiohttp.UnixConnector(path=socket_path) as conn:
+            async with aiohttp.ClientSession(connector=conn, timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+                async with session.post(f"http://rclone/{method}", json=params or {}) as r:
+                    result = await r.json(content_type=None)
+    except (aiohttp.ClientError, asyncio.TimeoutError, json.JSONDecodeError) as e:
+        raise CallError(f"rclone remote control call {method!r} failed: {e!r}", errno.ECONNREFUSED)
+
+    if r.status != 200:
+        raise CallError(result.get("error") or f"rclone remote control call {method!r} failed with HTTP {r.status}")
+
+    return result
+
+
+def rc_socket_path(job_id):
+    """
+    Path of the remote control socket of rclone process run by job `job_id`.
+    """
+    return os.path.join(RCD_DIR, f"job-{job_id}.sock")
+
+
+def rc_args(socket_path):
+    """
+    Arguments making rclone process serve remote control (`core/stats`, `core/bwlimit`, ...) on `socket_path`.
+    Stale socket left by a previous process is removed.
+    """
+    os.makedirs(RCD_DIR, mode=0o700, exist_ok=True)
+    with contextlib.suppress(FileNotFoundError):
+        os.unlink(socket_path)
+
+    return ["--rc", "--rc-addr", f"unix://{socket_path}"]
+
+
+@dataclass
+class RcdRemote:
+    names: list
+    cleanup: Callable
+    users: int = 0
+    last_used: float = field(default_factory=time.monotonic)
+
+
+class RcloneRcd:
+    """
+    Managed `rclone rcd` process. Remotes configured in it are reused by subsequent calls for the same key so that
+    backends do not have to connect and authenticate to the provider again.
+    """
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.proc = None
+        self.reaper = None
+        self.remotes = {}  # key -> RcdRemote
+
+    async def call(self, method, params=None):
+        return await rc_call(RCD_SOCKET, method, params)
+
+    @contextlib.asynccontextmanager
+    async def remote(self, key, configure):
+        """
+        Yields the name of the remote identified by `key`, starting the daemon if necessary.
+
+        If this remote is not configured yet, `configure(name)` is awaited. It must return a dictionary of rclone
+        remotes to configure (the first one must be named `name`, others may reference it) and a coroutine function
+        that is called once these remotes are deleted.
+        """
+        async with self.lock:
+            await self._start()
+
+            if (remote := self.remotes.get(key)) is None:
+                name = f"remote_{key[:16]}"
+                remotes, cleanup = await configure(name)
+                remote = RcdRemote([], cleanup)
+                try:
+                    for remote_name, config in remotes.items():
+                        await self.call("config/create", {
+                            "name": remote_name,
+                            "type": config["type"],
+                            "parameters": {
+                                k: json.dumps(v) if isinstance(v, bool) else str(v)
+                                for k, v in config.items()
+                                if k != "type"
+                            },
+                            # Passwords are already obscured
+                            "opt": {"nonInteractive": True, "noObscure": True},
+                        })
+                        remote.names.append(remote_name)
+                except Exception:
+                    await self._delete(remote)
+                    raise
+
+                self.remotes[key] = remote
+
+            remote.users += 1
+
+        try:
+            yield remote.names[0]
+        finally:
+            remote.users -= 1
+            remote.last_used = time.monotonic()
+
+    async def stop(self):
+        async with self.lock:
+            await self._stop()
+
+    async def _start(self):
+        if self.proc is not None and self.proc.returncode is None:
+            return
+
+        # The daemon has exited, remotes configured in it are gone
+        await self._stop()
+
+        os.makedirs(RCD_DIR, mode=0o700, exist_ok=True)
+        for path in (RCD_CONFIG, RCD_SOCKET):
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(path)
+
+        self.proc = await Popen(
+            [
+                "rclone", "--config", RCD_CONFIG, "rcd", "--rc-addr", f"unix://{RCD_SOCKET}", "--rc-no-auth",
+                "--fs-cache-expire-duration", f"{RCD_REMOTE_IDLE_TIMEOUT}s",
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            preexec_fn=die_with_parent,
+        )
+
+        deadline = time.monotonic() + RCD_START_TIMEOUT
+        while True:
+            try:
+                await self.call("rc/noop")
+                break
+            except CallError:
+                if self.proc.returncode is not None:
+                    self.proc = None
+                    raise CallError("rclone remote control daemon failed to start")
+
+                if time.monotonic() > deadline:
+                    await self._stop()
+                    raise CallError("Timed out waiting for rclone remote control daemon to start")
+
+                await asyncio.sleep(0.1)
+
+        self.reaper = asyncio.ensure_future(self._reap())
+
+    async def _stop(self):
+        if self.reaper is not None and self.reaper is not asyncio.current_task():
+            self.reaper.cancel()
+        self.reaper = None
+
+        if self.proc is not None:
+            if self.proc.returncode is None:
+                self.proc.terminate()
+                try:
+                    await asyncio.wait_for(self.proc.wait(), 10)
+                except asyncio.TimeoutError:
+                    self.proc.kill()
+                    await self.proc.wait()
+
+            self.proc = None
+
+        remotes, self.remotes = self.remotes, {}
+        for remote in remotes.values():
+            await self._cleanup(remote)
+
+    async def _reap(self):
+        while True:
+            await asyncio.sleep(RCD_REMOTE_IDLE_TIMEOUT / 10)
+
+            async with self.lock:
+                now = time.monotonic()
+                for key, remote in list(self.remotes.items()):
+                    if not remote.users and now - remote.last_used >= RCD_REMOTE_IDLE_TIMEOUT:
+                        del self.remotes[key]
+                        await self._delete(remote)
+
+                if not self.remotes:
+                    await self._stop()
+                    return
+
+    async def _delete(self, remote):
+        for name in remote.names:
+            try:
+                await self.call("config/delete", {"name": name})
+            except CallError as e:
+                logger.warning("Error deleting rclone remote %r: %r", name, e)
+
+        await self._cleanup(remote)
+
+    async def _cleanup(self, remote):
+        try:
+            await remote.cleanup()
+        except Exception:
+            logger.warning("Error cleaning up rclone remote %r", remote.names, exc_info=True)
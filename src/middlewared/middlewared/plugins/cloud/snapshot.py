@@ -30,8 +30,11 @@ def get_dataset_recursive(datasets, directory):
     )
 
 
-async def create_snapshot(middleware, path, name="cloud_task-onetime") -> tuple[str, str]:
-    """Create a ZFS snapshot given a dataset path; return its name and path."""
+async def create_snapshot(middleware, path, name="cloud_task-onetime") -> tuple[str, str, bool]:
+    """
+    Create a ZFS snapshot given a dataset path; return its name, path and whether it is recursive (i.e. there are
+    child datasets in the path).
+    """
     dataset, recursive = get_dataset_recursive(
         await middleware.call("zfs.dataset.query", [["type", "=", "FILESYSTEM"]]),
         path,
@@ -49,4 +52,4 @@ async def create_snapshot(middleware, path, name="cloud_task-onetime") -> tuple[
         mountpoint, ".zfs", "snapshot", snapshot_name, os.path.relpath(path, mountpoint)
     ))
 
-    return snapshot, path
+    return snapshot, path, recursive
@@ -184,6 +184,9 @@ class CloudBackupFSAttachmentDelegate(LockableFSAttachmentDelegate):
         await self.middleware.call("service.restart", "cron")
 
 
+SETUP_DEPENDS = []
+
+
 async def setup(middleware):
     await middleware.call("pool.dataset.register_attachment_delegate", CloudBackupFSAttachmentDelegate(middleware))
     await middleware.call("network.general.register_activity", "cloud_backup", "Cloud backup")
@@ -57,7 +57,7 @@ async def restic_backup(middleware, job, cloud_backup, dry_run):
             await check_local_path(middleware, local_path)
             if cloud_backup["snapshot"]:
                 snapshot_name = f"cloud_backup-{cloud_backup.get('id', 'onetime')}"
-                snapshot, local_path = await create_snapshot(middleware, local_path, snapshot_name)
+                snapshot, local_path, _ = await create_snapshot(middleware, local_path, snapshot_name)
 
             cmd = [local_path]
 
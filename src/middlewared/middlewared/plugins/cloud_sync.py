@@ -7,8 +7,10 @@ from middlewared.api.current import (CloudCredentialEntry,
                                      CloudCredentialVerifyArgs, CloudCredentialVerifyResult)
 from middlewared.common.attachment import LockableFSAttachmentDelegate
 from middlewared.plugins.cloud.crud import CloudTaskServiceMixin
+from middlewared.plugins.cloud.incremental import incremental_config_digest, incremental_files
 from middlewared.plugins.cloud.model import CloudTaskModelMixin, cloud_task_schema
 from middlewared.plugins.cloud.path import get_remote_path, check_local_path
+from middlewared.plugins.cloud.rcd import RcloneRcd, rc_args, rc_call, rc_socket_path
 from middlewared.plugins.cloud.remotes import REMOTES, remote_classes
 from middlewared.plugins.cloud.script import env_mapping, run_script
 from middlewared.plugins.cloud.snapshot import create_snapshot
@@ -21,6 +23,7 @@ import middlewared.sqlalchemy as sa
 from middlewared.utils import Popen, run
 from middlewared.utils.lang import undefined
 from middlewared.utils.path import FSLocation
+from middlewared.utils.size import format_size
 from middlewared.utils.service.task_state import TaskStateMixin
 from middlewared.validators import Range, Time
 
@@ -30,10 +33,14 @@ import base64
 import codecs
 from collections import namedtuple
 import configparser
+import contextlib
 from Cryptodome import Random
 from Cryptodome.Cipher import AES
 from Cryptodome.Util import Counter
+from datetime import timedelta
 import enum
+import functools
+import hashlib
 import json
 import logging
 import os
@@ -46,6 +53,8 @@ RE_TRANSF1 = re.compile(r"Transferred:\s*(?P<progress_1>.+), (?P<progress>[0-9]+
 RE_TRANSF2 = re.compile(r"Transferred:\s*(?P<progress_1>.+, )(?P<progress>[0-9]+)%, (?P<progress_2>.+)$")
 RE_CHECKS = re.compile(r"Checks:\s*(?P<checks>[0-9 /]+)(, (?P<progress>[0-9]+)%)?$")
 
+RC_STATS_INTERVAL = 1
+
 OAUTH_URL = "https://www.truenas.com/oauth"
 
 RcloneConfigTuple = namedtuple("RcloneConfigTuple", ["config_path", "remote_path", "extra_args"])
@@ -69,34 +78,17 @@ class RcloneConfig:
         # Make sure only root can read it as there is sensitive data
         os.chmod(self.tmp_file.name, 0o600)
 
-        config = dict(self.cloud_sync["credentials"]["provider"], type=self.provider.rclone_type)
-        config = dict(config, **await self.provider.get_credentials_extra(self.cloud_sync["credentials"]))
-        if "pass" in config:
-            config["pass"] = rclone_encrypt_password(config["pass"])
+        config = await rclone_remote_config(self.provider, self.cloud_sync)
 
         remote_path = None
         extra_args = await self.provider.get_task_extra_args(self.cloud_sync)
 
         if "attributes" in self.cloud_sync:
-            config.update(dict(self.cloud_sync["attributes"], **await self.provider.get_task_extra(self.cloud_sync)))
-            for k, v in list(config.items()):
-                if v is undefined:
-                    config.pop(k)
-
             remote_path = get_remote_path(self.provider, self.cloud_sync["attributes"])
             remote_path = f"remote:{remote_path}"
 
             if self.cloud_sync["encryption"]:
-                self.tmp_file.write("[encrypted]\n")
-                self.tmp_file.write("type = crypt\n")
-                self.tmp_file.write(f"remote = {remote_path}\n")
-                self.tmp_file.write("filename_encryption = {}\n".format(
-                    "standard" if self.cloud_sync["filename_encryption"] else "off"))
-                self.tmp_file.write("password = {}\n".format(
-                    rclone_encrypt_password(self.cloud_sync["encryption_password"])))
-                if self.cloud_sync["encryption_salt"]:
-                    self.tmp_file.write("password2 = {}\n".format(
-                        rclone_encrypt_password(self.cloud_sync["encryption_salt"])))
+                self._write_section("encrypted", rclone_crypt_config(self.cloud_sync, remote_path))
 
                 remote_path = "encrypted:/"
 
@@ -127,11 +119,7 @@ class RcloneConfig:
             self.tmp_file_filter.flush()
             extra_args.extend(["--filter-from", self.tmp_file_filter.name])
 
-        self.tmp_file.write("[remote]\n")
-        for k, v in config.items():
-            if isinstance(v, bool):
-                v = json.dumps(v)
-            self.tmp_file.write(f"{k} = {v}\n")
+        self._write_section("remote", config)
 
         self.tmp_file.flush()
 
@@ -139,6 +127,13 @@ class RcloneConfig:
 
         return RcloneConfigTuple(self.tmp_file.name, remote_path, extra_args)
 
+    def _write_section(self, name, config):
+        self.tmp_file.write(f"[{name}]\n")
+        for k, v in config.items():
+            if isinstance(v, bool):
+                v = json.dumps(v)
+            self.tmp_file.write(f"{k} = {v}\n")
+
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         if self.config is not None:
             await self.provider.cleanup(self.cloud_sync, self.config)
@@ -148,6 +143,68 @@ class RcloneConfig:
             self.tmp_file_filter.close()
 
 
+async def rclone_remote_config(provider, cloud_sync):
+    config = dict(cloud_sync["credentials"]["provider"], type=provider.rclone_type)
+    config = dict(config, **await provider.get_credentials_extra(cloud_sync["credentials"]))
+    if "pass" in config:
+        config["pass"] = rclone_encrypt_password(config["pass"])
+
+    if "attributes" in cloud_sync:
+        config.update(dict(cloud_sync["attributes"], **await provider.get_task_extra(cloud_sync)))
+        for k, v in list(config.items()):
+            if v is undefined:
+                config.pop(k)
+
+    return config
+
+
+def rclone_crypt_config(cloud_sync, remote_path):
+    config = {
+        "type": "crypt",
+        "remote": remote_path,
+        "filename_encryption": "standard" if cloud_sync["filename_encryption"] else "off",
+        "password": rclone_encrypt_password(cloud_sync["encryption_password"]),
+    }
+    if cloud_sync["encryption_salt"]:
+        config["password2"] = rclone_encrypt_password(cloud_sync["encryption_salt"])
+
+    return config
+
+
+def rclone_bwlimit(bwlimit):
+    return " ".join([
+        f"{limit['time']},{str(limit['bandwidth']) + 'b' if limit['bandwidth'] else 'off'}"
+        for limit in bwlimit
+    ])
+
+
+@contextlib.asynccontextmanager
+async def rcd_remote(rcd, cloud_sync):
+    """
+    Yields the name of `rcd` remote configured for `cloud_sync` credentials and attributes. If `cloud_sync` uses
+    encryption, the crypt remote is available as `{name}_encrypted`.
+    """
+    provider = REMOTES[cloud_sync["credentials"]["provider"]["type"]]
+    key = hashlib.sha256(json.dumps([
+        cloud_sync["credentials"]["provider"],
+        cloud_sync.get("attributes"),
+        {k: cloud_sync.get(k) for k in ["encryption", "filename_encryption", "encryption_password", "encryption_salt"]},
+    ], sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    async def configure(name):
+        config = await rclone_remote_config(provider, cloud_sync)
+        remotes = {name: config}
+        if cloud_sync.get("encryption") and "attributes" in cloud_sync:
+            remotes[f"{name}_encrypted"] = rclone_crypt_config(
+                cloud_sync, f"{name}:{get_remote_path(provider, cloud_sync['attributes'])}",
+            )
+
+        return remotes, functools.partial(provider.cleanup, cloud_sync, config)
+
+    async with rcd.remote(key, configure) as name:
+        yield name
+
+
 async def rclone(middleware, job, cloud_sync, dry_run):
     await middleware.call("network.general.will_perform_activity", "cloud_sync")
 
@@ -173,10 +230,11 @@ async def rclone(middleware, job, cloud_sync, dry_run):
             args.extend(["--transfers", str(cloud_sync["transfers"])])
 
         if cloud_sync["bwlimit"]:
-            args.extend(["--bwlimit", " ".join([
-                f"{limit['time']},{str(limit['bandwidth']) + 'b' if limit['bandwidth'] else 'off'}"
-                for limit in cloud_sync["bwlimit"]
-            ])])
+            args.extend(["--bwlimit", rclone_bwlimit(cloud_sync["bwlimit"])])
+
+        # Exact progress is polled using `core/stats` and bandwidth limit can be changed using `core/bwlimit`
+        rc_socket = rc_socket_path(job.id)
+        args += rc_args(rc_socket)
 
         if dry_run:
             args.append("--dry-run")
@@ -191,10 +249,34 @@ async def rclone(middleware, job, cloud_sync, dry_run):
             args.append("--create-empty-src-dirs")
 
         snapshot = None
+        incremental_state = None
         if cloud_sync["direction"] == "PUSH":
             if cloud_sync["snapshot"]:
                 snapshot_name = f"cloud_sync-{cloud_sync.get('id', 'onetime')}"
-                snapshot, path = await create_snapshot(middleware, path, snapshot_name)
+                snapshot, path, recursive = await create_snapshot(middleware, path, snapshot_name)
+
+                if cloud_sync.get("incremental") and "id" in cloud_sync:
+                    incremental_state = await middleware.call("cloudsync.get_incremental_state", cloud_sync["id"])
+                    files, changes, reason = await incremental_files(
+                        cloud_sync, incremental_state, snapshot, recursive,
+                    )
+                    if files is None:
+                        await job.logs_fd_write(f"Comparing all files: {reason}\n".encode("utf-8", "ignore"))
+                    else:
+                        files_from = tempfile.NamedTemporaryFile(mode="wb")
+                        files_from.write(b"".join(
+                            file.encode("utf-8", "surrogateescape") + b"\n" for file in files
+                        ))
+                        files_from.flush()
+                        args.extend(["--files-from-raw", files_from.name])
+
+                        await job.logs_fd_write((
+                            f"Transferring changes since {incremental_state['snapshot']}: "
+                            f"{changes['created']} created, {changes['modified']} modified, "
+                            f"{changes['removed']} removed, {changes['renamed']} renamed files. "
+                            f"Skipping approximately {max(incremental_state['files'] - len(files), 0)} "
+                            "unchanged files.\n"
+                        ).encode("utf-8", "ignore"))
 
             args.extend([path, config.remote_path])
         else:
@@ -218,6 +300,7 @@ async def rclone(middleware, job, cloud_sync, dry_run):
             stderr=subprocess.STDOUT,
         )
         check_cloud_sync = asyncio.ensure_future(rclone_check_progress(job, proc))
+        check_stats = asyncio.ensure_future(rclone_check_stats(job, rc_socket))
         cancelled_error = None
         try:
             await proc.wait()
@@ -228,9 +311,16 @@ async def rclone(middleware, job, cloud_sync, dry_run):
             except CallError as e:
                 job.middleware.logger.warning(f"Error terminating rclone on cloud sync abort: {e!r}")
         finally:
+            check_stats.cancel()
             await asyncio.wait_for(check_cloud_sync, None)
+            with contextlib.suppress(FileNotFoundError):
+                os.unlink(rc_socket)
 
-        if snapshot:
+        # Successfully synchronized snapshot is the base for the next incremental run
+        keep_snapshot = (
+            incremental_state is not None and not dry_run and cancelled_error is None and proc.returncode == 0
+        )
+        if snapshot and not keep_snapshot:
             await middleware.call("zfs.snapshot.delete", snapshot)
 
         if cancelled_error is not None:
@@ -243,6 +333,24 @@ async def rclone(middleware, job, cloud_sync, dry_run):
                 message += f"rclone failed with exit code {proc.returncode}"
             raise CallError(message)
 
+        if keep_snapshot:
+            if files is None:
+                stats = job.internal_data.get("rc_stats") or {}
+                runs = 0
+                # Files that already existed on the remote are only checked, new files are only transferred
+                total_files = stats.get("totalChecks", 0) + stats.get("totalTransfers", 0)
+            else:
+                runs = incremental_state["runs"] + 1
+                total_files = max(incremental_state["files"] + changes["created"] - changes["removed"], 0)
+
+            await middleware.call("cloudsync.set_incremental_state", cloud_sync["id"], {
+                "snapshot": snapshot,
+                "recursive": recursive,
+                "config": incremental_config_digest(cloud_sync),
+                "runs": runs,
+                "files": total_files,
+            })
+
         await run_script(job, "Post-script", cloud_sync["post_script"], env)
 
         refresh_credentials = REMOTES[cloud_sync["credentials"]["provider"]["type"]].refresh_credentials
@@ -379,7 +487,7 @@ async def rclone_check_progress(job, proc):
                 checks = f'checks: {reg.group("checks")}'
 
             progresses = list(filter(lambda v: v is not None, [progress1, progress2, progress3]))
-            if progresses:
+            if progresses and not job.internal_data.get("rc_stats"):
                 job.set_progress(min(progresses), ', '.join(filter(None, [transferred1, transferred2, checks])))
     finally:
         result = cutter.flush()
@@ -399,6 +507,53 @@ async def rclone_check_progress(job, proc):
         await job.logs_fd_write(("\n" + message).encode("utf-8", "ignore"))
 
 
+async def rclone_check_stats(job, socket_path):
+    while True:
+        await asyncio.sleep(RC_STATS_INTERVAL)
+
+        try:
+            stats = await rc_call(socket_path, "core/stats", timeout=RC_STATS_INTERVAL * 5)
+        except CallError:
+            # rclone is not serving remote control yet
+            continue
+
+        # Text progress parsing is no longer necessary
+        job.internal_data["rc_stats"] = stats
+        job.set_progress(*rclone_stats_progress(stats))
+
+
+def rclone_stats_progress(stats):
+    progresses = []
+    if stats.get("totalBytes"):
+        progresses.append(min(int(stats["bytes"] * 100 / stats["totalBytes"]), 100))
+    if stats.get("totalChecks"):
+        progresses.append(min(int(stats["checks"] * 100 / stats["totalChecks"]), 100))
+
+    description = [
+        f"{format_size(stats.get('bytes', 0))} / {format_size(stats.get('totalBytes', 0))}",
+        f"{format_size(int(stats.get('speed') or 0))}/s",
+    ]
+    if stats.get("eta") is not None:
+        description.append(f"ETA {timedelta(seconds=int(stats['eta']))}")
+    description.append(f"transfers: {stats.get('transfers', 0)} / {stats.get('totalTransfers', 0)}")
+    if stats.get("totalChecks"):
+        description.append(f"checks: {stats.get('checks', 0)} / {stats['totalChecks']}")
+    if stats.get("errors"):
+        description.append(f"errors: {stats['errors']}")
+
+    return min(progresses) if progresses else None, ", ".join(description), {
+        "bytes": stats.get("bytes", 0),
+        "total_bytes": stats.get("totalBytes", 0),
+        "transfers": stats.get("transfers", 0),
+        "total_transfers": stats.get("totalTransfers", 0),
+        "checks": stats.get("checks", 0),
+        "total_checks": stats.get("totalChecks", 0),
+        "errors": stats.get("errors", 0),
+        "speed": stats.get("speed", 0),
+        "eta": stats.get("eta"),
+    }
+
+
 def rclone_encrypt_password(password):
     key = bytes([0x9c, 0x93, 0x5b, 0x48, 0x73, 0x0a, 0x55, 0x4d,
                  0x6b, 0xfd, 0x7c, 0x63, 0xc8, 0x86, 0xa9, 0x2b,
@@ -623,11 +778,16 @@ class CloudSyncModel(CloudTaskModelMixin, sa.Model):
     create_empty_src_dirs = sa.Column(sa.Boolean())
     follow_symlinks = sa.Column(sa.Boolean())
 
+    incremental = sa.Column(sa.Boolean(), default=False)
+    incremental_full_interval = sa.Column(sa.Integer(), default=10)
+    incremental_state = sa.Column(sa.JSON(dict))
+
 
 class CloudSyncService(TaskPathService, CloudTaskServiceMixin, TaskStateMixin):
 
     local_fs_lock_manager = FsLockManager()
     remote_fs_lock_manager = FsLockManager()
+    rcd = RcloneRcd()
     share_task_type = 'CloudSync'
     allowed_path_types = [FSLocation.CLUSTER, FSLocation.LOCAL]
     task_state_methods = ['cloudsync.sync', 'cloudsync.restore']
@@ -663,6 +823,8 @@ class CloudSyncService(TaskPathService, CloudTaskServiceMixin, TaskStateMixin):
         if job := await self.get_task_state_job(context["task_state"], cloud_sync["id"]):
             cloud_sync["job"] = job
 
+        cloud_sync.pop("incremental_state", None)
+
         Cron.convert_db_format_to_schedule(cloud_sync)
 
         return cloud_sync
@@ -700,6 +862,12 @@ class CloudSyncService(TaskPathService, CloudTaskServiceMixin, TaskStateMixin):
             if data["transfer_mode"] == "MOVE":
                 verrors.add(f"{name}.snapshot", "This option can not be used for MOVE transfer mode")
 
+        if data["incremental"]:
+            if not data["snapshot"]:
+                verrors.add(f"{name}.incremental", "This option requires snapshot to be enabled")
+            if data["include"] or data["exclude"]:
+                verrors.add(f"{name}.incremental", "This option can not be used with include or exclude filters")
+
     @private
     async def _validate_folder(self, verrors, name, data):
         if data["direction"] == "PULL":
@@ -755,6 +923,9 @@ class CloudSyncService(TaskPathService, CloudTaskServiceMixin, TaskStateMixin):
 
         Bool("create_empty_src_dirs", default=False),
         Bool("follow_symlinks", default=False),
+
+        Bool("incremental", default=False),
+        Int("incremental_full_interval", default=10, validators=[Range(min_=1)]),
         register=True,
     ))
     @pass_app(rest=True)
@@ -834,6 +1005,9 @@ class CloudSyncService(TaskPathService, CloudTaskServiceMixin, TaskStateMixin):
         await self.middleware.call("datastore.update", "tasks.cloudsync", id_, cloud_sync)
         await self.middleware.call("service.restart", "cron")
 
+        if not cloud_sync["incremental"]:
+            await self.set_incremental_state(id_, {})
+
         return await self.get_instance(id_)
 
     @accepts(Int("id"))
@@ -843,10 +1017,35 @@ class CloudSyncService(TaskPathService, CloudTaskServiceMixin, TaskStateMixin):
         """
         await self.middleware.call("cloudsync.abort", id_)
         await self.middleware.call("alert.oneshot_delete", "CloudSyncTaskFailed", id_)
+        await self.set_incremental_state(id_, {})
         rv = await self.middleware.call("datastore.delete", "tasks.cloudsync", id_)
         await self.middleware.call("service.restart", "cron")
         return rv
 
+    @private
+    async def get_incremental_state(self, id_):
+        return (await self.middleware.call("datastore.query", "tasks.cloudsync", [["id", "=", id_]], {
+            "get": True,
+        }))["incremental_state"]
+
+    @private
+    async def set_incremental_state(self, id_, state):
+        """
+        Stores incremental sync `state` of the task `id_` and destroys the snapshot the previous state was based on.
+        """
+        previous_state = await self.get_incremental_state(id_)
+        previous_snapshot = previous_state.get("snapshot")
+
+        await self.middleware.call("datastore.update", "tasks.cloudsync", id_, {"incremental_state": state})
+
+        if previous_snapshot and previous_snapshot != state.get("snapshot"):
+            try:
+                await self.middleware.call("zfs.snapshot.delete", previous_snapshot, {
+                    "recursive": previous_state.get("recursive", False),
+                })
+            except CallError as e:
+                self.logger.warning("Error destroying cloud sync snapshot %r: %r", previous_snapshot, e)
+
     @accepts(Int("credentials_id"), Str("name"), roles=["CLOUD_SYNC_WRITE"])
     async def create_bucket(self, credentials_id, name):
         """
@@ -939,37 +1138,42 @@ class CloudSyncService(TaskPathService, CloudTaskServiceMixin, TaskStateMixin):
         await self.middleware.call("network.general.will_perform_activity", "cloud_sync")
 
         decrypt_filenames = config.get("encryption") and config.get("filename_encryption")
-        async with RcloneConfig(config) as config:
-            proc = await run(["rclone", "--config", config.config_path, "lsjson", "remote:" + path],
-                             check=False, encoding="utf8", errors="ignore")
-            if proc.returncode == 0:
-                result = json.loads(proc.stdout)
-
-                for item in result:
-                    item["Enabled"] = True
-
-                if decrypt_filenames:
-                    if result:
-                        decrypted_names = {}
-                        proc = await run((["rclone", "--config", config.config_path, "cryptdecode", "encrypted:"] +
-                                         [item["Name"] for item in result]),
-                                         check=False, encoding="utf8", errors="ignore")
-                        for line in proc.stdout.splitlines():
-                            try:
-                                encrypted, decrypted = line.rstrip("\r\n").split(" \t ", 1)
-                            except ValueError:
-                                continue
-
-                            if decrypted != "Failed to decrypt":
-                                decrypted_names[encrypted] = decrypted
-
-                        for item in result:
-                            if item["Name"] in decrypted_names:
-                                item["Decrypted"] = decrypted_names[item["Name"]]
-
-                return result
-            else:
-                raise CallError(proc.stderr, extra={"excerpt": lsjson_error_excerpt(proc.stderr)})
+        async with rcd_remote(self.rcd, config) as remote:
+            try:
+                result = (await self.rcd.call("operations/list", {"fs": f"{remote}:{path}", "remote": ""}))["list"]
+            except CallError as e:
+                raise CallError(e.errmsg, extra={"excerpt": lsjson_error_excerpt(e.errmsg)})
+
+            for item in result:
+                item["Enabled"] = True
+
+            if decrypt_filenames and result:
+                for item, decrypted in zip(result, await self._decrypt_names(
+                    f"{remote}_encrypted:", [item["Name"] for item in result],
+                )):
+                    if decrypted is not None:
+                        item["Decrypted"] = decrypted
+
+            return result
+
+    async def _decrypt_names(self, fs, names):
+        """
+        Decrypts file `names` returning `None` for those that can't be decrypted.
+
+        Decoding fails as a whole if any name can't be decrypted, so a failed call is split in halves until the
+        names that can't be decrypted are found. A few such names in a big directory only cost a few more calls.
+        """
+        if not names:
+            return []
+
+        try:
+            return (await self.rcd.call("backend/command", {"command": "decode", "fs": fs, "arg": names}))["result"]
+        except CallError:
+            if len(names) == 1:
+                return [None]
+
+        middle = len(names) // 2
+        return await self._decrypt_names(fs, names[:middle]) + await self._decrypt_names(fs, names[middle:])
 
     @item_method
     @accepts(
@@ -1076,6 +1280,33 @@ class CloudSyncService(TaskPathService, CloudTaskServiceMixin, TaskStateMixin):
         await self.middleware.call("core.job_abort", cloud_sync["job"]["id"])
         return True
 
+    @item_method
+    @accepts(Int("id"), Int("bandwidth", null=True, validators=[Range(min_=1)]), roles=["CLOUD_SYNC_WRITE"])
+    async def set_bwlimit(self, id_, bandwidth):
+        """
+        Changes bandwidth limit of the running cloud sync task `id` to `bandwidth` bytes per second. This only
+        affects the current run.
+
+        `null` restores the bandwidth limit schedule configured for the task.
+        """
+
+        cloud_sync = await self.get_instance(id_)
+
+        if cloud_sync["job"] is None or cloud_sync["job"]["state"] != "RUNNING":
+            return False
+
+        if bandwidth is None:
+            rate = rclone_bwlimit(cloud_sync["bwlimit"]) or "off"
+        else:
+            rate = f"{bandwidth}b"
+
+        try:
+            await rc_call(rc_socket_path(cloud_sync["job"]["id"]), "core/bwlimit", {"rate": rate}, timeout=10)
+        except CallError as e:
+            raise CallError(f"Unable to change bandwidth limit: {e.errmsg}")
+
+        return True
+
     @accepts(roles=["CLOUD_SYNC_READ"])
     async def providers(self):
         """
@@ -1138,7 +1369,15 @@ class CloudSyncFSAttachmentDelegate(LockableFSAttachmentDelegate):
         await self.middleware.call('service.restart', 'cron')
 
 
+SETUP_DEPENDS = []
+
+
+async def __event_system_shutdown(middleware, event_type, args):
+    await CloudSyncService.rcd.stop()
+
+
 async def setup(middleware):
     await middleware.call('pool.dataset.register_attachment_delegate', CloudSyncFSAttachmentDelegate(middleware))
     await middleware.call('network.general.register_activity', 'cloud_sync', 'Cloud sync')
     await middleware.call('cloudsync.persist_task_state_on_job_complete')
+    middleware.event_subscribe('system.shutdown', __event_system_shutdown)
@@ -1,7 +1,19 @@
+from middlewared.plugins.etc import RE_WRITTEN_TABLE
+
+from .query_utils import PARSED_CACHE
 from .utils import CERT_TYPE_EXISTING
 
+CERTIFICATE_TABLES = ('system_certificate', 'system_certificateauthority')
+
+
+def datastore_post_execute_write(middleware, sql, params, options):
+    if (match := RE_WRITTEN_TABLE.match(sql)) and match.group(1) in CERTIFICATE_TABLES:
+        PARSED_CACHE.clear()
+
 
 async def setup(middleware):
+    middleware.register_hook('datastore.post_execute_write', datastore_post_execute_write, inline=True)
+
     failure = False
     try:
         system_general_config = await middleware.call('system.general.config')
@@ -1,5 +1,7 @@
 import random
 
+from collections import Counter
+
 from middlewared.schema import accepts, Bool, Dict, Int, Patch, Str
 from middlewared.service import CRUDService, private, ValidationErrors
 import middlewared.sqlalchemy as sa
@@ -8,7 +10,7 @@ from .cert_entry import get_ca_result_entry
 from .common_validation import _validate_common_attributes, validate_cert_name
 from .key_utils import export_private_key
 from .load_utils import get_serial_from_certificate_safe, load_certificate
-from .query_utils import get_ca_chain, normalize_cert_attrs
+from .query_utils import get_ca_chain_impl, get_ca_chain_mappings, normalize_cert_attrs
 from .utils import (
     get_cert_info_from_data, _set_required, CA_TYPE_EXISTING, CA_TYPE_INTERNAL, CA_TYPE_INTERMEDIATE
 )
@@ -61,27 +63,29 @@ class CertificateAuthorityService(CRUDService):
             },
         }
 
-        signed_mapping = {}
-        for ca in context['cas'].values():
-            signed_mapping[ca['id']] = 0
-            for cert in context['certs'].values():
-                if cert['signedby'] and cert['signedby']['id'] == ca['id']:
-                    signed_mapping[ca['id']] += 1
-
-        context['signed_mapping'] = signed_mapping
+        context['signed_mapping'] = Counter(
+            cert['signedby']['id'] for cert in context['certs'].values() if cert['signedby']
+        )
+        context['ca_chain_mappings'] = get_ca_chain_mappings(context['certs'].values(), context['cas'].values())
+        # Signing CAs are only extended once even if they have signed multiple CAs
+        context['extended_cas'] = {}
         return context
 
     @private
     def cert_extend(self, cert, context):
         if cert['signedby']:
-            cert['signedby'] = self.cert_extend(context['cas'][cert['signedby']['id']], context)
+            signedby_id = cert['signedby']['id']
+            if signedby_id not in context['extended_cas']:
+                context['extended_cas'][signedby_id] = self.cert_extend(context['cas'][signedby_id], context)
+
+            cert['signedby'] = context['extended_cas'][signedby_id]
 
         normalize_cert_attrs(cert)
         cert['signed_certificates'] = context['signed_mapping'][cert['id']]
         cert.update({
             'revoked_certs': list(filter(
                 lambda c: c['revoked_date'],
-                get_ca_chain(cert['id'], context['certs'].values(), context['cas'].values())
+                get_ca_chain_impl(cert['id'], *context['ca_chain_mappings'])
             )),
         })
         return cert
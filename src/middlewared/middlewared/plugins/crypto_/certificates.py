@@ -65,8 +65,12 @@ class CertificateService(CRUDService):
 
     @private
     def cert_extend_context(self, rows, extra):
+        # Only signing CAs of the certificates being extended are needed
+        ca_ids = list({row['signedby']['id'] for row in rows if row['signedby']})
         context = {
-            'cas': {c['id']: c for c in self.middleware.call_sync('certificateauthority.query')},
+            'cas': {c['id']: c for c in self.middleware.call_sync(
+                'certificateauthority.query', [['id', 'in', ca_ids]], {'force_sql_filters': True},
+            )} if ca_ids else {},
         }
         return context
 
@@ -1,6 +1,10 @@
 import copy
+import datetime
+import hashlib
 import logging
 import os
+import threading
+import time
 
 from collections import defaultdict
 from cryptography.hazmat.primitives.asymmetric import dsa, ec, rsa
@@ -16,6 +20,41 @@ from .utils import (
 
 logger = logging.getLogger(__name__)
 CERT_REPORT_ERRORS = set()
+# Parsing results of at most this many certificates, certificate signing requests and private keys are cached
+PARSED_CACHE_SIZE = 1000
+
+
+class ParsedCache:
+    """
+    Results of parsing PEM encoded certificates, certificate signing requests and private keys keyed by the digest of
+    PEM. Certificate dates are formatted in the local timezone so it is a part of the key too.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = {}
+
+    def get(self, parse, pem):
+        key = (parse.__name__, time.tzname, hashlib.sha256(pem.encode()).digest())
+        with self.lock:
+            if key in self.entries:
+                return copy.deepcopy(self.entries[key])
+
+        result = parse(pem)
+
+        with self.lock:
+            self.entries[key] = result
+            while len(self.entries) > PARSED_CACHE_SIZE:
+                self.entries.pop(next(iter(self.entries)))
+
+        return copy.deepcopy(result)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+PARSED_CACHE = ParsedCache()
 
 
 def cert_extend_report_error(title: str, cert: dict) -> None:
@@ -37,6 +76,38 @@ def cert_issuer(cert: dict) -> Union[str, dict]:
     return issuer
 
 
+def load_certificate_cached(certificate: str) -> dict:
+    cert_data = PARSED_CACHE.get(load_certificate, certificate)
+    if cert_data:
+        # Certificate could have expired since it was parsed
+        cert_data['expired'] = datetime.datetime.now() > datetime.datetime.strptime(
+            cert_data['until'], '%a %b %d %H:%M:%S %Y'
+        )
+
+    return cert_data
+
+
+def private_key_info(privatekey: str) -> dict:
+    key_obj = load_private_key(privatekey)
+    if not key_obj:
+        return {}
+
+    if isinstance(key_obj, Ed25519PrivateKey):
+        key_length = 32
+    else:
+        key_length = key_obj.key_size
+    if isinstance(key_obj, (ec.EllipticCurvePrivateKey, Ed25519PrivateKey)):
+        key_type = 'EC'
+    elif isinstance(key_obj, rsa.RSAPrivateKey):
+        key_type = 'RSA'
+    elif isinstance(key_obj, dsa.DSAPrivateKey):
+        key_type = 'DSA'
+    else:
+        key_type = 'OTHER'
+
+    return {'key_length': key_length, 'key_type': key_type}
+
+
 def normalize_cert_attrs(cert: dict) -> None:
     # Remove ACME related keys if cert is not an ACME based cert
     if not cert.get('acme'):
@@ -90,7 +161,7 @@ def normalize_cert_attrs(cert: dict) -> None:
 
     failed_parsing = False
     for c in certs:
-        if c and load_certificate(c):
+        if c and load_certificate_cached(c):
             cert['chain_list'].append(c)
         else:
             cert_extend_report_error('certificate chain', cert)
@@ -98,32 +169,20 @@ def normalize_cert_attrs(cert: dict) -> None:
 
     if certs:
         # This indicates cert is not CSR and a cert
-        cert_data = load_certificate(cert['certificate'])
+        cert_data = load_certificate_cached(cert['certificate'])
         cert.update(cert_data)
         if not cert_data:
             failed_parsing = True
             cert_extend_report_error('certificate', cert)
 
     if cert['privatekey']:
-        key_obj = load_private_key(cert['privatekey'])
-        if key_obj:
-            if isinstance(key_obj, Ed25519PrivateKey):
-                cert['key_length'] = 32
-            else:
-                cert['key_length'] = key_obj.key_size
-            if isinstance(key_obj, (ec.EllipticCurvePrivateKey, Ed25519PrivateKey)):
-                cert['key_type'] = 'EC'
-            elif isinstance(key_obj, rsa.RSAPrivateKey):
-                cert['key_type'] = 'RSA'
-            elif isinstance(key_obj, dsa.DSAPrivateKey):
-                cert['key_type'] = 'DSA'
-            else:
-                cert['key_type'] = 'OTHER'
+        if key_info := PARSED_CACHE.get(private_key_info, cert['privatekey']):
+            cert.update(key_info)
         else:
             cert_extend_report_error('private key', cert)
 
     if cert['cert_type_CSR']:
-        csr_data = load_certificate_request(cert['CSR'])
+        csr_data = PARSED_CACHE.get(load_certificate_request, cert['CSR'])
         if csr_data:
             cert.update({
                 **csr_data,
@@ -149,6 +208,10 @@ def normalize_cert_attrs(cert: dict) -> None:
 
 
 def get_ca_chain(ca_id: int, certs: list, cas: list) -> list:
+    return get_ca_chain_impl(ca_id, *get_ca_chain_mappings(certs, cas))
+
+
+def get_ca_chain_mappings(certs: list, cas: list) -> tuple:
     cert_mapping = defaultdict(list)
     cas_mapping = defaultdict(list)
     cas_id_mapping = {}
@@ -160,7 +223,7 @@ def get_ca_chain(ca_id: int, certs: list, cas: list) -> list:
         if ca['signedby']:
             cas_mapping[ca['signedby']['id']].append(ca)
 
-    return get_ca_chain_impl(ca_id, cas_id_mapping, cert_mapping, cas_mapping)
+    return cas_id_mapping, cert_mapping, cas_mapping
 
 
 def get_ca_chain_impl(ca_id: int, cas: dict, certs_mapping: dict, cas_mapping: dict) -> list:
@@ -55,10 +55,26 @@ class DeviceService(Service):
         return get_disk_names()
 
     @private
-    def get_disks(self, get_partitions=False, serial_only=False):
+    def get_disks(self, get_partitions=False, serial_only=False, names=None):
+        """
+        `names` limits the enumeration to the specified disks. Disks that do not exist are omitted.
+        """
         ctx = pyudev.Context()
         disks = {}
-        for dev in ctx.list_devices(subsystem='block', DEVTYPE='disk'):
+        if names is None:
+            devices = ctx.list_devices(subsystem='block', DEVTYPE='disk')
+        else:
+            devices = []
+            for name in names:
+                try:
+                    dev = pyudev.Devices.from_name(ctx, 'block', name)
+                except pyudev.DeviceNotFoundByNameError:
+                    continue
+
+                if dev.device_type == 'disk':
+                    devices.append(dev)
+
+        for dev in devices:
             if dev.sys_name.startswith(DISKS_TO_IGNORE) or RE_NVME_PRIV.match(dev.sys_name):
                 continue
             if is_iscsi_device(dev):
@@ -1,30 +1,77 @@
+import asyncio
+import time
+
 from middlewared.utils.disks import DISKS_TO_IGNORE
 
 
-async def added_disk(middleware, disk_name):
-    await middleware.call('disk.sync', disk_name)
-    await middleware.call('disk.sed_unlock', disk_name)
-    await middleware.call('alert.oneshot_delete', 'SMART', disk_name)
+class DiskEventsProcessor:
+    """
+    Coalesces udev block device events so that a burst of them (i.e. an enclosure with a hundred of disks being
+    disconnected or connected back) results in a single incremental `disk.sync_all`.
+    """
+
+    # Disks are synchronized once no new events were received for `DEBOUNCE` seconds but, if the events keep coming,
+    # no later than `MAX_DELAY` seconds after the first event of the burst.
+    DEBOUNCE = 2
+    MAX_DELAY = 10
+
+    def __init__(self, middleware):
+        self.middleware = middleware
+        self.pending = {}
+        self.received = asyncio.Event()
+        self.task = None
+
+    async def udev_block_devices_hook(self, middleware, data):
+        if data.get('SUBSYSTEM') != 'block':
+            return
+        elif data.get('DEVTYPE') != 'disk':
+            return
+        elif data['SYS_NAME'].startswith(DISKS_TO_IGNORE):
+            return
+
+        if data['ACTION'] in ('add', 'remove'):
+            self.add_event(data['ACTION'], data['SYS_NAME'])
+
+    def add_event(self, action, disk_name):
+        # Only the last action matters (i.e. a disk that was removed and then added back needs to be synced as added)
+        self.pending.pop(disk_name, None)
+        self.pending[disk_name] = action
+        self.received.set()
+
+        if self.task is None:
+            self.task = self.middleware.create_task(self.run())
+
+    async def run(self):
+        try:
+            while self.pending:
+                await self.debounce()
 
+                pending, self.pending = self.pending, {}
+                try:
+                    await self.process(pending)
+                except Exception:
+                    self.middleware.logger.error('Failed to process disk events', exc_info=True)
+        finally:
+            self.task = None
 
-async def remove_disk(middleware, disk_name):
-    await (await middleware.call('disk.sync_all')).wait()
-    await middleware.call('alert.oneshot_delete', 'SMART', disk_name)
+    async def debounce(self):
+        deadline = time.monotonic() + self.MAX_DELAY
+        while (timeout := min(self.DEBOUNCE, deadline - time.monotonic())) > 0:
+            self.received.clear()
+            try:
+                await asyncio.wait_for(self.received.wait(), timeout)
+            except asyncio.TimeoutError:
+                return
 
+    async def process(self, pending):
+        await (await self.middleware.call('disk.sync_all', {'disks': list(pending)})).wait()
 
-async def udev_block_devices_hook(middleware, data):
-    if data.get('SUBSYSTEM') != 'block':
-        return
-    elif data.get('DEVTYPE') != 'disk':
-        return
-    elif data['SYS_NAME'].startswith(DISKS_TO_IGNORE):
-        return
+        for disk_name, action in pending.items():
+            if action == 'add':
+                await self.middleware.call('disk.sed_unlock', disk_name)
 
-    if data['ACTION'] == 'add':
-        await added_disk(middleware, data['SYS_NAME'])
-    elif data['ACTION'] == 'remove':
-        await remove_disk(middleware, data['SYS_NAME'])
+            await self.middleware.call('alert.oneshot_delete', 'SMART', disk_name)
 
 
 def setup(middleware):
-    middleware.register_hook('udev.block', udev_block_devices_hook)
+    middleware.register_hook('udev.block', DiskEventsProcessor(middleware).udev_block_devices_hook)
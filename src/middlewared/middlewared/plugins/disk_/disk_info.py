@@ -169,6 +169,22 @@ class DiskService(Service):
         else:
             return partition_or_disk
 
+    @private
+    def labels_to_disks(self, labels):
+        """
+        Bulk version of `label_to_dev` and `label_to_disk`. Returns a dict mapping each label to a
+        (device, disk) tuple.
+        """
+        result = {}
+        for label in labels:
+            device = disk = self.label_to_dev(label)
+            if device is not None and os.path.exists(os.path.join('/sys/class/block', device, 'partition')):
+                disk = self.get_disk_from_partition(device)
+
+            result[label] = (device, disk)
+
+        return result
+
     @private
     def get_disk_from_partition(self, part_name):
         if not os.path.exists(os.path.join('/dev', part_name)):
@@ -1,19 +1,17 @@
-import re
 from datetime import timedelta
 
-from middlewared.schema import accepts, Bool, Dict, Str
+from middlewared.schema import accepts, Bool, Dict, List, Str
 from middlewared.service import job, private, Service, ServiceChangeMixin
-from middlewared.utils.disks import dev_to_ident
+from middlewared.utils.disks import dev_to_ident, DiskInventory
 from middlewared.utils.time_utils import utc_now
 
 
-RE_IDENT = re.compile(r'^\{(?P<type>.+?)\}(?P<value>.+)$')
-
-
 class DiskService(Service, ServiceChangeMixin):
 
     DISK_EXPIRECACHE_DAYS = 7
 
+    inventory = None
+
     @private
     @accepts(Str('name'))
     async def sync(self, name):
@@ -24,7 +22,7 @@ class DiskService(Service, ServiceChangeMixin):
             if await self.middleware.call('failover.status') == 'BACKUP':
                 return
 
-        disks = await self.middleware.call('device.get_disks')
+        disks = await self.middleware.call('device.get_disks', False, False, [name])
         # Abort if the disk is not recognized as an available disk
         if name not in disks:
             return
@@ -78,21 +76,7 @@ class DiskService(Service, ServiceChangeMixin):
 
     @private
     def ident_to_dev(self, ident, sys_disks):
-        if not ident or not (search := RE_IDENT.search(ident)):
-            return
-
-        tp = search.group('type')
-        value = search.group('value')
-        mapping = {'uuid': 'uuid', 'devicename': 'name', 'serial_lunid': 'serial_lunid', 'serial': 'serial'}
-        if tp not in mapping:
-            return
-
-        for disk, info in sys_disks.items():
-            if tp == 'uuid':
-                for part in filter(lambda x: x['partition_uuid'] == value, info['parts']):
-                    return part['disk']
-            elif info.get(mapping[tp]) == value:
-                return disk
+        return DiskInventory(sys_disks).ident_to_dev(ident)
 
     @private
     def dev_to_ident(self, name, sys_disks):
@@ -102,11 +86,16 @@ class DiskService(Service, ServiceChangeMixin):
     @accepts(Dict(
         'options',
         Bool('zfs_guid', default=False),
+        List('disks', items=[Str('disk')], null=True, default=None),
     ))
     @job(lock='disk.sync_all')
     def sync_all(self, job, opts):
         """
         Synchronize all disks with the cache in database.
+
+        `disks` is a list of disks that were added or removed since the last synchronization. When specified (and
+        the system disks were enumerated before), only these disks will be re-read and the rest of the system disks
+        information will be taken from the in-memory disk inventory.
         """
         # Skip sync disks on standby node
         licensed = self.middleware.call_sync('failover.licensed')
@@ -115,8 +104,20 @@ class DiskService(Service, ServiceChangeMixin):
             if status == 'BACKUP':
                 return
 
-        job.set_progress(10, 'Enumerating system disks')
-        sys_disks = self.middleware.call_sync('device.get_disks', True)
+        if opts['disks'] is not None and self.inventory is not None:
+            job.set_progress(10, 'Updating system disks inventory')
+            updated = self.middleware.call_sync('device.get_disks', True, False, opts['disks'])
+            for name in opts['disks']:
+                if name in updated:
+                    self.inventory.update(name, updated[name])
+                else:
+                    self.inventory.remove(name)
+        else:
+            job.set_progress(10, 'Enumerating system disks')
+            self.inventory = DiskInventory(self.middleware.call_sync('device.get_disks', True))
+
+        inventory = self.inventory
+        sys_disks = inventory.disks
         number_of_disks = self.log_disk_info(sys_disks)
 
         job.set_progress(20, 'Enumerating disk information from database')
@@ -135,8 +136,8 @@ class DiskService(Service, ServiceChangeMixin):
 
             original_disk = disk.copy()
 
-            name = self.ident_to_dev(disk['disk_identifier'], sys_disks)
-            if not name or self.dev_to_ident(name, sys_disks) != disk['disk_identifier']:
+            name = inventory.ident_to_dev(disk['disk_identifier'])
+            if not name or inventory.dev_to_ident(name) != disk['disk_identifier']:
                 # 1. can't translate identitifer to device
                 # 2. or can't translate device to identifier
                 if not disk['disk_expiretime']:
@@ -179,13 +180,14 @@ class DiskService(Service, ServiceChangeMixin):
         progress_percent = 70
         for name in filter(lambda x: x not in seen_disks, sys_disks):
             progress_percent += increment
-            disk_identifier = self.dev_to_ident(name, sys_disks)
+            disk_identifier = inventory.dev_to_ident(name)
             if qs is None:
-                qs = self.middleware.call_sync('datastore.query', 'storage.disk')
+                qs = {}
+                for i in self.middleware.call_sync('datastore.query', 'storage.disk'):
+                    qs.setdefault(i['disk_identifier'], i)
 
-            if disk := [i for i in qs if i['disk_identifier'] == disk_identifier]:
+            if disk := qs.get(disk_identifier):
                 new = False
-                disk = disk[0]
                 job.set_progress(progress_percent, f'Updating disk {name!r}')
             else:
                 new = True
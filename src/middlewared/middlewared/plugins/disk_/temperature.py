@@ -2,6 +2,7 @@ import asyncio
 import datetime
 import time
 import json
+from collections import defaultdict, deque
 
 import async_timeout
 
@@ -9,13 +10,20 @@ from middlewared.api import api_method
 from middlewared.api.current import DiskTemperatureAlertsArgs, DiskTemperatureAlertsResult
 from middlewared.common.smart.smartctl import SMARTCTL_POWERMODES
 from middlewared.schema import accepts, Bool, Dict, Int, List, returns, Str
-from middlewared.service import private, Service
+from middlewared.service import periodic, private, Service
 from middlewared.utils.asyncio_ import asyncio_map
 from middlewared.utils.disk_temperatures import parse_smartctl_for_temperature_output
 
 
+# Must be less than the default `disk.temperatures` cache time so that periodic consumers never miss the snapshot
+SMART_COLLECT_INTERVAL = 240
+SMART_HISTORY_SIZE = 24
+
+
 class DiskService(Service):
     cache = {}
+    smart_snapshot = {}
+    temperature_history = defaultdict(lambda: deque(maxlen=SMART_HISTORY_SIZE))
 
     @private
     async def disks_for_temperature_monitoring(self):
@@ -65,12 +73,69 @@ class DiskService(Service):
     @private
     async def temperature_uncached(self, name, powermode):
         if output := await self.middleware.call('disk.smartctl', name, ['-a', '-n', powermode.lower(), '--json=c'], {'silent': True}):
-            return parse_smartctl_for_temperature_output(json.loads(output))
+            data = json.loads(output)
+            await self.smart_snapshot_update(name, data)
+            return parse_smartctl_for_temperature_output(data)
 
     @private
     async def reset_temperature_cache(self):
         self.cache = {}
 
+    @periodic(SMART_COLLECT_INTERVAL, run_on_start=False)
+    @private
+    async def smart_collect(self):
+        """
+        Periodically read S.M.A.R.T. data of all the monitored disks (respecting configured S.M.A.R.T. power mode so
+        that sleeping disks are not spun up) and store it so that `disk.temperature(s)` and `smart.test.results`
+        can be served without running `smartctl` for each disk on every call.
+        """
+        powermode = (await self.middleware.call('smart.config'))['powermode']
+        await asyncio_map(
+            lambda name: self.smart_collect_disk(name, powermode),
+            await self.disks_for_temperature_monitoring(),
+            semaphore=self.temperatures_semaphore,
+        )
+
+        # Forget disks that are gone
+        now = time.monotonic()
+        for name, entry in list(self.smart_snapshot.items()):
+            if entry['time'] < now - 3 * SMART_COLLECT_INTERVAL:
+                self.smart_snapshot.pop(name, None)
+                self.temperature_history.pop(name, None)
+
+    @private
+    async def smart_collect_disk(self, name, powermode=SMARTCTL_POWERMODES[0]):
+        # `smartctl` fails when the disk is in the specified power mode (or lower) and we just keep the old data
+        args = ['-a', '-n', powermode.lower(), '--json=c']
+        if output := await self.middleware.call('disk.smartctl', name, args, {'silent': True}):
+            await self.smart_snapshot_update(name, json.loads(output))
+
+    @private
+    async def smart_snapshot_update(self, name, data):
+        now = time.monotonic()
+        self.smart_snapshot[name] = {'time': now, 'data': data}
+
+        try:
+            temperature = parse_smartctl_for_temperature_output(data)
+        except (KeyError, TypeError):
+            temperature = None
+
+        self.cache[name] = (temperature, now)
+        if temperature is not None:
+            self.temperature_history[name].append((round(time.time()), temperature))
+
+    @private
+    async def smart_snapshot_get(self, name, max_age):
+        """
+        Returns `smartctl -a --json` output for the disk `name` if it was retrieved within `max_age` seconds.
+        """
+        if (entry := self.smart_snapshot.get(name)) and entry['time'] > time.monotonic() - max_age:
+            return entry['data']
+
+    @private
+    async def smart_snapshot_invalidate(self, name):
+        self.smart_snapshot.pop(name, None)
+
     temperatures_semaphore = asyncio.BoundedSemaphore(8)
 
     @accepts(
@@ -97,6 +162,8 @@ class DiskService(Service):
         Returns temperatures for a list of devices (runs in parallel).
         See `disk.temperature` documentation for more details.
         If `only_cached` is specified then this method only returns disk temperatures that exist in cache.
+        Temperatures are collected in the background every few minutes, so with the default `cache` value disks are
+        only queried if they could not be read during the last collection.
         """
         if len(names) == 0:
             names = await self.disks_for_temperature_monitoring()
@@ -139,6 +206,16 @@ class DiskService(Service):
                     'avg': disk['aggregations']['mean'].get('temperature_value', None),
                 }
 
+        # Reporting has no data for these disks yet (i.e. they were just added), use what S.M.A.R.T. collector has
+        since = time.time() - days * 86400
+        for name in filter(lambda name: name not in final, names):
+            if temperatures := [t for timestamp, t in self.temperature_history.get(name, []) if timestamp >= since]:
+                final[name] = {
+                    'min': min(temperatures),
+                    'max': max(temperatures),
+                    'avg': sum(temperatures) / len(temperatures),
+                }
+
         return final
 
     @api_method(DiskTemperatureAlertsArgs, DiskTemperatureAlertsResult, roles=['REPORTING_READ'])
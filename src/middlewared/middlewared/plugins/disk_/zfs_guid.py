@@ -21,25 +21,28 @@ class DiskService(Service):
         Since type is inconsistent for this value, it cannot be used
         for ordering disks using builtin sorted() method in filter_list.
         """
-        disk = None
+        return (await self.disks_by_zfs_guid([guid])).get(guid)
 
-        disks_with_zfs_guid = await self.middleware.call(
+    @private
+    async def disks_by_zfs_guid(self, guids):
+        """
+        Bulk version of `disk_by_zfs_guid`. Returns a dict mapping ZFS guid to disk entry for
+        every guid that has one.
+        """
+        disks = {}
+        for entry in await self.middleware.call(
             "disk.query",
-            [["zfs_guid", "=", guid]],
+            [["zfs_guid", "in", list(guids)]],
             {"extra": {"include_expired": True}},
-        )
-
-        for entry in disks_with_zfs_guid:
-            if entry['expiretime'] is None:
-                disk = entry
-                break
+        ):
+            disk = disks.get(entry["zfs_guid"])
+            if disk is not None and disk["expiretime"] is None:
+                continue
 
-            if disk is None:
-                disk = entry
-            elif entry['expiretime'] > disk['expiretime']:
-                disk = entry
+            if disk is None or entry["expiretime"] is None or entry["expiretime"] > disk["expiretime"]:
+                disks[entry["zfs_guid"]] = entry
 
-        return disk
+        return disks
 
     @private
     async def sync_all_zfs_guid(self):
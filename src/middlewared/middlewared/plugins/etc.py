@@ -1,7 +1,11 @@
 import asyncio
 from collections import defaultdict
+import hashlib
 import imp
+import json
 import os
+import re
+import time
 
 from mako import exceptions
 from middlewared.service import CallError, Service
@@ -10,6 +14,7 @@ from middlewared.utils.mako import get_template
 
 DEFAULT_ETC_PERMS = 0o644
 DEFAULT_ETC_XID = 0
+RE_WRITTEN_TABLE = re.compile(r'^\s*(?:INSERT(?:\s+OR\s+\w+)?\s+INTO|UPDATE|DELETE\s+FROM)\s+"?(\w+)"?', re.IGNORECASE)
 
 
 class FileShouldNotExist(Exception):
@@ -78,6 +83,7 @@ class EtcService(Service):
             'ctx': [
                 {'method': 'user.query', 'args': [[['local', '=', True]]]},
             ],
+            'depends': [],
             'entries': [
                 {'type': 'mako', 'path': 'shadow', 'group': 'shadow', 'mode': 0o0640},
             ]
@@ -170,6 +176,7 @@ class EtcService(Service):
                 {'method': 'activedirectory.config'},
                 {'method': 'ldap.config'},
             ],
+            'depends': [],
             'entries': [
                 {'type': 'mako', 'path': 'pam.d/common-account'},
                 {'type': 'mako', 'path': 'pam.d/common-auth'},
@@ -299,6 +306,7 @@ class EtcService(Service):
             'ctx': [
                 {'method': 'smb.generate_smb_configuration'},
             ],
+            'depends': [],
             'entries': [
                 {'type': 'mako', 'path': 'local/smb4.conf'},
             ]
@@ -362,6 +370,13 @@ class EtcService(Service):
             {'type': 'mako', 'path': 'subgid', 'checkpoint': None},
         ],
     }
+    # Groups that specify `depends` declare that their entries are rendered only from `ctx` and the
+    # listed datastore tables (i.e. templates do not read any other state and have no side effects).
+    # Rendered output of these groups is cached and rendering is skipped while neither the gathered
+    # `ctx` nor the tables have changed.
+    DEPENDS_TABLES = frozenset(
+        table for group in GROUPS.values() if isinstance(group, dict) for table in group.get('depends', [])
+    )
     LOCKS = defaultdict(asyncio.Lock)
 
     checkpoints = ['initial', 'interface_sync', 'post_init', 'pool_import', 'pre_interface_sync']
@@ -378,17 +393,47 @@ class EtcService(Service):
             'mako': MakoRenderer(self),
             'py': PyRenderer(self),
         }
+        self.render_cache = {}
+        self.table_generations = defaultdict(int)
+        self.render_timings = {}
 
     async def gather_ctx(self, methods):
-        rv = {}
+        keys = []
+        calls = []
         for m in methods:
             method = m['method']
             args = m.get('args', [])
             prefix = m.get('ctx_prefix', None)
-            key = f'{prefix}.{method}' if prefix else method
-            rv[key] = await self.middleware.call(method, *args)
+            keys.append(f'{prefix}.{method}' if prefix else method)
+            calls.append(self.middleware.call(method, *args))
 
-        return rv
+        return dict(zip(keys, await asyncio.gather(*calls)))
+
+    def render_cache_key(self, group, ctx):
+        """
+        Digest of all inputs of a group that declares its dependencies. None if the group
+        can not be cached.
+        """
+        if not isinstance(group, dict) or 'depends' not in group:
+            return None
+
+        generations = [self.table_generations[table] for table in group['depends']]
+        try:
+            payload = json.dumps([ctx, generations], sort_keys=True, default=str)
+        except (TypeError, ValueError):
+            return None
+
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def table_written(self, table):
+        self.table_generations[table] += 1
+
+    async def timings(self):
+        """
+        Duration (in seconds) of gathering context and rendering entries of last generation of
+        each group along with number of entries that were rendered from cache.
+        """
+        return self.render_timings
 
     def get_perms_and_ownership(self, entry):
         user_name = entry.get('owner')
@@ -433,6 +478,7 @@ class EtcService(Service):
 
         output = []
         async with self.LOCKS[name]:
+            started_at = time.monotonic()
             if isinstance(group, dict):
                 ctx = await self.gather_ctx(group['ctx'])
                 entries = group['entries']
@@ -440,6 +486,13 @@ class EtcService(Service):
                 ctx = None
                 entries = group
 
+            gathered_at = time.monotonic()
+            cache_key = self.render_cache_key(group, ctx)
+            if cache_key is None or self.render_cache.get(name, {}).get('key') != cache_key:
+                self.render_cache[name] = {'key': cache_key, 'entries': {}}
+            cached_entries = self.render_cache[name]['entries']
+            cached = 0
+
             for entry in entries:
                 renderer = self._renderers.get(entry['type'])
                 if renderer is None:
@@ -457,7 +510,20 @@ class EtcService(Service):
                 outfile = f'/etc/{entry_path}'
 
                 try:
-                    rendered = await renderer.render(path, ctx)
+                    if cache_key is not None and entry['path'] in cached_entries:
+                        rendered = cached_entries[entry['path']]
+                        cached += 1
+                    else:
+                        try:
+                            rendered = await renderer.render(path, ctx)
+                        except FileShouldNotExist:
+                            rendered = FileShouldNotExist
+
+                        if cache_key is not None:
+                            cached_entries[entry['path']] = rendered
+
+                    if rendered is FileShouldNotExist:
+                        raise FileShouldNotExist()
                 except FileShouldNotExist:
                     try:
                         await self.middleware.run_in_thread(os.unlink, outfile)
@@ -493,6 +559,12 @@ class EtcService(Service):
                         'changes': FileChanges.dump(changes)
                     })
 
+            self.render_timings[name] = {
+                'gather': gathered_at - started_at,
+                'render': time.monotonic() - gathered_at,
+                'cached': cached,
+            }
+
         return output
 
     async def generate_checkpoint(self, checkpoint):
@@ -509,6 +581,11 @@ class EtcService(Service):
         return self.checkpoints
 
 
+def datastore_post_execute_write(middleware, sql, params, options):
+    if (match := RE_WRITTEN_TABLE.match(sql)) and match.group(1) in EtcService.DEPENDS_TABLES:
+        middleware.call_sync('etc.table_written', match.group(1))
+
+
 async def __event_system_ready(middleware, event_type, args):
     middleware.create_task(middleware.call('etc.generate_checkpoint', 'post_init'))
 
@@ -519,6 +596,7 @@ async def pool_post_import(middleware, pool):
 
 
 async def setup(middleware):
+    middleware.register_hook('datastore.post_execute_write', datastore_post_execute_write, inline=True)
     middleware.event_subscribe('system.ready', __event_system_ready)
     # Generate `etc` files before executing other post-boot-time-pool-import actions.
     # There are no explicit requirements for that, we are just preserving execution order
@@ -1,15 +1,18 @@
 import binascii
 import errno
 import functools
+import json
 import os
 import pathlib
+import secrets
 import shutil
 import stat as statlib
+import threading
 import time
 
 import pyinotify
 
-from itertools import product
+from itertools import islice, product
 from middlewared.event import EventSource
 from middlewared.plugins.pwenc import PWENC_FILE_SECRET, PWENC_FILE_SECRET_MODE
 from middlewared.plugins.docker.state_utils import IX_APPS_DIR_NAME
@@ -24,6 +27,17 @@ from middlewared.utils.filesystem.utils import timespec_convert_float
 from middlewared.utils.mount import getmntinfo
 from middlewared.utils.nss import pwd, grp
 from middlewared.utils.path import FSLocation, path_location, is_child_realpath
+from middlewared.validators import Range
+
+LISTDIR_CHUNK_SIZE = 1000
+LISTDIR_CURSOR_MAX = 64
+LISTDIR_CURSOR_TIMEOUT = 300
+
+
+def listdir_filtered(d_iter, filters, chunk_size=LISTDIR_CHUNK_SIZE):
+    """ Yield directory entries that match `filters` without reading the whole directory first """
+    while chunk := list(islice(d_iter, chunk_size)):
+        yield from filter_list(chunk, filters)
 
 
 class FilesystemService(Service):
@@ -31,6 +45,9 @@ class FilesystemService(Service):
     class Config:
         cli_private = True
 
+    listdir_cursors = {}
+    listdir_cursors_lock = threading.Lock()
+
     @accepts(Dict(
         'set_zfs_file_attributes',
         Path('path', required=True),
@@ -282,6 +299,20 @@ class FilesystemService(Service):
           zfs_attrs(list): list of ZFS file attributes on file
         """
 
+        d_iter, filters = self._listdir_iterator(path, filters, options)
+        with d_iter:
+            if (
+                options.get('limit') and
+                not any(options.get(k) for k in ('count', 'get', 'order_by'))
+            ):
+                # Stop reading the directory as soon as the requested page is complete
+                wanted = options.get('offset', 0) + options['limit']
+                entries = list(islice(listdir_filtered(d_iter, filters, min(wanted, LISTDIR_CHUNK_SIZE)), wanted))
+                return filter_list(entries, [], options)
+
+            return filter_list(d_iter, filters, options)
+
+    def _listdir_iterator(self, path, filters, options):
         path = pathlib.Path(path)
         if not path.exists():
             raise CallError(f'Directory {path} does not exist', errno.ENOENT)
@@ -327,10 +358,128 @@ class FilesystemService(Service):
             # prevent shares from being configured to point to
             # a path that doesn't exist on a zpool, we'll
             # filter these here.
-            filters.extend([['is_mountpoint', '=', True], ['name', '!=', IX_APPS_DIR_NAME]])
+            filters = filters + [['is_mountpoint', '=', True], ['name', '!=', IX_APPS_DIR_NAME]]
 
-        with DirectoryIterator(path, file_type=file_type, request_mask=request_mask) as d_iter:
-            return filter_list(d_iter, filters, options)
+        return DirectoryIterator(path, file_type=file_type, request_mask=request_mask), filters
+
+    @accepts(
+        Str('path', required=True),
+        Ref('query-filters'),
+        Dict(
+            'listdir_cursor_options',
+            Str('cursor', null=True, default=None),
+            Int('limit', default=LISTDIR_CHUNK_SIZE, validators=[Range(min_=1, max_=10 * LISTDIR_CHUNK_SIZE)]),
+            List('select'),
+        ),
+        roles=['FILESYSTEM_ATTRS_READ']
+    )
+    @returns(Dict(
+        'listdir_cursor_page',
+        List('entries', items=[Ref('path_entry')], required=True),
+        Str('cursor', null=True, required=True),
+    ))
+    def listdir_cursor(self, path, filters, options):
+        """
+        Get the contents of a directory page by page.
+
+        Unlike `filesystem.listdir`, this does not read the whole directory before returning the results, so it
+        should be used to list directories with a large number of entries.
+
+        The first call returns up to `limit` entries that match `filters` and a `cursor` that should be passed
+        (together with the same `path`) to retrieve the next page. `filters` and `select` of the first call are used
+        for all subsequent pages. `cursor` is null when there are no more entries.
+
+        Cursors that are not used for 5 minutes expire. Entries are returned in the order in which they are stored
+        in the directory.
+        """
+        if options['cursor'] is None:
+            d_iter, filters = self._listdir_iterator(path, filters, {'select': options['select']})
+            state = {
+                'path': path,
+                'iter': listdir_filtered(d_iter, filters),
+                'close': functools.partial(d_iter.close, force=True),
+                'select': options['select'],
+            }
+        else:
+            with self.listdir_cursors_lock:
+                state = self.listdir_cursors.pop(options['cursor'], None)
+
+            if state is None:
+                raise CallError('Cursor does not exist or has expired', errno.ENOENT)
+
+            if state['path'] != path:
+                state['close']()
+                raise CallError('Cursor does not belong to this path', errno.EINVAL)
+
+        try:
+            entries = list(islice(state['iter'], options['limit']))
+        except Exception:
+            state['close']()
+            raise
+
+        if len(entries) < options['limit']:
+            state['close']()
+            cursor = None
+        else:
+            cursor = self._listdir_cursor_store(state)
+
+        if state['select']:
+            entries = filter_list(entries, [], {'select': state['select']})
+
+        return {'entries': entries, 'cursor': cursor}
+
+    def _listdir_cursor_store(self, state):
+        now = time.monotonic()
+        state['last_used'] = now
+        cursor = secrets.token_hex(16)
+        with self.listdir_cursors_lock:
+            expired = [
+                k for k, v in self.listdir_cursors.items() if v['last_used'] < now - LISTDIR_CURSOR_TIMEOUT
+            ]
+            if len(self.listdir_cursors) - len(expired) >= LISTDIR_CURSOR_MAX:
+                # Drop the least recently used cursor
+                expired.append(min(self.listdir_cursors, key=lambda k: self.listdir_cursors[k]['last_used']))
+
+            for k in expired:
+                if (expired_state := self.listdir_cursors.pop(k, None)) is not None:
+                    expired_state['close']()
+
+            self.listdir_cursors[cursor] = state
+
+        return cursor
+
+    @accepts(
+        Str('path', required=True),
+        Ref('query-filters'),
+        Dict(
+            'listdir_stream_options',
+            List('select'),
+        ),
+        roles=['FILESYSTEM_ATTRS_READ']
+    )
+    @returns(Int('entries'))
+    @job(pipes=['output'])
+    def listdir_stream(self, job, path, filters, options):
+        """
+        Write the contents of a directory to the output pipe as newline-delimited JSON (one `filesystem.listdir`
+        entry per line) as it is being read. Returns the number of written entries.
+
+        Please refer to websocket documentation for downloading the file.
+        """
+        d_iter, filters = self._listdir_iterator(path, filters, options)
+        count = 0
+        with d_iter:
+            for entry in listdir_filtered(d_iter, filters):
+                if options['select']:
+                    entry = filter_list([entry], [], {'select': options['select']})[0]
+
+                job.pipes.output.w.write(json.dumps(entry).encode() + b'\n')
+                count += 1
+                if count % LISTDIR_CHUNK_SIZE == 0:
+                    job.set_progress(None, f'{count} entries listed')
+
+        job.set_progress(100, f'{count} entries listed')
+        return count
 
     @accepts(Str('path'), roles=['FILESYSTEM_ATTRS_READ'])
     @returns(Dict(
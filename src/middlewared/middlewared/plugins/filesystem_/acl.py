@@ -1,6 +1,9 @@
+import copy
 import errno
 import json
 import os
+import secrets
+import shutil
 import subprocess
 from pathlib import Path
 
@@ -17,6 +20,7 @@ from middlewared.service import private, job, ValidationErrors, Service
 from middlewared.service_exception import CallError, MatchNotFound, ValidationError
 from middlewared.utils.filesystem.acl import (
     ACL_UNDEFINED_ID,
+    ACLXattr,
     FS_ACL_Type,
     NFS4ACE_Tag,
     POSIXACE_Tag,
@@ -25,6 +29,7 @@ from middlewared.utils.filesystem.acl import (
     strip_acl_path,
     validate_nfs4_ace_full,
 )
+from middlewared.utils.filesystem.acl_tree import AclTemplate, AclTreeConfig, apply_acl_tree
 from middlewared.utils.filesystem.directory import directory_is_empty
 from middlewared.utils.path import FSLocation, path_location
 from .utils import acltool, AclToolAction, calculate_inherited_acl, canonicalize_nfs4_acl, gen_aclstring_posix1e
@@ -515,10 +520,102 @@ class FilesystemService(Service):
             job.set_progress(100, 'Finished setting NFSv4 ACL.')
             return
 
-        acltool(data['path'], action, data['uid'], data['gid'], data['options'])
+        self.setacl_recursive(job, data['path'], FS_ACL_Type.NFS4, action, data['uid'], data['gid'], data['options'])
 
         job.set_progress(100, 'Finished setting NFSv4 ACL.')
 
+    @private
+    def acl_templates(self, path, acltype):
+        """
+        Generate raw ACL xattrs that entries below `path` inherit from ACL of `path`.
+
+        Inherited ACLs are set by the regular tools on a temporary directory and file
+        created in `path` and read back. Both first level and deeper entries are generated
+        since they differ for NFSv4 entries with NO_PROPAGATE_INHERIT flag.
+        """
+        if acltype == FS_ACL_Type.NFS4:
+            xattrs = {'dir': [ACLXattr.ZFS_NATIVE], 'file': [ACLXattr.ZFS_NATIVE]}
+        else:
+            xattrs = {'dir': [ACLXattr.POSIX_ACCESS, ACLXattr.POSIX_DEFAULT], 'file': [ACLXattr.POSIX_ACCESS]}
+
+        parent_acl = self.getacl(path, False, False)
+        tmpdir = os.path.join(path, f'.setacl_{secrets.token_hex(8)}')
+        os.mkdir(tmpdir, 0o700)
+        try:
+            templates = []
+            for depth in range(2):
+                template = {}
+                for entry_type in ('dir', 'file'):
+                    acl = calculate_inherited_acl(parent_acl, entry_type == 'dir')
+                    if not acl:
+                        raise CallError(f'{path}: ACL does not contain inheritable entries')
+
+                    target = os.path.join(tmpdir, f'{entry_type}{depth}')
+                    if entry_type == 'dir':
+                        os.mkdir(target)
+                    else:
+                        os.close(os.open(target, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+
+                    if acltype == FS_ACL_Type.NFS4:
+                        self.setacl_nfs4_internal(target, acl, False, ValidationErrors())
+                    else:
+                        verrors = ValidationErrors()
+                        aclstring = gen_aclstring_posix1e(copy.deepcopy(acl), False, verrors)
+                        verrors.check()
+                        setfacl = subprocess.run(
+                            ['setfacl', '--set', aclstring, target], check=False, capture_output=True
+                        )
+                        if setfacl.returncode != 0:
+                            raise CallError(f'Failed to set ACL [{aclstring}] on path [{target}]: '
+                                            f'{setfacl.stderr.decode()}')
+
+                    # raises ENODATA if ACL is trivial. Mode would have to be applied separately then.
+                    template[entry_type] = {xat: os.getxattr(target, xat) for xat in xattrs[entry_type]}
+                    if entry_type == 'dir':
+                        next_parent_acl = parent_acl | {'acl': acl}
+
+                templates.append(AclTemplate(**template))
+                parent_acl = next_parent_acl
+        finally:
+            shutil.rmtree(tmpdir)
+
+        return tuple(templates)
+
+    @private
+    def setacl_recursive(self, job, path, acltype, action, uid, gid, options):
+        """
+        Apply ACL of `path` recursively. ACL is applied directly by parallel tree walk
+        with progress reporting if possible and by acltool otherwise.
+        """
+        job.set_progress(10, f'Recursively setting ACL on {path}.')
+        if action == AclToolAction.CLONE:
+            try:
+                templates = self.acl_templates(path, acltype)
+            except Exception:
+                self.logger.debug('%s: failed to generate ACL templates. Using acltool.', path, exc_info=True)
+            else:
+                os.chown(path, uid, gid)
+                try:
+                    stats = apply_acl_tree(path, AclTreeConfig(
+                        templates=templates,
+                        uid=uid,
+                        gid=gid,
+                        traverse=options['traverse'],
+                        skip_unchanged=options.get('skip_unchanged', False),
+                        job=job,
+                    ))
+                except OSError as e:
+                    if e.errno != errno.EOPNOTSUPP:
+                        raise
+
+                    # child dataset with different ACL type
+                    self.logger.debug('%s: failed to apply ACL recursively. Using acltool.', path, exc_info=True)
+                else:
+                    self.logger.debug('%s: applied ACL recursively: %r', path, stats)
+                    return
+
+        acltool(path, action, uid, gid, options)
+
     @private
     def setacl_posix1e(self, job, current_acl, data):
         job.set_progress(0, 'Preparing to set acl.')
@@ -576,7 +673,7 @@ class FilesystemService(Service):
             return
 
         options['posixacl'] = True
-        acltool(data['path'], action, data['uid'], data['gid'], options)
+        self.setacl_recursive(job, data['path'], FS_ACL_Type.POSIX1E, action, data['uid'], data['gid'], options)
 
         job.set_progress(100, 'Finished setting POSIX1e ACL.')
 
@@ -620,6 +717,9 @@ class FilesystemService(Service):
 
         `traverse` traverse filestem boundaries (ZFS datasets)
 
+        `skip_unchanged` do not rewrite ACLs of files that already have the ACL being applied
+        during recursive operation
+
         `strip` convert ACL to trivial. ACL is trivial if it can be expressed as a file mode without
         losing any access rules.
 
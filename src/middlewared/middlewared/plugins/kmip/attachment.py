@@ -22,6 +22,9 @@ class KMIPServicePortDelegate(ServicePortDelegate):
     title = 'KMIP Service'
 
 
+SETUP_DEPENDS = []
+
+
 async def setup(middleware):
     await middleware.call('certificate.register_attachment_delegate', KmipCertificateAttachment(middleware))
     await middleware.call('port.register_attachment_delegate', KMIPServicePortDelegate(middleware))
@@ -3,8 +3,10 @@
 # Licensed under the terms of the TrueNAS Enterprise License Agreement
 # See the file LICENSE.IX for complete terms and conditions
 
+from concurrent.futures import ThreadPoolExecutor
 import contextlib
 import socket
+import threading
 import uuid
 
 from kmip.core import enums
@@ -14,6 +16,122 @@ from kmip.pie.objects import SecretData
 
 from middlewared.service import CallError
 
+# Maximum number of connections (and concurrent operations) a KMIP connection pool can have open to the server
+KMIP_POOL_SIZE = 8
+CONNECTION_ERRORS = (ClientConnectionFailure, ClientConnectionNotOpen, socket.timeout)
+
+
+def client_kwargs(data):
+    mapping = {
+        'hostname': 'server',
+        'port': 'port',
+        'cert': 'cert',
+        'key': 'cert_key',
+        'ca': 'ca',
+        'ssl_version': 'ssl_version'
+    }
+    return {k: data[v] for k, v in mapping.items() if data.get(v)}
+
+
+class SecretDataCache:
+    """
+    Secret data retrieved from (or registered with) KMIP servers. Managed objects are immutable so a value is valid
+    for as long as its uid is not destroyed.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.values = {}  # (server, port, uid) -> value
+
+    def get(self, server, uid):
+        with self.lock:
+            return self.values.get((*server, uid))
+
+    def set(self, server, uid, value):
+        with self.lock:
+            self.values[(*server, uid)] = value
+
+    def discard(self, uid):
+        with self.lock:
+            self.values = {k: v for k, v in self.values.items() if k[2] != uid}
+
+    def clear(self):
+        with self.lock:
+            self.values = {}
+
+
+SECRET_DATA_CACHE = SecretDataCache()
+
+
+class KMIPConnectionPool:
+    """
+    Bounded pool of connections to a KMIP server. PyKMIP clients are not thread-safe so each connection is used by a
+    single thread at a time.
+    """
+
+    def __init__(self, data, size=KMIP_POOL_SIZE):
+        self.kwargs = client_kwargs(data)
+        self.server = (data.get('server'), data.get('port'))
+        self.size = size
+        self.lock = threading.Lock()
+        self.connections = []
+        self.idle = []
+
+    @contextlib.contextmanager
+    def connection(self):
+        with self.lock:
+            conn = self.idle.pop() if self.idle else None
+
+        if conn is None:
+            conn = ProxyKmipClient(**self.kwargs)
+            try:
+                conn.open()
+            except CONNECTION_ERRORS as e:
+                raise CallError(f'Failed to connect to KMIP Server: {e}')
+
+            with self.lock:
+                self.connections.append(conn)
+
+        broken = False
+        try:
+            yield conn
+        except CONNECTION_ERRORS as e:
+            broken = True
+            raise CallError(f'Failed to connect to KMIP Server: {e}')
+        finally:
+            with self.lock:
+                if broken:
+                    # Do not reuse a connection that failed
+                    self.connections.remove(conn)
+                else:
+                    self.idle.append(conn)
+
+            if broken:
+                self._close(conn)
+
+    def map(self, fn, items):
+        """
+        Returns results of `fn(item)` for each of `items` executed concurrently in up to `size` threads so that
+        `fn` acquiring a `connection()` never has to wait for another one.
+        """
+        items = list(items)
+        if len(items) < 2:
+            return list(map(fn, items))
+
+        with ThreadPoolExecutor(max_workers=min(self.size, len(items))) as executor:
+            return list(executor.map(fn, items))
+
+    def close(self):
+        with self.lock:
+            connections, self.connections, self.idle = self.connections, [], []
+
+        for conn in connections:
+            self._close(conn)
+
+    def _close(self, conn):
+        with contextlib.suppress(Exception):
+            conn.close()
+
 
 class KMIPServerMixin:
 
@@ -21,21 +139,44 @@ class KMIPServerMixin:
     def _connection(self, data=None):
         self.middleware.call_sync('network.general.will_perform_activity', 'kmip')
 
-        data = data or {}
-        mapping = {
-            'hostname': 'server',
-            'port': 'port',
-            'cert': 'cert',
-            'key': 'cert_key',
-            'ca': 'ca',
-            'ssl_version': 'ssl_version'
-        }
         try:
-            with ProxyKmipClient(**{k: data[v] for k, v in mapping.items() if data.get(v)}) as conn:
+            with ProxyKmipClient(**client_kwargs(data or {})) as conn:
                 yield conn
-        except (ClientConnectionFailure, ClientConnectionNotOpen, socket.timeout) as e:
+        except CONNECTION_ERRORS as e:
             raise CallError(f'Failed to connect to KMIP Server: {e}')
 
+    @contextlib.contextmanager
+    def _connection_pool(self, data=None):
+        self.middleware.call_sync('network.general.will_perform_activity', 'kmip')
+
+        pool = KMIPConnectionPool(data or {})
+        try:
+            # Fail early if the server can't be reached at all
+            with pool.connection():
+                pass
+
+            yield pool
+        finally:
+            pool.close()
+
+    @contextlib.contextmanager
+    def _optional_connection_pool(self, connect):
+        """
+        Same as `_connection_pool` but yields `None` instead of failing if `connect` is false or the KMIP server
+        can't be reached so that keys available locally can still be processed.
+        """
+        with contextlib.ExitStack() as stack:
+            pool = None
+            if connect:
+                try:
+                    pool = stack.enter_context(
+                        self._connection_pool(self.middleware.call_sync('kmip.connection_config'))
+                    )
+                except CallError as e:
+                    self.middleware.logger.debug(f'Failed to connect to KMIP Server: {e}')
+
+            yield pool
+
     def _test_connection(self, data=None):
         # Test if we are able to connect to the KMIP Server
         try:
@@ -70,11 +211,25 @@ class KMIPServerMixin:
 
     def _destroy_key(self, uid, conn):
         # Destroy key from the KMIP Server
+        SECRET_DATA_CACHE.discard(uid)
         try:
             conn.destroy(uid)
         except KmipOperationFailure as e:
             raise CallError(f'Failed to destroy key: {e}')
 
+    def _revoke_and_destroy_keys(self, pool, keys):
+        # Revoke and destroy `keys` (a list of uid/key id pairs) concurrently
+        def destroy(key):
+            uid, key_id = key
+            try:
+                with pool.connection() as conn:
+                    return self._revoke_and_destroy_key(uid, conn, self.middleware.logger, key_id)
+            except CallError as e:
+                self.middleware.logger.debug(f'Failed to destroy key for {key_id or uid}: {e}')
+                return False
+
+        return pool.map(destroy, keys)
+
     def _retrieve_secret_data(self, uid, conn):
         # Query key from the KMIP Server
         try:
@@ -86,6 +241,35 @@ class KMIPServerMixin:
                 raise CallError('Retrieved managed object is not secret data')
             return obj.value.decode()
 
+    def _retrieve_cached_secret_data(self, uid, pool, cached=True):
+        # Query key from the cache falling back to the KMIP Server (or always from the server if not `cached`)
+        if not cached or (value := SECRET_DATA_CACHE.get(pool.server, uid)) is None:
+            with pool.connection() as conn:
+                value = self._retrieve_secret_data(uid, conn)
+
+            SECRET_DATA_CACHE.set(pool.server, uid, value)
+
+        return value
+
+    def _register_cached_secret_data(self, name, key, pool):
+        with pool.connection() as conn:
+            uid = self._register_secret_data(name, key, conn)
+
+        SECRET_DATA_CACHE.set(pool.server, uid, key)
+        return uid
+
+    def _update_datastore(self, updates):
+        """
+        Apply `updates` (a list of datastore name, id, data and options tuples). Large batches are not replicated to
+        the standby controller query by query, the whole database is sent once they have been written.
+        """
+        batch = len(updates) > 1 and self.middleware.call_sync('failover.licensed')
+        for name, id_, data, options in updates:
+            self.middleware.call_sync('datastore.update', name, id_, data, {**options, 'ha_sync': not batch})
+
+        if batch:
+            self.middleware.call_sync('failover.datastore.force_send')
+
     def _register_secret_data(self, name, key, conn):
         # Create key on the KMIP Server
         secret_data = SecretData(key.encode(), enums.SecretDataType.PASSWORD, name=f'{name}-{str(uuid.uuid4())[:7]}')
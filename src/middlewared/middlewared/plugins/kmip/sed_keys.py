@@ -3,7 +3,7 @@
 # Licensed under the terms of the TrueNAS Enterprise License Agreement
 # See the file LICENSE.IX for complete terms and conditions
 
-from middlewared.service import job, private, Service
+from middlewared.service import CallError, job, private, Service
 
 from .connection import KMIPServerMixin
 
@@ -124,58 +124,39 @@ class KMIPService(Service, KMIPServerMixin):
         The same steps are followed for system.advanced.
         """
         adv_config = self.middleware.call_sync('datastore.config', 'system.advanced', {'prefix': 'adv_'})
+        disks = self.middleware.call_sync(
+            'datastore.query', 'storage.disk', [['identifier', 'in', ids]] if ids else [], {'prefix': 'disk_'}
+        )
         failed = []
-        with self._connection(self.middleware.call_sync('kmip.connection_config')) as conn:
-            for disk in self.middleware.call_sync(
-                'datastore.query', 'storage.disk', [['identifier', 'in', ids]] if ids else [], {'prefix': 'disk_'}
+        updates = []
+        with self._connection_pool(self.middleware.call_sync('kmip.connection_config')) as pool:
+            for disk, (key, update_data, success) in zip(
+                disks, pool.map(lambda disk: self._push_sed_disk_key(disk, pool), disks)
             ):
-                if not disk['passwd'] and disk['kmip_uid']:
-                    try:
-                        key = self._retrieve_secret_data(disk['kmip_uid'], conn)
-                    except Exception as e:
-                        self.middleware.logger.debug(f'Failed to retrieve key for {disk["identifier"]}: {e}')
-                    else:
-                        self.disks_keys[disk['identifier']] = key
-                    continue
-                elif not disk['passwd']:
-                    continue
-
-                self.disks_keys[disk['identifier']] = disk['passwd']
-                destroy_successful = False
-                if disk['kmip_uid']:
-                    # This needs to be revoked and destroyed
-                    destroy_successful = self._revoke_and_destroy_key(
-                        disk['kmip_uid'], conn, self.middleware.logger, disk['identifier']
-                    )
-                try:
-                    uid = self._register_secret_data(disk['identifier'], self.disks_keys[disk['identifier']], conn)
-                except Exception:
+                if key:
+                    self.disks_keys[disk['identifier']] = key
+                if not success:
                     failed.append(disk['identifier'])
-                    update_data = {'kmip_uid': None} if destroy_successful else {}
-                else:
-                    update_data = {'passwd': '', 'kmip_uid': uid}
                 if update_data:
-                    self.middleware.call_sync(
-                        'datastore.update', 'storage.disk', disk['identifier'], update_data, {'prefix': 'disk_'}
-                    )
+                    updates.append(('storage.disk', disk['identifier'], update_data, {'prefix': 'disk_'}))
+            self._update_datastore(updates)
+
             if not adv_config['sed_passwd'] and adv_config['kmip_uid']:
                 try:
-                    key = self._retrieve_secret_data(adv_config['kmip_uid'], conn)
+                    key = self._retrieve_cached_secret_data(adv_config['kmip_uid'], pool)
                 except Exception:
                     failed.append('Global SED Key')
                 else:
                     self.global_sed_key = key
             elif adv_config['sed_passwd']:
                 if adv_config['kmip_uid']:
-                    self._revoke_and_destroy_key(
-                        adv_config['kmip_uid'], conn, self.middleware.logger, 'SED Global Password'
-                    )
+                    self._revoke_and_destroy_keys(pool, [(adv_config['kmip_uid'], 'SED Global Password')])
                     self.middleware.call_sync(
                         'datastore.update', 'system.advanced', adv_config['id'], {'adv_kmip_uid': None}
                     )
                 self.global_sed_key = adv_config['sed_passwd']
                 try:
-                    uid = self._register_secret_data('global_sed_key', self.global_sed_key, conn)
+                    uid = self._register_cached_secret_data('global_sed_key', self.global_sed_key, pool)
                 except Exception:
                     failed.append('Global SED Key')
                 else:
@@ -185,6 +166,32 @@ class KMIPService(Service, KMIPServerMixin):
                     )
         return failed
 
+    def _push_sed_disk_key(self, disk, pool):
+        """
+        Push SED key of `disk` to the KMIP server. This is called concurrently for all the disks being synced so
+        database is not updated here. Returns the disk's key, database changes and whether the push succeeded.
+        """
+        if not disk['passwd'] and disk['kmip_uid']:
+            try:
+                key = self._retrieve_cached_secret_data(disk['kmip_uid'], pool)
+            except Exception as e:
+                self.middleware.logger.debug(f'Failed to retrieve key for {disk["identifier"]}: {e}')
+                key = None
+            return key, {}, True
+        elif not disk['passwd']:
+            return None, {}, True
+
+        destroy_successful = False
+        if disk['kmip_uid']:
+            # This needs to be revoked and destroyed
+            destroy_successful = self._revoke_and_destroy_keys(pool, [(disk['kmip_uid'], disk['identifier'])])[0]
+        try:
+            uid = self._register_cached_secret_data(disk['identifier'], disk['passwd'], pool)
+        except Exception:
+            return disk['passwd'], {'kmip_uid': None} if destroy_successful else {}, False
+        else:
+            return disk['passwd'], {'passwd': '', 'kmip_uid': uid}, True
+
     @private
     def pull_sed_keys(self):
         """
@@ -202,52 +209,60 @@ class KMIPService(Service, KMIPServerMixin):
         """
         failed = []
         connection_successful = self.middleware.call_sync('kmip.test_connection')
-        for disk in self.middleware.call_sync(
+        disks = self.middleware.call_sync(
             'datastore.query', 'storage.disk', [['kmip_uid', '!=', None]], {'prefix': 'disk_'}
-        ):
-            try:
-                if disk['passwd']:
-                    key = disk['passwd']
-                elif self.disks_keys.get(disk['identifier']):
-                    key = self.disks_keys[disk['identifier']]
-                elif connection_successful:
-                    with self._connection(self.middleware.call_sync('kmip.connection_config')) as conn:
-                        key = self._retrieve_secret_data(disk['kmip_uid'], conn)
-                else:
-                    raise Exception('Failed to sync disk')
-            except Exception:
-                failed.append(disk['identifier'])
-            else:
-                update_data = {'passwd': key, 'kmip_uid': None}
-                self.middleware.call_sync(
-                    'datastore.update', 'storage.disk', disk['identifier'], update_data, {'prefix': 'disk_'}
-                )
-                self.disks_keys.pop(disk['identifier'], None)
-                if connection_successful:
-                    self.middleware.call_sync('kmip.delete_kmip_secret_data', disk['kmip_uid'])
+        )
         adv_config = self.middleware.call_sync('datastore.config', 'system.advanced', {'prefix': 'adv_'})
-        if adv_config['kmip_uid']:
-            key = None
-            if adv_config['sed_passwd']:
-                key = adv_config['sed_passwd']
-            elif self.global_sed_key:
-                key = self.global_sed_key
-            elif connection_successful:
+        with self._optional_connection_pool(connection_successful) as pool:
+            def retrieve(disk):
                 try:
-                    with self._connection(self.middleware.call_sync('kmip.connection_config')) as conn:
-                        key = self._retrieve_secret_data(adv_config['kmip_uid'], conn)
-                except Exception:
-                    failed.append('Global SED Key')
-            if key:
-                self.middleware.call_sync(
-                    'datastore.update', 'system.advanced',
-                    adv_config['id'], {
-                        'adv_sed_passwd': key, 'adv_kmip_uid': None
-                    }
-                )
-                self.global_sed_key = ''
-                if connection_successful:
-                    self.middleware.call_sync('kmip.delete_kmip_secret_data', adv_config['kmip_uid'])
+                    if disk['passwd']:
+                        return disk['passwd']
+                    elif self.disks_keys.get(disk['identifier']):
+                        return self.disks_keys[disk['identifier']]
+                    elif pool:
+                        return self._retrieve_cached_secret_data(disk['kmip_uid'], pool)
+                except Exception as e:
+                    self.middleware.logger.debug(f'Failed to retrieve key for {disk["identifier"]}: {e}')
+
+            updates = []
+            synced = []
+            for disk, key in zip(disks, pool.map(retrieve, disks) if pool else map(retrieve, disks)):
+                if key:
+                    updates.append(('storage.disk', disk['identifier'], {'passwd': key, 'kmip_uid': None}, {
+                        'prefix': 'disk_'
+                    }))
+                    synced.append(disk)
+                else:
+                    failed.append(disk['identifier'])
+            self._update_datastore(updates)
+            for disk in synced:
+                self.disks_keys.pop(disk['identifier'], None)
+
+            if adv_config['kmip_uid']:
+                key = None
+                if adv_config['sed_passwd']:
+                    key = adv_config['sed_passwd']
+                elif self.global_sed_key:
+                    key = self.global_sed_key
+                elif pool:
+                    try:
+                        key = self._retrieve_cached_secret_data(adv_config['kmip_uid'], pool)
+                    except Exception:
+                        failed.append('Global SED Key')
+                if key:
+                    self.middleware.call_sync(
+                        'datastore.update', 'system.advanced',
+                        adv_config['id'], {
+                            'adv_sed_passwd': key, 'adv_kmip_uid': None
+                        }
+                    )
+                    self.global_sed_key = ''
+                    synced.append({'identifier': 'SED Global Password', 'kmip_uid': adv_config['kmip_uid']})
+
+            if pool:
+                # Keys are only removed from the KMIP server once the database has them
+                self._revoke_and_destroy_keys(pool, [(item['kmip_uid'], item['identifier']) for item in synced])
         return failed
 
     @job(lock=lambda args: f'kmip_sync_sed_keys_{args}')
@@ -310,28 +325,41 @@ class KMIPService(Service, KMIPServerMixin):
         On middleware boot, we initialize memory cache to contain all the SED keys which we can later use
         for SED related functionality.
         """
-        for disk in self.middleware.call_sync(
-            'datastore.query', 'storage.disk', [], {'prefix': 'disk_'}
-        ):
-            if disk['passwd']:
-                self.disks_keys[disk['identifier']] = disk['passwd']
-            elif disk['kmip_uid'] and connection_success:
-                try:
-                    with self._connection(self.middleware.call_sync('kmip.connection_config')) as conn:
-                        key = self._retrieve_secret_data(disk['kmip_uid'], conn)
-                except Exception:
-                    self.middleware.logger.debug(f'Failed to retrieve SED disk key for {disk["identifier"]}')
-                else:
-                    self.disks_keys[disk['identifier']] = key
+        disks = self.middleware.call_sync('datastore.query', 'storage.disk', [], {'prefix': 'disk_'})
         adv_config = self.middleware.call_sync('datastore.config', 'system.advanced', {'prefix': 'adv_'})
+        for disk in filter(lambda d: d['passwd'], disks):
+            self.disks_keys[disk['identifier']] = disk['passwd']
         if adv_config['sed_passwd']:
             self.global_sed_key = adv_config['sed_passwd']
-        elif connection_success and adv_config['kmip_uid']:
-            try:
-                with self._connection(self.middleware.call_sync('kmip.connection_config')) as conn:
-                    key = self._retrieve_secret_data(adv_config['kmip_uid'], conn)
-            except Exception:
-                self.middleware.logger.debug('Failed to retrieve global SED key')
+
+        retrieve = [(disk['kmip_uid'], disk['identifier']) for disk in disks if not disk['passwd'] and disk['kmip_uid']]
+        if not adv_config['sed_passwd'] and adv_config['kmip_uid']:
+            retrieve.append((adv_config['kmip_uid'], None))
+        if not connection_success or not retrieve:
+            return
+
+        try:
+            with self._connection_pool(self.middleware.call_sync('kmip.connection_config')) as pool:
+                def retrieve_key(item):
+                    uid, identifier = item
+                    try:
+                        return self._retrieve_cached_secret_data(uid, pool)
+                    except Exception:
+                        if identifier:
+                            self.middleware.logger.debug(f'Failed to retrieve SED disk key for {identifier}')
+                        else:
+                            self.middleware.logger.debug('Failed to retrieve global SED key')
+
+                keys = pool.map(retrieve_key, retrieve)
+        except CallError as e:
+            self.middleware.logger.debug(f'Failed to retrieve SED keys: {e}')
+            return
+
+        for (uid, identifier), key in zip(retrieve, keys):
+            if key is None:
+                continue
+            if identifier:
+                self.disks_keys[identifier] = key
             else:
                 self.global_sed_key = key
 
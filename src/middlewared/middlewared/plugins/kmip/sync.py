@@ -3,6 +3,8 @@
 # Licensed under the terms of the TrueNAS Enterprise License Agreement
 # See the file LICENSE.IX for complete terms and conditions
 
+import asyncio
+
 from middlewared.schema import Bool, returns
 from middlewared.service import accepts, CallError, job, periodic, private, Service
 
@@ -94,10 +96,14 @@ class KMIPService(Service, KMIPServerMixin):
             connection_success = await self.middleware.call(
                 'kmip.test_connection', None, kmip_config['manage_zfs_keys'] or kmip_config['manage_sed_disks']
             )
-            if kmip_config['manage_zfs_keys']:
-                await self.middleware.call('kmip.initialize_zfs_keys', connection_success)
-            if kmip_config['manage_sed_disks']:
-                await self.middleware.call('kmip.initialize_sed_keys', connection_success)
+            # ZFS and SED keys are retrieved concurrently so that pool unlock does not wait for SED keys
+            await asyncio.gather(*[
+                self.middleware.call(f'kmip.initialize_{keys}_keys', connection_success)
+                for keys, enabled in (
+                    ('zfs', kmip_config['manage_zfs_keys']), ('sed', kmip_config['manage_sed_disks']),
+                )
+                if enabled
+            ])
 
     @private
     async def kmip_memory_keys(self):
@@ -10,6 +10,7 @@ from middlewared.schema import Bool, Dict, Int, Patch, Str
 from middlewared.service import accepts, CallError, ConfigService, job, private, returns, ValidationErrors
 from middlewared.validators import Port
 
+from .connection import SECRET_DATA_CACHE
 from .utils import SUPPORTED_SSL_VERSIONS
 
 
@@ -191,6 +192,8 @@ class KMIPService(ConfigService):
         await self.middleware.call(
             'datastore.update', self._config.datastore, old['id'], new,
         )
+        if not new['enabled'] or change_server:
+            SECRET_DATA_CACHE.clear()
 
         await self.middleware.call('service.start', 'kmip')
         if new['enabled'] and old['enabled'] != new['enabled']:
@@ -3,7 +3,7 @@
 # Licensed under the terms of the TrueNAS Enterprise License Agreement
 # See the file LICENSE.IX for complete terms and conditions
 
-from middlewared.service import job, private, Service
+from middlewared.service import CallError, job, private, Service
 
 from .connection import KMIPServerMixin
 
@@ -32,70 +32,93 @@ class KMIPService(Service, KMIPServerMixin):
             'datastore.query', 'storage.encrypteddataset', [['id', 'in', ids]] if ids else []
         )
         existing_datasets = {ds['name']: ds for ds in self.middleware.call_sync('pool.dataset.query')}
+        datasets = [ds for ds in datasets if ds['name'] in existing_datasets]
         failed = []
-        with self._connection(self.middleware.call_sync('kmip.connection_config')) as conn:
-            for ds in filter(lambda d: d['name'] in existing_datasets, datasets):
-                if not ds['encryption_key']:
-                    # We want to make sure we have the KMIP server's keys and in-memory keys in sync
-                    try:
-                        if ds['name'] in self.zfs_keys and self.middleware.call_sync(
-                            'zfs.dataset.check_key', ds['name'], {'key': self.zfs_keys[ds['name']]}
-                        ):
-                            continue
-                        else:
-                            key = self._retrieve_secret_data(ds['kmip_uid'], conn)
-                    except Exception as e:
-                        self.middleware.logger.debug(f'Failed to retrieve key for {ds["name"]}: {e}')
-                    else:
-                        self.zfs_keys[ds['name']] = key
-                    continue
-
-                self.zfs_keys[ds['name']] = ds['encryption_key']
-                destroy_successful = False
-                if ds['kmip_uid']:
-                    # This needs to be revoked and destroyed
-                    destroy_successful = self._revoke_and_destroy_key(ds['kmip_uid'], conn, self.middleware.logger)
-                    if not destroy_successful:
-                        self.middleware.logger.debug(f'Failed to destroy key from KMIP Server for {ds["name"]}')
-                try:
-                    uid = self._register_secret_data(ds['name'], self.zfs_keys[ds['name']], conn)
-                except Exception:
+        updates = []
+        with self._connection_pool(self.middleware.call_sync('kmip.connection_config')) as pool:
+            for ds, (key, update_data, success) in zip(
+                datasets, pool.map(lambda ds: self._push_zfs_key(ds, pool), datasets)
+            ):
+                if key:
+                    self.zfs_keys[ds['name']] = key
+                if not success:
                     failed.append(ds['name'])
-                    update_data = {'kmip_uid': None} if destroy_successful else {}
-                else:
-                    update_data = {'encryption_key': None, 'kmip_uid': uid}
                 if update_data:
-                    self.middleware.call_sync('datastore.update', 'storage.encrypteddataset', ds['id'], update_data)
+                    updates.append(('storage.encrypteddataset', ds['id'], update_data, {}))
+            self._update_datastore(updates)
         self.zfs_keys = {k: v for k, v in self.zfs_keys.items() if k in existing_datasets}
         return failed
 
+    def _push_zfs_key(self, ds, pool):
+        """
+        Push encryption key of `ds` to the KMIP server. This is called concurrently for all the datasets being synced
+        so database is not updated here. Returns the dataset's key, database changes and whether the push succeeded.
+        """
+        if not ds['encryption_key']:
+            # We want to make sure we have the KMIP server's keys and in-memory keys in sync
+            try:
+                if ds['name'] in self.zfs_keys and self.middleware.call_sync(
+                    'zfs.dataset.check_key', ds['name'], {'key': self.zfs_keys[ds['name']]}
+                ):
+                    return None, {}, True
+                else:
+                    key = self._retrieve_cached_secret_data(ds['kmip_uid'], pool, cached=False)
+            except Exception as e:
+                self.middleware.logger.debug(f'Failed to retrieve key for {ds["name"]}: {e}')
+                key = None
+            return key, {}, True
+
+        destroy_successful = False
+        if ds['kmip_uid']:
+            # This needs to be revoked and destroyed
+            destroy_successful = self._revoke_and_destroy_keys(pool, [(ds['kmip_uid'], None)])[0]
+            if not destroy_successful:
+                self.middleware.logger.debug(f'Failed to destroy key from KMIP Server for {ds["name"]}')
+        try:
+            uid = self._register_cached_secret_data(ds['name'], ds['encryption_key'], pool)
+        except Exception:
+            return ds['encryption_key'], {'kmip_uid': None} if destroy_successful else {}, False
+        else:
+            return ds['encryption_key'], {'encryption_key': None, 'kmip_uid': uid}, True
+
     @private
     def pull_zfs_keys(self):
         datasets = self.middleware.call_sync('datastore.query', 'storage.encrypteddataset', [['kmip_uid', '!=', None]])
         existing_datasets = {ds['name']: ds for ds in self.middleware.call_sync('pool.dataset.query')}
+        datasets = [ds for ds in datasets if ds['name'] in existing_datasets]
         failed = []
         connection_successful = self.middleware.call_sync('kmip.test_connection')
-        for ds in filter(lambda d: d['name'] in existing_datasets, datasets):
-            try:
-                if ds['encryption_key']:
-                    key = ds['encryption_key']
-                elif ds['name'] in self.zfs_keys and self.middleware.call_sync(
-                    'zfs.dataset.check_key', ds['name'], {'key': self.zfs_keys[ds['name']]}
-                ):
-                    key = self.zfs_keys[ds['name']]
-                elif connection_successful:
-                    with self._connection(self.middleware.call_sync('kmip.connection_config')) as conn:
-                        key = self._retrieve_secret_data(ds['kmip_uid'], conn)
+        with self._optional_connection_pool(connection_successful) as pool:
+            def retrieve(ds):
+                try:
+                    if ds['encryption_key']:
+                        return ds['encryption_key']
+                    elif ds['name'] in self.zfs_keys and self.middleware.call_sync(
+                        'zfs.dataset.check_key', ds['name'], {'key': self.zfs_keys[ds['name']]}
+                    ):
+                        return self.zfs_keys[ds['name']]
+                    elif pool:
+                        return self._retrieve_cached_secret_data(ds['kmip_uid'], pool)
+                except Exception as e:
+                    self.middleware.logger.debug(f'Failed to retrieve key for {ds["name"]}: {e}')
+
+            updates = []
+            synced = []
+            for ds, key in zip(datasets, pool.map(retrieve, datasets) if pool else map(retrieve, datasets)):
+                if key:
+                    updates.append((
+                        'storage.encrypteddataset', ds['id'], {'encryption_key': key, 'kmip_uid': None}, {}
+                    ))
+                    synced.append(ds)
                 else:
-                    raise Exception('Failed to sync dataset')
-            except Exception:
-                failed.append(ds['name'])
-            else:
-                update_data = {'encryption_key': key, 'kmip_uid': None}
-                self.middleware.call_sync('datastore.update', 'storage.encrypteddataset', ds['id'], update_data)
+                    failed.append(ds['name'])
+            self._update_datastore(updates)
+            for ds in synced:
                 self.zfs_keys.pop(ds['name'], None)
-                if connection_successful:
-                    self.middleware.call_sync('kmip.delete_kmip_secret_data', ds['kmip_uid'])
+
+            if pool:
+                # Keys are only removed from the KMIP server once the database has them
+                self._revoke_and_destroy_keys(pool, [(ds['kmip_uid'], ds['name']) for ds in synced])
         self.zfs_keys = {k: v for k, v in self.zfs_keys.items() if k in existing_datasets}
         return failed
 
@@ -136,17 +159,29 @@ class KMIPService(Service, KMIPServerMixin):
     @private
     def initialize_zfs_keys(self, connection_success):
         locked_datasets = [ds['id'] for ds in self.middleware.call_sync('zfs.dataset.locked_datasets')]
-        for ds in self.middleware.call_sync('datastore.query', 'storage.encrypteddataset',):
-            if ds['encryption_key']:
-                self.zfs_keys[ds['name']] = ds['encryption_key']
-            elif ds['kmip_uid'] and connection_success:
-                try:
-                    with self._connection(self.middleware.call_sync('kmip.connection_config')) as conn:
-                        key = self._retrieve_secret_data(ds['kmip_uid'], conn)
-                except Exception:
-                    self.middleware.logger.debug(f'Failed to retrieve key for {ds["name"]}')
-                else:
-                    self.zfs_keys[ds['name']] = key
+        datasets = self.middleware.call_sync('datastore.query', 'storage.encrypteddataset')
+        for ds in filter(lambda d: d['encryption_key'], datasets):
+            self.zfs_keys[ds['name']] = ds['encryption_key']
+
+        retrieve = [ds for ds in datasets if not ds['encryption_key'] and ds['kmip_uid']]
+        if connection_success and retrieve:
+            try:
+                with self._connection_pool(self.middleware.call_sync('kmip.connection_config')) as pool:
+                    def retrieve_key(ds):
+                        try:
+                            return self._retrieve_cached_secret_data(ds['kmip_uid'], pool)
+                        except Exception:
+                            self.middleware.logger.debug(f'Failed to retrieve key for {ds["name"]}')
+
+                    keys = pool.map(retrieve_key, retrieve)
+            except CallError as e:
+                self.middleware.logger.debug(f'Failed to retrieve ZFS keys: {e}')
+            else:
+                for ds, key in zip(retrieve, keys):
+                    if key is not None:
+                        self.zfs_keys[ds['name']] = key
+
+        for ds in datasets:
             if ds['name'] in self.zfs_keys and ds['name'] in locked_datasets:
                 self.middleware.call_sync('pool.dataset.unlock', ds['name'])
 
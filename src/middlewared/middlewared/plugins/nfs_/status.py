@@ -8,6 +8,24 @@ from contextlib import suppress
 import yaml
 import os
 
+NFS4_CLIENTS_DIR = '/proc/fs/nfsd/clients'
+# libyaml-based loader is an order of magnitude faster on large states files
+YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+
+def query_references(value, field):
+    """
+    Check whether query filters / select / order_by (`value`) reference `field` (or any of its subfields).
+    """
+    if isinstance(value, str):
+        name = value.split(':', 1)[-1].lstrip('-')
+        return name == field or name.startswith(f'{field}.')
+
+    if isinstance(value, (list, tuple)):
+        return any(query_references(i, field) for i in value)
+
+    return False
+
 
 class NFSService(Service):
 
@@ -51,8 +69,8 @@ class NFSService(Service):
         """
         info = {}
         with suppress(FileNotFoundError):
-            with open(f"/proc/fs/nfsd/clients/{id_}/info", "r") as f:
-                info = yaml.safe_load(f.read())
+            with open(f"{NFS4_CLIENTS_DIR}/{id_}/info", "r") as f:
+                info = yaml.load(f, Loader=YAML_LOADER)
 
         return info
 
@@ -64,8 +82,19 @@ class NFSService(Service):
         """
         states = []
         with suppress(FileNotFoundError):
-            with open(f"/proc/fs/nfsd/clients/{id_}/states", "r") as f:
-                states = yaml.safe_load(f.read())
+            with open(f"{NFS4_CLIENTS_DIR}/{id_}/states", "r") as f:
+                try:
+                    states = yaml.load(f, Loader=YAML_LOADER)
+                except yaml.YAMLError:
+                    # Every state is a single line (a YAML list item). Parse them one by one
+                    # so that a single malformed entry does not hide all the others.
+                    f.seek(0)
+                    states = []
+                    for line in f:
+                        try:
+                            states.extend(yaml.load(line, Loader=YAML_LOADER) or [])
+                        except yaml.YAMLError:
+                            self.logger.debug('%s: failed to parse NFSv4 client state %r', id_, line)
 
         # states file may be empty, which changes it to None type
         # return empty list in this case
@@ -148,15 +177,35 @@ class NFSService(Service):
                             Linux clients usually indicate 'UP'
                             FreeBSD clients may indicate 'DOWN' but are still functional
         """
+        try:
+            client_ids = os.listdir(NFS4_CLIENTS_DIR)
+        except FileNotFoundError:
+            client_ids = []
+
+        if options.get('count') and not filters:
+            return len(client_ids)
+
+        # `states` may contain hundreds of thousands of entries on busy servers, only read them if they are
+        # going to be returned or used for filtering
+        if query_references([filters, options.get('order_by', [])], 'states'):
+            with_states = True
+        elif options.get('count'):
+            with_states = False
+        elif options.get('select'):
+            with_states = query_references(options['select'], 'states')
+        else:
+            with_states = True
+
         clients = []
-        with suppress(FileNotFoundError):
-            for client in os.listdir("/proc/fs/nfsd/clients/"):
-                entry = {
-                    "id": client,
-                    "info": self.get_nfs4_client_info(client),
-                    "states": self.get_nfs4_client_states(client),
-                }
-                clients.append(entry)
+        for client in client_ids:
+            entry = {
+                "id": client,
+                "info": self.get_nfs4_client_info(client),
+            }
+            if with_states:
+                entry["states"] = self.get_nfs4_client_states(client)
+
+            clients.append(entry)
 
         return filter_list(clients, filters, options)
 
@@ -183,7 +232,7 @@ class NFSService(Service):
         returned in `get_nfs4_clients`.
         """
         with suppress(FileNotFoundError):
-            with open(f"/proc/fs/nfsd/clients/{client_id}/ctl", "w") as f:
+            with open(f"{NFS4_CLIENTS_DIR}/{client_id}/ctl", "w") as f:
                 f.write("expire\n")
 
     @private
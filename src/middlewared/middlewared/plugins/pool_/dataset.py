@@ -209,7 +209,7 @@ class PoolDatasetService(CRUDService):
         # Optimization for cases in which they can be filtered at zfs.dataset.query
         zfsfilters = []
         filters = filters or []
-        if len(filters) == 1 and len(filters[0]) == 3 and list(filters[0][:2]) == ['id', '=']:
+        if len(filters) == 1 and len(filters[0]) == 3 and list(filters[0][:2]) in (['id', '='], ['id', 'in']):
             zfsfilters.append(copy.deepcopy(filters[0]))
 
         internal_datasets_filters = self.middleware.call_sync('pool.dataset.internal_datasets_filters')
@@ -220,21 +220,23 @@ class PoolDatasetService(CRUDService):
         snapshots = extra.get('snapshots')
         snapshots_recursive = extra.get('snapshots_recursive')
         snapshots_count = extra.get('snapshots_count')
+        zfsextra = {
+            'flat': extra.get('flat', True),
+            'retrieve_children': retrieve_children,
+            'properties': props,
+            'snapshots': snapshots,
+            'snapshots_recursive': snapshots_recursive,
+            'snapshots_count': snapshots_count,
+            'snapshots_properties': extra.get('snapshots_properties', [])
+        }
+        if props is None:
+            # All properties were requested, serve those that rarely change from cache
+            datasets = self.middleware.call_sync('pool.dataset.zfs_query', zfsfilters, zfsextra)
+        else:
+            datasets = self.middleware.call_sync('zfs.dataset.query', zfsfilters, {'extra': zfsextra})
+
         return filter_list(
-            self.__transform(self.middleware.call_sync(
-                'zfs.dataset.query', zfsfilters, {
-                    'extra': {
-                        'flat': extra.get('flat', True),
-                        'retrieve_children': retrieve_children,
-                        'properties': props,
-                        'snapshots': snapshots,
-                        'snapshots_recursive': snapshots_recursive,
-                        'snapshots_count': snapshots_count,
-                        'snapshots_properties': extra.get('snapshots_properties', [])
-                    }
-                }
-            ), retrieve_children, internal_datasets_filters,
-            ), filters, options
+            self.__transform(datasets, retrieve_children, internal_datasets_filters), filters, options
         )
 
     @private
@@ -933,6 +935,7 @@ class PoolDatasetService(CRUDService):
             # and if it is, resync it so the connected initiators can see the new size of the zvol
             await self.middleware.call('iscsi.global.resync_lun_size_for_zvol', id_)
 
+        await self.middleware.call_hook('dataset.post_update', id_)
         updated_ds = await self.get_instance(id_)
         self.middleware.send_event('pool.dataset.query', 'CHANGED', id=id_, fields=updated_ds)
         return updated_ds
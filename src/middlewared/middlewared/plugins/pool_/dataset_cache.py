@@ -0,0 +1,157 @@
+import threading
+import time
+
+from middlewared.service import private, Service
+
+# Properties that can change without ZFS logging a history event for the dataset (space accounting,
+# mount and key state, receive progress, ...). These are read from ZFS on every query.
+VOLATILE_PROPERTIES = [
+    'available',
+    'compressratio',
+    'encryptionroot',
+    'filesystem_count',
+    'keystatus',
+    'logicalreferenced',
+    'logicalused',
+    'mounted',
+    'origin',
+    'receive_resume_token',
+    'refcompressratio',
+    'referenced',
+    'snapshot_count',
+    'snapshots_changed',
+    'used',
+    'usedbychildren',
+    'usedbydataset',
+    'usedbyrefreservation',
+    'usedbysnapshots',
+    'written',
+]
+# Cached properties are re-read after this many seconds even if no change was reported
+PROPERTIES_CACHE_TTL = 600
+
+
+class DatasetPropertiesCache:
+    """
+    Non-volatile properties (including user properties) of datasets keyed by dataset name.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = {}  # dataset name -> (time of retrieval, properties)
+        self.invalidated = {}  # dataset name (None for all datasets) -> time of last invalidation
+
+    def get(self, names):
+        now = time.monotonic()
+        with self.lock:
+            return {
+                name: entry[1] for name in names
+                if (entry := self.entries.get(name)) is not None and now - entry[0] < PROPERTIES_CACHE_TTL
+            }
+
+    def update(self, datasets, retrieved_at):
+        """
+        Cache properties of `datasets` retrieved from ZFS at `retrieved_at` and return them. Properties
+        of datasets invalidated since then might be already out of date and are not cached.
+        """
+        properties = {
+            dataset['name']: {k: v for k, v in dataset['properties'].items() if k not in VOLATILE_PROPERTIES}
+            for dataset in datasets
+        }
+        with self.lock:
+            if time.monotonic() - retrieved_at >= PROPERTIES_CACHE_TTL:
+                return properties
+
+            for name, props in properties.items():
+                parts = name.split('/')
+                if all(
+                    self.invalidated.get(key, 0) < retrieved_at
+                    for key in [None] + ['/'.join(parts[:i]) for i in range(1, len(parts) + 1)]
+                ):
+                    self.entries[name] = (retrieved_at, props)
+
+        return properties
+
+    def invalidate(self, name=None):
+        now = time.monotonic()
+        with self.lock:
+            self.invalidated = {k: v for k, v in self.invalidated.items() if now - v < PROPERTIES_CACHE_TTL}
+            self.invalidated[name] = now
+            if name is None:
+                self.entries.clear()
+                return
+
+            for key in [key for key in self.entries if key == name or key.startswith(f'{name}/')]:
+                del self.entries[key]
+
+
+PROPERTIES_CACHE = DatasetPropertiesCache()
+
+
+class PoolDatasetService(Service):
+
+    class Config:
+        namespace = 'pool.dataset'
+
+    @private
+    def invalidate_properties_cache(self, name=None):
+        """
+        Drop cached properties of dataset `name` and its children (or of all datasets if `name` is not given).
+        """
+        PROPERTIES_CACHE.invalidate(name)
+
+    @private
+    def zfs_query(self, filters, extra):
+        """
+        `zfs.dataset.query` retrieving all properties of datasets.
+
+        Only `VOLATILE_PROPERTIES` are read from ZFS for every dataset. Other properties are served from
+        cache and are only read for datasets that were changed since they were cached.
+        """
+        retrieved_at = time.monotonic()
+        datasets = self.middleware.call_sync('zfs.dataset.query', filters, {
+            'extra': extra | {'properties': VOLATILE_PROPERTIES, 'user_properties': False},
+        })
+
+        entries = []
+        stack = list(datasets)
+        while stack:
+            dataset = stack.pop()
+            entries.append(dataset)
+            stack.extend(dataset.get('children') or [])
+
+        names = {dataset['name'] for dataset in entries}
+        properties = PROPERTIES_CACHE.get(names)
+        if missing := names - properties.keys():
+            properties.update(PROPERTIES_CACHE.update(self.middleware.call_sync(
+                'zfs.dataset.query', [['id', 'in', sorted(missing)]], {'extra': {'retrieve_children': False}},
+            ), retrieved_at))
+
+        for dataset in entries:
+            # Properties are copied as consumers modify them
+            dataset['properties'] = {
+                k: dict(v) for k, v in properties.get(dataset['name'], {}).items()
+            } | dataset['properties']
+
+        return datasets
+
+
+async def zfs_events_hook(middleware, data):
+    if data['class'] == 'sysevent.fs.zfs.history_event' and (name := data.get('history_dsname')):
+        if '@' in name:
+            # Snapshot events only change volatile properties of the dataset
+            return
+
+        if data.get('history_internal_name') == 'rename':
+            # Children are renamed too and the new name is only part of the formatted history message
+            name = None
+    elif data['class'] in ('sysevent.fs.zfs.pool_import', 'sysevent.fs.zfs.pool_destroy') and data.get('pool'):
+        name = data['pool']
+    else:
+        return
+
+    await middleware.call('pool.dataset.invalidate_properties_cache', name)
+
+
+async def setup(middleware):
+    middleware.register_hook('zfs.pool.events', zfs_events_hook)
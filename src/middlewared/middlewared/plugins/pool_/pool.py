@@ -142,6 +142,15 @@ class PoolService(CRUDService):
         Common method for `pool.pool_extend` and `boot.get_state` returning a uniform
         data structure for its consumers.
         """
+        info = await self.middleware.call('zfs.pool.query', [('name', '=', pool_name)])
+        return await self.middleware.call('pool.normalize_info', pool_name, info[0] if info else None)
+
+    @private
+    def normalize_info(self, pool_name, info):
+        """
+        Implementation of `pool_normalize_info` for pool `pool_name` using already retrieved
+        `zfs.pool.query` entry `info` (or None if the pool is not imported).
+        """
         rv = {
             'name': pool_name,
             'path': '/' if pool_name in BOOT_POOL_NAME_VALID else f'/mnt/{pool_name}',
@@ -173,9 +182,7 @@ class PoolService(CRUDService):
             },
         }
 
-        if info := await self.middleware.call('zfs.pool.query', [('name', '=', pool_name)]):
-            info = info[0]
-
+        if info:
             # `zpool.c` uses `zpool_get_state_str` to print pool status.
             # This function return value is exposed as `health` property.
             # `SUSPENDED` is the only differing status at the moment.
@@ -187,7 +194,7 @@ class PoolService(CRUDService):
                 'status': status,
                 'scan': info['scan'],
                 'expand': info['expand'],
-                'topology': await self.middleware.call('pool.transform_topology', info['groups']),
+                'topology': self.middleware.call_sync('pool.transform_topology', info['groups']),
                 'healthy': info['healthy'],
                 'warning': info['warning'],
                 'status_code': info['status_code'],
@@ -211,8 +218,18 @@ class PoolService(CRUDService):
 
     @private
     def pool_extend_context(self, rows, extra):
+        # Retrieve state of all pools in a single libzfs pass instead of one per pool
+        names = [row['name'] for row in rows]
+        if len(names) == 1:
+            zfs_pools = self.middleware.call_sync('zfs.pool.query', [['name', '=', names[0]]])
+        elif names:
+            zfs_pools = self.middleware.call_sync('zfs.pool.query', [['name', 'in', names]])
+        else:
+            zfs_pools = []
+
         return {
             "extra": extra,
+            "zfs_pools": {zfs_pool['name']: zfs_pool for zfs_pool in zfs_pools},
         }
 
     @private
@@ -221,7 +238,7 @@ class PoolService(CRUDService):
             pool['is_upgraded'] = self.middleware.call_sync('pool.is_upgraded_by_name', pool['name'])
 
         # WebUI expects the same data as in `boot.get_state`
-        pool |= self.middleware.call_sync('pool.pool_normalize_info', pool['name'])
+        pool |= self.normalize_info(pool['name'], context['zfs_pools'].get(pool['name']))
         return pool
 
     async def __convert_topology_to_vdevs(self, topology):
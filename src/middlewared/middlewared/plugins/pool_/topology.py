@@ -1,11 +1,37 @@
+import copy
+import threading
 from collections import deque
 
 from middlewared.service import private, Service
 from .utils import RE_DRAID_SPARE_DISKS, RE_DRAID_DATA_DISKS, RE_DRAID_NAME
 
 
+# Events after which disks backing pool vdevs might be different
+TOPOLOGY_CACHE_INVALIDATING_EVENTS = (
+    'resource.fs.zfs.statechange',
+    'sysevent.fs.zfs.config_sync',
+    'sysevent.fs.zfs.pool_destroy',
+    'sysevent.fs.zfs.pool_import',
+    'sysevent.fs.zfs.resilver_start',
+    'sysevent.fs.zfs.resilver_finish',
+    'sysevent.fs.zfs.scrub_start',
+    'sysevent.fs.zfs.scrub_finish',
+    'sysevent.fs.zfs.vdev_add',
+    'sysevent.fs.zfs.vdev_attach',
+    'sysevent.fs.zfs.vdev_clear',
+    'sysevent.fs.zfs.vdev_online',
+    'sysevent.fs.zfs.vdev_remove',
+)
+
+
 class PoolService(Service):
 
+    # Disks backing vdevs of imported pools: vdev label -> (device, disk).
+    # Invalidated by ZFS and udev events. Disk entries for vdevs that are not ONLINE
+    # come from the database and so are never cached.
+    topology_labels_cache = {}
+    topology_cache_lock = threading.Lock()
+
     class Config:
         cli_namespace = 'storage.pool'
         event_send = False
@@ -25,20 +51,57 @@ class PoolService(Service):
         return await self.middleware.call('pool.transform_topology', x, {'device_disk': False, 'unavail_disk': False})
 
     @private
-    def transform_topology(self, x, options=None):
+    def topology_cache_invalidate(self):
+        with self.topology_cache_lock:
+            self.topology_labels_cache.clear()
+
+    @private
+    def topology_disks(self, x, options):
+        """
+        Look up disks backing all vdevs in topology `x`. Devices that are not cached yet and disk
+        entries for vdevs that are not ONLINE are looked up in two bulk calls.
+        """
+        labels = set()
+        guids = set()
+        stack = [x]
+        while stack:
+            item = stack.pop()
+            if isinstance(item, list):
+                stack.extend(item)
+            elif isinstance(item, dict):
+                if options.get('device_disk', True) and (item.get('path') or '').startswith('/dev/'):
+                    labels.add(item['path'][5:])
+                if options.get('unavail_disk', True) and item.get('guid') is not None:
+                    if item.get('status') != 'ONLINE':
+                        guids.add(item['guid'])
+
+                stack.extend(v for v in item.values() if isinstance(v, (dict, list)))
+
+        with self.topology_cache_lock:
+            if missing := labels - self.topology_labels_cache.keys():
+                self.topology_labels_cache.update(self.middleware.call_sync('disk.labels_to_disks', list(missing)))
+
+            labels = {label: self.topology_labels_cache[label] for label in labels}
+
+        return labels, self.middleware.call_sync('disk.disks_by_zfs_guid', list(guids)) if guids else {}
+
+    @private
+    def transform_topology(self, x, options=None, disks=None):
         """
         Transform topology output from libzfs to add `device` and make `type` uppercase.
         """
         options = options or {}
+        if disks is None:
+            disks = self.topology_disks(x, options)
+
+        labels, guids = disks
         if isinstance(x, dict):
             if options.get('device_disk', True):
                 path = x.get('path')
                 if path is not None:
                     device = disk = None
                     if path.startswith('/dev/'):
-                        args = [path[5:]]
-                        device = self.middleware.call_sync('disk.label_to_dev', *args)
-                        disk = self.middleware.call_sync('disk.label_to_disk', *args)
+                        device, disk = labels.get(path[5:], (None, None))
                     x['device'] = device
                     x['disk'] = disk
 
@@ -47,7 +110,7 @@ class PoolService(Service):
                 if guid is not None:
                     unavail_disk = None
                     if x.get('status') != 'ONLINE':
-                        unavail_disk = self.middleware.call_sync('disk.disk_by_zfs_guid', guid)
+                        unavail_disk = copy.deepcopy(guids.get(guid))
                     x['unavail_disk'] = unavail_disk
 
             for key in x:
@@ -60,8 +123,23 @@ class PoolService(Service):
                         'draid_parity': int(x['name'][len('draid'):len('draid') + 1]),
                     })
                 else:
-                    x[key] = self.transform_topology(x[key], dict(options, geom_scan=False))
+                    x[key] = self.transform_topology(x[key], dict(options, geom_scan=False), disks)
         elif isinstance(x, list):
             for i, entry in enumerate(x):
-                x[i] = self.transform_topology(x[i], dict(options, geom_scan=False))
+                x[i] = self.transform_topology(x[i], dict(options, geom_scan=False), disks)
         return x
+
+
+async def zfs_events_hook(middleware, data):
+    if data['class'] in TOPOLOGY_CACHE_INVALIDATING_EVENTS:
+        await middleware.call('pool.topology_cache_invalidate')
+
+
+async def udev_block_devices_hook(middleware, data):
+    if data.get('SUBSYSTEM') == 'block' and data.get('ACTION') in ('add', 'remove'):
+        await middleware.call('pool.topology_cache_invalidate')
+
+
+async def setup(middleware):
+    middleware.register_hook('zfs.pool.events', zfs_events_hook)
+    middleware.register_hook('udev.block', udev_block_devices_hook)
@@ -707,6 +707,9 @@ class RsyncFSAttachmentDelegate(LockableFSAttachmentDelegate):
         await self.middleware.call('service.restart', 'cron')
 
 
+SETUP_DEPENDS = []
+
+
 async def setup(middleware):
     await middleware.call('pool.dataset.register_attachment_delegate', RsyncFSAttachmentDelegate(middleware))
     await middleware.call('network.general.register_activity', 'rsync', 'Rsync')
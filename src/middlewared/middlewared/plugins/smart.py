@@ -25,16 +25,23 @@ from middlewared.api.current import (
 
 RE_TIME = re.compile(r'test will complete after ([a-z]{3} [a-z]{3} [0-9 ]+ \d\d:\d\d:\d\d \d{4})', re.IGNORECASE)
 RE_TIME_SCSIPRINT_EXTENDED = re.compile(r'Please wait (\d+) minutes for test to complete')
+# Self-test results collected by the periodic S.M.A.R.T. collector (see `disk.smart_collect`) are used if they are not
+# older than this
+SMART_RESULTS_MAX_AGE = 300
 
 
 async def annotate_disk_smart_tests(middleware, tests_filter, disk):
     if disk["disk"] is None:
         return
 
-    output = await middleware.call("disk.smartctl", disk["disk"], ["-a", "--json=c"], {"silent": True})
-    if output is None:
-        return
-    data = json.loads(output)
+    data = await middleware.call("disk.smart_snapshot_get", disk["disk"], SMART_RESULTS_MAX_AGE)
+    if data is None or parse_current_smart_selftest(data) is not None:
+        # Test progress must always be up-to-date
+        output = await middleware.call("disk.smartctl", disk["disk"], ["-a", "--json=c"], {"silent": True})
+        if output is None:
+            return
+        data = json.loads(output)
+        await middleware.call("disk.smart_snapshot_update", disk["disk"], data)
 
     tests = parse_smart_selftest_results(data) or []
     current_test = parse_current_smart_selftest(data)
@@ -534,6 +541,8 @@ class SMARTTestService(CRUDService):
         args = ['-t', disk['type'].lower()]
         if disk['mode'] == 'FOREGROUND':
             args.extend(['-C'])
+
+        await self.middleware.call('disk.smart_snapshot_invalidate', disk['disk'])
         try:
             result = await self.middleware.call('disk.smartctl', disk['disk'], args)
         except CallError as e:
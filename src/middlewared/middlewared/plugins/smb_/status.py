@@ -3,9 +3,12 @@ from middlewared.service import Service, accepts
 from middlewared.plugins.smb import SMBCmd
 from middlewared.service_exception import CallError
 from middlewared.utils import filter_list
+from middlewared.utils.tdb import TDBDataType, TDBHandle, TDBOptions, TDBPathType
+from .constants import SMBPath
 
 import enum
 import json
+import os
 import subprocess
 import time
 
@@ -20,6 +23,33 @@ class InfoLevel(enum.Enum):
     NOTIFICATIONS = 'N'
 
 
+SMBSTATUS_TDB_OPTIONS = TDBOptions(TDBPathType.CUSTOM, TDBDataType.BYTES)
+# smbd databases that contain a single record per entry of respective info level
+SMBSTATUS_TDB_FILES = {
+    InfoLevel.SESSIONS: 'smbXsrv_session_global.tdb',
+    InfoLevel.SHARES: 'smbXsrv_tcon_global.tdb',
+}
+
+
+def count_status_entries(lvl):
+    """
+    Count sessions or share connections by counting records in smbd's databases. This
+    is a lot cheaper than generating and parsing complete smbstatus output, but (same
+    as `smbstatus --fast`) does not validate whether processes that the records refer
+    to still exist.
+
+    The database is opened for every call rather than through the cached `get_tdb_handle`.
+    smbd opens these databases with CLEAR_IF_FIRST and truncates and rewrites them in place
+    on start, which leaves the inode intact and so a cached handle could keep using a stale
+    mapping.
+    """
+    hdl = TDBHandle(os.path.join(SMBPath.LOCKDIR.path, SMBSTATUS_TDB_FILES[lvl]), SMBSTATUS_TDB_OPTIONS)
+    try:
+        return hdl.count()
+    finally:
+        hdl.close()
+
+
 class SMBService(Service):
 
     class Config:
@@ -66,6 +96,16 @@ class SMBService(Service):
                 'query-options': options
             })
 
+        if (
+            lvl in SMBSTATUS_TDB_FILES and options.get('count') and not filters and status_options['fast'] and
+            not status_options['restrict_user'] and not status_options['restrict_session']
+        ):
+            try:
+                return count_status_entries(lvl)
+            except (OSError, RuntimeError):
+                # smbd databases do not exist (yet) or can not be opened, smbstatus knows how to handle that
+                self.logger.debug('Failed to count SMB %s natively', lvl.name.lower(), exc_info=True)
+
         """
         Apply some optimizations for case where filter is only asking
         for a specific uid or session id.
@@ -247,6 +247,10 @@ class SSHServicePortDelegate(ServicePortDelegate):
     title = 'SSH Service'
 
 
+# Generating host keys during boot does not need to hold up setup of other plugins
+SETUP_DEPENDS = []
+
+
 async def setup(middleware):
     await middleware.call('port.register_attachment_delegate', SSHServicePortDelegate(middleware))
     if await middleware.call('core.is_starting_during_boot'):
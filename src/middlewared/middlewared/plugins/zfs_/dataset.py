@@ -6,7 +6,7 @@ from middlewared.schema import accepts, Bool, Dict, Str
 from middlewared.service import CallError, CRUDService, filterable, ValidationErrors
 from middlewared.utils import filter_list
 
-from .dataset_utils import flatten_datasets
+from .dataset_utils import flatten_datasets, invalidate_properties_cache
 from .utils import get_snapshot_count_cached
 
 
@@ -149,6 +149,8 @@ class ZFSDatasetService(CRUDService):
             raise CallError(f'Failed to create dataset: {e}')
         else:
             return data
+        finally:
+            invalidate_properties_cache(self.middleware, data['name'])
 
     @accepts(
         Str('id'),
@@ -178,6 +180,8 @@ class ZFSDatasetService(CRUDService):
             raise CallError(f'Failed to update dataset: {e}')
         else:
             return data
+        finally:
+            invalidate_properties_cache(self.middleware, id_)
 
     @accepts(
         Str('id'),
@@ -210,6 +214,7 @@ class ZFSDatasetService(CRUDService):
             subprocess.run(
                 ['zfs', 'destroy'] + args + [id_], text=True, capture_output=True, check=True,
             )
+            invalidate_properties_cache(self.middleware, id_)
         except subprocess.CalledProcessError as e:
             if recv_run.returncode == 0 and e.stderr.strip().endswith('dataset does not exist'):
                 # This operation might have deleted this dataset if it was created by `zfs recv` operation
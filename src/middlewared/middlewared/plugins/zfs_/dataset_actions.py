@@ -7,6 +7,8 @@ from middlewared.service import CallError, Service
 from middlewared.utils.mount import getmntinfo
 from middlewared.utils.path import is_child
 
+from .dataset_utils import invalidate_properties_cache
+
 
 def handle_ds_not_found(error_code: int, ds_name: str):
     if error_code == libzfs.Error.NOENT.value:
@@ -105,6 +107,9 @@ class ZFSDatasetService(Service):
             self.logger.error('Failed to rename dataset', exc_info=True)
             handle_ds_not_found(e.code, name)
             raise CallError(f'Failed to rename dataset: {e}')
+        finally:
+            invalidate_properties_cache(self.middleware, name)
+            invalidate_properties_cache(self.middleware, options['new_name'])
 
     def promote(self, name):
         try:
@@ -115,6 +120,8 @@ class ZFSDatasetService(Service):
             self.logger.error('Failed to promote dataset', exc_info=True)
             handle_ds_not_found(e.code, name)
             raise CallError(f'Failed to promote dataset: {e}')
+        finally:
+            invalidate_properties_cache(self.middleware, name)
 
     def inherit(self, name, prop, recursive=False):
         try:
@@ -139,3 +146,5 @@ class ZFSDatasetService(Service):
             # SHARENFSFAILED. We give special return in this case
             # so that caller can set this property to "off"
             raise CallError(err, errno.EPROTONOSUPPORT)
+        finally:
+            invalidate_properties_cache(self.middleware, name)
@@ -4,7 +4,7 @@ from middlewared.schema import accepts, Any, Bool, Dict, Int, List, Ref, Str
 from middlewared.service import CallError, job, Service
 from middlewared.utils import filter_list
 
-from .dataset_utils import flatten_datasets
+from .dataset_utils import flatten_datasets, invalidate_properties_cache
 from .utils import unlocked_zvols_fast, zvol_path_to_name
 
 
@@ -208,6 +208,8 @@ class ZFSDatasetService(Service):
         except libzfs.ZFSException as e:
             self.logger.error(f'Failed to change key for {id_}', exc_info=True)
             raise CallError(f'Failed to change key for {id_}: {e}')
+        finally:
+            invalidate_properties_cache(self.middleware, id_)
 
     @accepts(
         Str('id'),
@@ -223,6 +225,8 @@ class ZFSDatasetService(Service):
                 ds.change_key(load_key=options['load_key'], inherit=True)
         except libzfs.ZFSException as e:
             raise CallError(f'Failed to change encryption root for {id_}: {e}')
+        finally:
+            invalidate_properties_cache(self.middleware, id_)
 
     @accepts(Str('name'), List('params', private=True))
     @job()
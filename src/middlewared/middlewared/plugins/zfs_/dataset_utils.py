@@ -3,3 +3,14 @@ from copy import deepcopy
 
 def flatten_datasets(datasets):
     return sum([[deepcopy(ds)] + flatten_datasets(ds.get('children') or []) for ds in datasets], [])
+
+
+def invalidate_properties_cache(middleware, name):
+    """
+    Properties of dataset `name` and its children were changed, drop them from the dataset
+    properties cache of the main middleware process (see `pool.dataset.zfs_query`).
+    """
+    try:
+        middleware.call_sync('pool.dataset.invalidate_properties_cache', name)
+    except Exception:
+        middleware.logger.warning('Failed to invalidate properties cache of %r', name, exc_info=True)
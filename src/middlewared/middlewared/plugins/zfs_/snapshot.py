@@ -1,9 +1,10 @@
 import copy
 import errno
 import libzfs
+from collections import defaultdict
 
 from middlewared.schema import accepts, Bool, Dict, List, Str
-from middlewared.service import CallError, CRUDService, filterable, private, ValidationErrors
+from middlewared.service import bulk_group, CallError, CRUDService, filterable, private, ValidationErrors
 from middlewared.service_exception import InstanceNotFound
 from middlewared.utils import filter_list, filter_getattrs
 from middlewared.validators import Match, ReplicationSnapshotNamingSchema
@@ -12,6 +13,12 @@ from .utils import get_snapshot_count_cached
 from .validation_utils import validate_snapshot_name
 
 
+def delete_bulk_group(args):
+    # Snapshots of the same pool can be deleted using a single libzfs handle
+    if args and isinstance(args[0], str) and '@' in args[0]:
+        return args[0].split('@')[0].split('/')[0]
+
+
 class ZFSSnapshot(CRUDService):
 
     class Config:
@@ -258,36 +265,133 @@ class ZFSSnapshot(CRUDService):
             Bool('recursive', default=False),
         ),
     )
+    @bulk_group(delete_bulk_group, 'delete_batch')
     def do_delete(self, id_, options):
         """
         Delete snapshot of name `id`.
 
         `options.defer` will defer the deletion of snapshot.
         """
-        verrors = ValidationErrors()
         try:
             with libzfs.ZFS() as zfs:
-                snap = zfs.get_snapshot(id_)
-                snap.delete(defer=options['defer'], recursive=options['recursive'])
+                self._delete(zfs, id_, options)
+        except libzfs.ZFSException as e:
+            raise CallError(str(e))
+
+        return True
+
+    @private
+    def delete_batch(self, params):
+        """
+        Delete multiple snapshots using a single libzfs handle. `params` is a list of `zfs.snapshot.delete` call
+        arguments.
+
+        Snapshots of the same dataset that are neither deferred nor recursive are destroyed with a single
+        `zfs_destroy_snaps` call. If it fails (i.e. one of the snapshots is held or has dependent clones), nothing
+        is destroyed and these snapshots are deleted one by one so that an error is reported for each of them.
+
+        Every call is validated against the `zfs.snapshot.delete` schema separately so that invalid call arguments
+        only fail that call.
+
+        Returns a list of `{"result": ..., "error": ...}` statuses in the order of `params`.
+        """
+        statuses = [None] * len(params)
+        requests = []
+        for i, p in enumerate(params):
+            try:
+                id_, options = self.do_delete.clean_and_validate_call_args(p)
+            except Exception as e:
+                statuses[i] = {'result': None, 'error': str(e)}
+                id_, options = None, None
+
+            requests.append((id_, options))
+
+        try:
+            with libzfs.ZFS() as zfs:
+                batches = defaultdict(list)
+                for i, (id_, options) in enumerate(requests):
+                    if statuses[i] is not None or options['defer'] or options['recursive'] or '@' not in id_:
+                        continue
+
+                    try:
+                        zfs.get_snapshot(id_)
+                    except libzfs.ZFSException as e:
+                        if e.code == libzfs.Error.NOENT:
+                            statuses[i] = {'result': None, 'error': str(InstanceNotFound(str(e)))}
+                            continue
+
+                        raise
+
+                    batches[id_.split('@')[0]].append(i)
+
+                for dataset, indexes in batches.items():
+                    try:
+                        zfs.get_dataset(dataset).delete_snapshots({
+                            'snapshots': [requests[i][0].split('@', 1)[1] for i in indexes],
+                        })
+                    except libzfs.ZFSException as e:
+                        self.logger.debug('Failed to delete %d snapshots of %r at once: %s', len(indexes), dataset, e)
+                    else:
+                        for i in indexes:
+                            self._send_removed_event(*requests[i])
+                            statuses[i] = {'result': True, 'error': None}
+
+                for i, (id_, options) in enumerate(requests):
+                    if statuses[i] is not None:
+                        continue
+
+                    try:
+                        self._delete(zfs, id_, options)
+                    except Exception as e:
+                        statuses[i] = {'result': None, 'error': str(e)}
+                    else:
+                        statuses[i] = {'result': True, 'error': None}
+        except libzfs.ZFSException as e:
+            for i, status in enumerate(statuses):
+                if status is None:
+                    statuses[i] = {'result': None, 'error': str(e)}
+
+        return statuses
+
+    def _delete(self, zfs, id_, options):
+        verrors = ValidationErrors()
+        try:
+            snap = zfs.get_snapshot(id_)
+            snap.delete(defer=options['defer'], recursive=options['recursive'])
         except libzfs.ZFSException as e:
             if e.code == libzfs.Error.NOENT:
                 raise InstanceNotFound(str(e))
 
             if e.args and isinstance(e.args[0], str) and 'snapshot has dependent clones' in e.args[0]:
-                with libzfs.ZFS() as zfs:
-                    dep = list(zfs.get_snapshot(id_).dependents)
-                    if len(dep) and not options['defer']:
-                        verrors.add(
-                            'options.defer',
-                            f'Please set this attribute as {snap.name!r} snapshot has dependent clones: '
-                            f'{", ".join([i.name for i in dep])}'
-                        )
-                        verrors.check()
+                dep = list(zfs.get_snapshot(id_).dependents)
+                if len(dep) and not options['defer']:
+                    verrors.add(
+                        'options.defer',
+                        f'Please set this attribute as {snap.name!r} snapshot has dependent clones: '
+                        f'{", ".join([i.name for i in dep])}'
+                    )
+                    verrors.check()
+
+            if not options['defer']:
+                try:
+                    holds = list(zfs.get_snapshot(id_).holds)
+                except libzfs.ZFSException:
+                    holds = []
+
+                if holds:
+                    verrors.add(
+                        'options.defer',
+                        f'Please set this attribute or release the snapshot as {id_!r} snapshot is held: '
+                        f'{", ".join(holds)}'
+                    )
+                    verrors.check()
 
             raise CallError(str(e))
         else:
-            # TODO: Events won't be sent for child snapshots in recursive delete
-            self.middleware.send_event(
-                f'{self._config.namespace}.query', 'REMOVED', id=id_, recursive=options['recursive'],
-            )
-            return True
+            self._send_removed_event(id_, options)
+
+    def _send_removed_event(self, id_, options):
+        # TODO: Events won't be sent for child snapshots in recursive delete
+        self.middleware.send_event(
+            f'{self._config.namespace}.query', 'REMOVED', id=id_, recursive=options['recursive'],
+        )
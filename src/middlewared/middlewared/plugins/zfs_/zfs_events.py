@@ -1,3 +1,4 @@
+import asyncio
 import threading
 
 import libzfs
@@ -6,12 +7,28 @@ from middlewared.alert.base import (
     Alert, AlertCategory, AlertClass, AlertLevel, OneShotAlertClass, SimpleOneShotAlertClass
 )
 from middlewared.plugins.boot import BOOT_POOL_NAME
+from middlewared.plugins.pool_.utils import get_props_of_interest_mapping
 from middlewared.utils.threading import start_daemon_thread
 
 CACHE_POOLS_STATUSES = 'system.system_health_pools'
 
 SCAN_THREADS = {}
 
+# ZFS history events of a dataset that result in `pool.dataset.query` event
+DATASET_HISTORY_EVENTS = {
+    'create': 'ADDED',
+    'clone': 'ADDED',
+    'set': 'CHANGED',
+    'inherit': 'CHANGED',
+    'promote': 'CHANGED',
+    'receive': 'CHANGED',  # ADDED if the dataset was created by the receive (see `DatasetEventsCoalescer`)
+    'finish receiving': 'CHANGED',
+}
+DATASET_EVENTS_WINDOW = 5  # seconds during which history events are coalesced before datasets are refreshed
+DATASET_EVENTS_BATCH = 100  # maximum number of datasets refreshed by a single query
+DATASET_EVENTS_MAX_PENDING = 10000  # events for further datasets are dropped
+DATASET_EVENTS = None
+
 
 class ScanWatch(object):
 
@@ -80,6 +97,166 @@ class ScrubFinishedAlertClass(AlertClass, SimpleOneShotAlertClass):
     deleted_automatically = False
 
 
+class DatasetEventsCoalescer:
+    """
+    Turns ZFS history events into `pool.dataset.query` events.
+
+    A replication receive or a script run from the shell can produce a lot of history events in a short
+    period of time. Events are collected per dataset for `DATASET_EVENTS_WINDOW` seconds and the changed
+    datasets are then retrieved in batches of `DATASET_EVENTS_BATCH` with a single query each. Only one
+    batch is being retrieved at a time so the process pool is never flooded, events keep coalescing while
+    it runs. At most `DATASET_EVENTS_MAX_PENDING` datasets are tracked, events for others are dropped.
+
+    Datasets that are missing from the result of a batch query (or all of them if the query fails) are
+    retried one by one so that a single problematic dataset does not suppress events for the whole batch.
+
+    ZFS logs a `receive` history event (rather than `create`) for a dataset created by a full replication
+    receive. The event is logged in the same txg the dataset was created in, such datasets are reported as added.
+
+    A single history event is logged for a renamed dataset and its children. The whole old subtree is reported
+    as removed and the new one (retrieved along with children) as added right away.
+
+    `pool.dataset.create` and `pool.dataset.update` send events themselves. Pending events for datasets
+    they have just reported are discarded. History events that arrive after the API has sent its event
+    will still result in a second (identical) event.
+    """
+
+    def __init__(self, middleware):
+        self.middleware = middleware
+        self.pending = {}  # dataset name -> event type
+        self.received = {}  # dataset name -> txg of its first pending `receive` history event
+        self.task = None
+        self.dropped = 0
+
+    def add(self, name, event_type, received_txg=None):
+        if name in self.pending:
+            if self.pending[name] != 'ADDED':
+                self.pending[name] = event_type
+        elif len(self.pending) >= DATASET_EVENTS_MAX_PENDING:
+            if not self.dropped:
+                self.middleware.logger.warning('Too many changed datasets, dropping dataset events')
+            self.dropped += 1
+            return
+        else:
+            self.pending[name] = event_type
+
+        if received_txg is not None:
+            self.received.setdefault(name, received_txg)
+
+        if self.task is None:
+            self.task = self.middleware.create_task(self.run())
+
+    def discard(self, name, children=True):
+        for pending in [name] + ([i for i in self.pending if i.startswith(f'{name}/')] if children else []):
+            self.pending.pop(pending, None)
+            self.received.pop(pending, None)
+
+    async def run(self):
+        try:
+            while self.pending:
+                await asyncio.sleep(DATASET_EVENTS_WINDOW)
+                pending, self.pending = self.pending, {}
+                received, self.received = self.received, {}
+                names = list(pending)
+                for i in range(0, len(names), DATASET_EVENTS_BATCH):
+                    try:
+                        await self.refresh(
+                            {name: pending[name] for name in names[i:i + DATASET_EVENTS_BATCH]}, received,
+                        )
+                    except Exception:
+                        self.middleware.logger.warning('Failed to retrieve changed datasets', exc_info=True)
+        finally:
+            self.task = None
+            if self.dropped:
+                self.middleware.logger.warning('%d dataset events were dropped', self.dropped)
+                self.dropped = 0
+
+    async def refresh(self, batch, received=None):
+        batch = await self.received_added(batch, received or {})
+        try:
+            datasets = await self.query(list(batch))
+        except Exception:
+            self.middleware.logger.debug('Failed to retrieve %d changed datasets at once', len(batch), exc_info=True)
+            datasets = []
+
+        self.send_events(batch, datasets)
+
+        for name in batch.keys() - {dataset['id'] for dataset in datasets}:
+            try:
+                self.send_events(batch, await self.query([name]))
+            except Exception:
+                self.middleware.logger.warning('Failed to retrieve changed dataset %r', name, exc_info=True)
+
+    async def received_added(self, batch, received):
+        """
+        Returns `batch` with datasets that were created by the pending `receive` history events marked as ADDED.
+        """
+        if not (names := [name for name in batch if batch[name] == 'CHANGED' and name in received]):
+            return batch
+
+        try:
+            datasets = await self.middleware.call('zfs.dataset.query', [['id', 'in', names]], {
+                'extra': {'flat': True, 'retrieve_children': False, 'properties': ['createtxg']},
+            })
+        except Exception:
+            self.middleware.logger.debug('Failed to retrieve received datasets creation txg', exc_info=True)
+            return batch
+
+        batch = dict(batch)
+        for dataset in datasets:
+            if int(dataset['properties']['createtxg']['rawvalue']) == int(received[dataset['id']]):
+                batch[dataset['id']] = 'ADDED'
+
+        return batch
+
+    async def rename(self, name, new_name):
+        # Pending events refer to the old names that no longer exist
+        self.discard(name)
+        try:
+            datasets = await self.query([new_name], retrieve_children=True)
+        except Exception:
+            self.middleware.logger.warning('Failed to retrieve renamed dataset %r', new_name, exc_info=True)
+            datasets = []
+
+        subtree = []
+        stack = list(datasets)
+        while stack:
+            dataset = stack.pop(0)
+            subtree.append(dataset)
+            stack.extend(dataset.get('children') or [])
+
+        if not subtree:
+            self.middleware.send_event('pool.dataset.query', 'REMOVED', id=name)
+            return
+
+        for dataset in subtree:
+            self.middleware.send_event(
+                'pool.dataset.query', 'REMOVED', id=name + dataset['id'].removeprefix(new_name),
+            )
+        for dataset in subtree:
+            self.discard(dataset['id'], children=False)
+            self.middleware.send_event('pool.dataset.query', 'ADDED', id=dataset['id'], fields=dataset)
+
+    async def query(self, names, retrieve_children=False):
+        return await self.middleware.call(
+            'pool.dataset.query', [['id', 'in', names]], {
+                'extra': {
+                    'retrieve_children': retrieve_children,
+                    'properties': [orig_name for orig_name, new_name, method in get_props_of_interest_mapping()],
+                },
+            },
+        )
+
+    def send_events(self, batch, datasets):
+        for dataset in datasets:
+            event_type = batch[dataset['id']]
+            if event_type == 'CHANGED':
+                # Children were not retrieved, do not make subscribers think they are gone
+                dataset.pop('children', None)
+
+            self.middleware.send_event('pool.dataset.query', event_type, id=dataset['id'], fields=dataset)
+
+
 async def resilver_scrub_start(middleware, pool_name):
     if not pool_name:
         return
@@ -193,15 +370,20 @@ async def zfs_events(middleware, data):
             # We should not raise any event for system internal datasets
             return
 
-        # We are not handling create/changed events because it takes a toll on middleware when we are replicating
-        # datasets and repeated calls to the process pool can result in tasks getting blocked for longer periods
-        # of time and middleware itself getting slow as well to process requests in a timely manner
-        # We are now handling create/changed events whenever changes are made via our API
-        if event_type == 'destroy':
-            if ds_id.split('/')[-1].startswith('%'):
-                # Ignore deletion of hidden clones such as `%recv` dataset created by replication
-                return
+        if ds_id.split('/')[-1].startswith('%'):
+            # Ignore hidden clones such as `%recv` dataset created by replication
+            return
 
+        # Create/changed events are coalesced because handling each of them separately takes a toll on
+        # middleware when we are replicating datasets (see `DatasetEventsCoalescer`)
+        if event_type in DATASET_HISTORY_EVENTS:
+            if '@' not in ds_id:
+                DATASET_EVENTS.add(
+                    ds_id, DATASET_HISTORY_EVENTS[event_type],
+                    data.get('history_txg') if event_type == 'receive' else None,
+                )
+        elif event_type == 'destroy':
+            DATASET_EVENTS.discard(ds_id)
             middleware.send_event('pool.dataset.query', 'REMOVED', id=ds_id)
 
             await middleware.call(
@@ -210,11 +392,33 @@ async def zfs_events(middleware, data):
                 ]
             )
             await middleware.call_hook('dataset.post_delete', data['history_dsname'])
+        elif event_type == 'rename' and '@' not in ds_id:
+            # The new name is only included in the formatted history message (`-> <new name>`)
+            history_str = data.get('history_internal_str') or ''
+            if history_str.startswith('-> ') and '@' not in (new_name := history_str[3:]):
+                await DATASET_EVENTS.rename(ds_id, new_name)
+            else:
+                DATASET_EVENTS.discard(ds_id)
+
+
+async def dataset_post_create_hook(middleware, data):
+    # `pool.dataset.create` sends the event itself
+    DATASET_EVENTS.discard(data['name'], children=False)
+
+
+async def dataset_post_update_hook(middleware, name):
+    # `pool.dataset.update` sends the event itself
+    DATASET_EVENTS.discard(name, children=False)
 
 
 async def setup(middleware):
+    global DATASET_EVENTS
+    DATASET_EVENTS = DatasetEventsCoalescer(middleware)
+
     middleware.event_register('zfs.pool.scan', 'Progress of pool resilver/scrub.', roles=['POOL_SCRUB_READ'])
     middleware.register_hook('zfs.pool.events', zfs_events, sync=False)
+    middleware.register_hook('dataset.post_create', dataset_post_create_hook)
+    middleware.register_hook('dataset.post_update', dataset_post_update_hook)
 
     # middleware does not receive `sysevent.fs.zfs.pool_import` or `sysevent.fs.zfs.config_sync` events on the boot pool
     # import because it happens before middleware is started. We have to manually process these alerts for the boot pool
@@ -0,0 +1,72 @@
+from unittest.mock import patch
+
+import pytest
+
+from middlewared.api.base import BaseModel
+from middlewared.api.base.handler import version as version_module
+from middlewared.api.base.handler.version import (
+    APIVersion, APIVersionsAdapter, APIVersionDoesNotContainModelException,
+)
+
+
+class Contact(BaseModel):
+    name: str
+
+
+class SettingsV1(BaseModel):
+    contacts: list[Contact]
+    primary: Contact | None = None
+
+
+class Contact(BaseModel):
+    name: str
+    tags: list[str] = []
+
+
+class SettingsV2(BaseModel):
+    contacts: list[Contact]
+    primary: Contact | None = None
+
+
+def make_adapter():
+    return APIVersionsAdapter([
+        APIVersion("v1", {"Settings": SettingsV1}),
+        APIVersion("v2", {"Settings": SettingsV2}),
+    ])
+
+
+def test_plan_is_reused():
+    adapter = make_adapter()
+    value = {"contacts": [{"name": "Jane"}], "primary": {"name": "John"}}
+
+    with patch.object(version_module, "model_field_is_model", wraps=version_module.model_field_is_model) as m:
+        assert adapter.adapt(dict(value), "Settings", "v1", "v2") == {
+            "contacts": [{"name": "Jane", "tags": []}],
+            "primary": {"name": "John", "tags": []},
+        }
+        calls = m.call_count
+        assert calls > 0
+
+        adapter.adapt(dict(value), "Settings", "v1", "v2")
+        assert m.call_count == calls
+
+    assert list(adapter.conversion_plans) == [("Settings", "v1", "v2")]
+
+
+def test_default_values_are_not_shared():
+    adapter = make_adapter()
+
+    result1 = adapter.adapt({"contacts": [{"name": "Jane"}]}, "Settings", "v1", "v2")
+    result1["contacts"][0]["tags"].append("friend")
+
+    result2 = adapter.adapt({"contacts": [{"name": "Jane"}]}, "Settings", "v1", "v2")
+    assert result2["contacts"][0]["tags"] == []
+
+
+def test_missing_model_is_not_cached():
+    adapter = make_adapter()
+
+    with pytest.raises(APIVersionDoesNotContainModelException):
+        adapter.adapt({}, "Unknown", "v1", "v2")
+
+    assert adapter.conversion_plans == {}
@@ -0,0 +1,51 @@
+from unittest.mock import patch
+
+from middlewared.plugins.crypto_ import query_utils
+from middlewared.plugins.crypto_.query_utils import ParsedCache
+
+
+def test__parsed_cache():
+    calls = []
+
+    def parse(pem):
+        calls.append(pem)
+        return {'pem': pem, 'san': []}
+
+    cache = ParsedCache()
+    result = cache.get(parse, 'a')
+    result['san'].append('modified')
+
+    assert cache.get(parse, 'a') == {'pem': 'a', 'san': []}
+    assert cache.get(parse, 'b') == {'pem': 'b', 'san': []}
+    assert calls == ['a', 'b']
+
+    cache.clear()
+    cache.get(parse, 'a')
+    assert calls == ['a', 'b', 'a']
+
+
+def test__parsed_cache_failures_are_cached():
+    calls = []
+
+    def parse(pem):
+        calls.append(pem)
+        return {}
+
+    cache = ParsedCache()
+    assert cache.get(parse, 'invalid') == {}
+    assert cache.get(parse, 'invalid') == {}
+    assert calls == ['invalid']
+
+
+def test__parsed_cache_size():
+    def parse(pem):
+        return pem
+
+    cache = ParsedCache()
+    with patch.object(query_utils, 'PARSED_CACHE_SIZE', 2):
+        for pem in ['a', 'b', 'c']:
+            cache.get(parse, pem)
+
+    assert [key[2] for key in cache.entries] == [
+        query_utils.hashlib.sha256(pem.encode()).digest() for pem in ['b', 'c']
+    ]
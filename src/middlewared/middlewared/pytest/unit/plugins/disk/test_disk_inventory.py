@@ -0,0 +1,68 @@
+import asyncio
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+
+from middlewared.plugins.disk_.disk_events import DiskEventsProcessor
+from middlewared.utils.disks import DiskInventory
+
+
+def disk(name, serial=None, serial_lunid=None, partition_uuid=None):
+    return {
+        'name': name,
+        'serial': serial,
+        'serial_lunid': serial_lunid,
+        'parts': [{
+            'disk': name,
+            'partition_type': '6a898cc3-1dd2-11b2-99a6-080020736631',
+            'partition_uuid': partition_uuid,
+        }] if partition_uuid else [],
+    }
+
+
+def test_disk_inventory():
+    inventory = DiskInventory({
+        'sda': disk('sda', serial='AAAA', serial_lunid='AAAA_1'),
+        'sdb': disk('sdb', serial='BBBB'),
+        'sdc': disk('sdc', partition_uuid='b9253137-a0a4-11ec-b194-3cecef615fde'),
+    })
+
+    assert inventory.ident_to_dev('{serial_lunid}AAAA_1') == 'sda'
+    assert inventory.ident_to_dev('{serial}BBBB') == 'sdb'
+    assert inventory.ident_to_dev('{uuid}b9253137-a0a4-11ec-b194-3cecef615fde') == 'sdc'
+    assert inventory.ident_to_dev('{devicename}sdc') == 'sdc'
+    assert inventory.ident_to_dev('{serial}CCCC') is None
+    assert inventory.ident_to_dev('invalid') is None
+    assert inventory.dev_to_ident('sdb') == '{serial}BBBB'
+
+    inventory.remove('sdb')
+    inventory.update('sdd', disk('sdd', serial='BBBB'))
+    inventory.update('sda', disk('sda', serial='CCCC'))
+
+    assert 'sdb' not in inventory
+    assert inventory.ident_to_dev('{serial}BBBB') == 'sdd'
+    assert inventory.ident_to_dev('{serial_lunid}AAAA_1') is None
+    assert inventory.ident_to_dev('{serial}CCCC') == 'sda'
+
+
+@pytest.mark.asyncio
+async def test_disk_events_are_coalesced():
+    middleware = Mock()
+    middleware.create_task = asyncio.create_task
+    middleware.call = AsyncMock(return_value=Mock(wait=AsyncMock()))
+
+    processor = DiskEventsProcessor(middleware)
+    processor.DEBOUNCE = 0.05
+    for i, action in enumerate(['remove', 'remove', 'add', 'add']):
+        await processor.udev_block_devices_hook(middleware, {
+            'SUBSYSTEM': 'block', 'DEVTYPE': 'disk', 'ACTION': action, 'SYS_NAME': ['sda', 'sdb', 'sda', 'sdc'][i],
+        })
+        await asyncio.sleep(0.01)
+
+    await processor.task
+
+    assert [c.args for c in middleware.call.mock_calls if c.args[0] != 'alert.oneshot_delete'] == [
+        ('disk.sync_all', {'disks': ['sdb', 'sda', 'sdc']}),
+        ('disk.sed_unlock', 'sda'),
+        ('disk.sed_unlock', 'sdc'),
+    ]
@@ -0,0 +1,83 @@
+import json
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+
+from middlewared.plugins.disk_.temperature import DiskService
+from middlewared.plugins.smart import annotate_disk_smart_tests
+
+
+def smartctl_output(temperature, remaining_percent=None):
+    status = {'value': 0, 'string': 'Completed without error', 'passed': True}
+    if remaining_percent is not None:
+        status = {'value': 249, 'string': 'Self-test routine in progress', 'remaining_percent': remaining_percent}
+
+    return {
+        'temperature': {'current': temperature},
+        'power_on_time': {'hours': 100},
+        'ata_smart_self_test_log': {'standard': {'table': [{
+            'type': {'string': 'Short offline'},
+            'status': status,
+            'lifetime_hours': 90,
+        }]}},
+    }
+
+
+def create_service(outputs):
+    middleware = Mock()
+    service = DiskService(middleware)
+    service.smart_snapshot = {}
+    service.cache = {}
+    service.temperature_history.clear()
+
+    async def call(method, *args):
+        match method:
+            case 'smart.config':
+                return {'powermode': 'STANDBY'}
+            case 'disk.query':
+                return [{'name': name} for name in outputs]
+            case 'disk.smartctl':
+                output = outputs[args[0]]
+                return None if output is None else json.dumps(output)
+            case _:
+                return await getattr(service, method.split('.')[-1])(*args)
+
+    middleware.call = AsyncMock(side_effect=call)
+    return service
+
+
+@pytest.mark.asyncio
+async def test_smart_collect():
+    service = create_service({'sda': smartctl_output(35), 'sdb': None})
+
+    await service.smart_collect()
+
+    assert service.cache['sda'][0] == 35
+    assert 'sdb' not in service.cache
+    assert [t for timestamp, t in service.temperature_history['sda']] == [35]
+    assert all(call.args[2][:3] == ['-a', '-n', 'standby'] for call in service.middleware.call.mock_calls
+               if call.args[0] == 'disk.smartctl')
+
+
+@pytest.mark.asyncio
+async def test_smart_test_results_use_snapshot():
+    outputs = {'sda': smartctl_output(35)}
+    service = create_service(outputs)
+    await service.smart_collect()
+
+    outputs['sda'] = smartctl_output(36)
+    result = await annotate_disk_smart_tests(service.middleware, [], {'disk': 'sda'})
+
+    assert result['tests'][0]['status'] == 'SUCCESS'
+    assert service.cache['sda'][0] == 35
+
+
+@pytest.mark.asyncio
+async def test_smart_test_results_in_progress_test_is_not_cached():
+    service = create_service({'sda': smartctl_output(35, remaining_percent=90)})
+    await service.smart_collect()
+
+    result = await annotate_disk_smart_tests(service.middleware, [], {'disk': 'sda'})
+
+    assert result['current_test'] == {'progress': 10}
+    assert [call.args[0] for call in service.middleware.call.mock_calls].count('disk.smartctl') == 2
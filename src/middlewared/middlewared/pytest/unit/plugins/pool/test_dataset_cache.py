@@ -0,0 +1,94 @@
+from unittest.mock import Mock
+
+import pytest
+
+from middlewared.plugins.pool_ import dataset_cache
+from middlewared.plugins.pool_.dataset_cache import DatasetPropertiesCache, PoolDatasetService, zfs_events_hook
+
+
+def prop(value):
+    return {'value': value, 'rawvalue': value, 'parsed': value, 'source': 'LOCAL'}
+
+
+ZFS = {
+    'tank': {'used': prop('2'), 'compression': prop('lz4'), 'org:user': prop('a')},
+    'tank/child': {'used': prop('1'), 'compression': prop('off')},
+}
+
+
+def zfs_dataset_query(method, filters, options):
+    assert method == 'zfs.dataset.query'
+    names = filters[0][2] if filters else list(ZFS)
+    props = options['extra'].get('properties')
+    return [
+        {
+            'name': name,
+            'children': [],
+            'properties': {k: dict(v) for k, v in ZFS[name].items() if props is None or k in props},
+        }
+        for name in names
+    ]
+
+
+@pytest.fixture
+def service(monkeypatch):
+    monkeypatch.setattr(dataset_cache, 'PROPERTIES_CACHE', DatasetPropertiesCache())
+    return PoolDatasetService(Mock(call_sync=Mock(side_effect=zfs_dataset_query)))
+
+
+def full_reads(service):
+    return [c.args[1] for c in service.middleware.call_sync.mock_calls if c.args[2]['extra'].get('properties') is None]
+
+
+def test_zfs_query(service):
+    assert service.zfs_query([], {'flat': True})[0]['properties'] == ZFS['tank']
+    assert full_reads(service) == [[['id', 'in', ['tank', 'tank/child']]]]
+
+    datasets = service.zfs_query([], {'flat': True})
+    assert [d['properties'] for d in datasets] == [ZFS['tank'], ZFS['tank/child']]
+    assert len(full_reads(service)) == 1
+
+
+def test_zfs_query_volatile(service):
+    service.zfs_query([], {'flat': True})
+    ZFS['tank']['used'] = prop('3')
+    try:
+        assert service.zfs_query([], {'flat': True})[0]['properties']['used'] == prop('3')
+    finally:
+        ZFS['tank']['used'] = prop('2')
+
+
+def test_zfs_query_returns_copies(service):
+    service.zfs_query([], {'flat': True})[0]['properties']['compression']['value'] = 'LZ4'
+
+    assert service.zfs_query([], {'flat': True})[0]['properties']['compression'] == prop('lz4')
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('event,reread', [
+    ({'history_dsname': 'tank', 'history_internal_name': 'set'}, [['tank', 'tank/child']]),
+    ({'history_dsname': 'tank/child', 'history_internal_name': 'inherit'}, [['tank/child']]),
+    ({'history_dsname': 'tank/child', 'history_internal_name': 'rename'}, [['tank', 'tank/child']]),
+    ({'history_dsname': 'tank@snap', 'history_internal_name': 'snapshot'}, []),
+])
+async def test_zfs_events_invalidate(service, event, reread):
+    service.zfs_query([], {'flat': True})
+    service.middleware.call_sync.reset_mock()
+
+    async def call(method, *args):
+        return getattr(service, method.split('.')[-1])(*args)
+
+    await zfs_events_hook(Mock(call=Mock(side_effect=call)), {'class': 'sysevent.fs.zfs.history_event', **event})
+    service.zfs_query([], {'flat': True})
+
+    assert [filters[0][2] for filters in full_reads(service)] == reread
+
+
+def test_invalidated_while_reading_is_not_cached():
+    cache = DatasetPropertiesCache()
+    cache.invalidate('tank/child')
+    retrieved_at = cache.invalidated['tank/child'] - 1
+
+    cache.update([{'name': n, 'properties': {}} for n in ('tank', 'tank/child', 'tank/child/x')], retrieved_at)
+
+    assert list(cache.entries) == ['tank']
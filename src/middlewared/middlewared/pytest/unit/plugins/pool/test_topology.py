@@ -0,0 +1,105 @@
+from unittest.mock import Mock
+
+import pytest
+
+from middlewared.plugins.pool_.topology import PoolService, zfs_events_hook
+
+
+def vdev(type_, status='ONLINE', path=None, guid='1', children=None):
+    return {
+        'type': type_, 'status': status, 'path': path, 'guid': guid, 'name': type_.lower(),
+        'stats': {'read_errors': 0}, 'children': children or [],
+    }
+
+
+def topology():
+    return {
+        'data': [vdev('mirror', guid='10', children=[
+            vdev('disk', path='/dev/disk/by-partuuid/a', guid='11'),
+            vdev('disk', status='UNAVAIL', path='/dev/disk/by-partuuid/b', guid='12'),
+        ])],
+        'log': [],
+        'cache': [],
+        'spare': [vdev('disk', status='AVAIL', path='/dev/disk/by-partuuid/c', guid='13')],
+        'special': [],
+        'dedup': [],
+    }
+
+
+@pytest.fixture
+def service():
+    PoolService.topology_labels_cache.clear()
+
+    def call_sync(method, *args):
+        match method:
+            case 'disk.labels_to_disks':
+                return {label: (f'{label[-1]}1', label[-1]) for label in args[0]}
+            case 'disk.disks_by_zfs_guid':
+                return {'12': {'identifier': 'b', 'expiretime': None}}
+
+    middleware = Mock()
+    middleware.call_sync = Mock(side_effect=call_sync)
+    return PoolService(middleware)
+
+
+def test_transform_topology(service):
+    result = service.transform_topology(topology())
+
+    mirror = result['data'][0]
+    assert mirror['type'] == 'MIRROR'
+    assert 'device' not in mirror and mirror['unavail_disk'] is None
+    assert [(d['device'], d['disk']) for d in mirror['children']] == [('a1', 'a'), ('b1', 'b')]
+    assert [d['unavail_disk'] for d in mirror['children']] == [None, {'identifier': 'b', 'expiretime': None}]
+    assert result['spare'][0]['unavail_disk'] is None
+    assert [c.args[0] for c in service.middleware.call_sync.mock_calls] == [
+        'disk.labels_to_disks', 'disk.disks_by_zfs_guid',
+    ]
+
+
+def test_transform_topology_lightweight(service):
+    result = service.transform_topology(topology(), {'device_disk': False, 'unavail_disk': False})
+
+    assert 'device' not in result['data'][0]['children'][0]
+    service.middleware.call_sync.assert_not_called()
+
+
+def test_transform_topology_cached(service):
+    service.transform_topology(topology())
+    result = service.transform_topology(topology())
+
+    assert result['data'][0]['children'][1]['disk'] == 'b'
+    assert [c.args[0] for c in service.middleware.call_sync.mock_calls] == [
+        'disk.labels_to_disks', 'disk.disks_by_zfs_guid', 'disk.disks_by_zfs_guid',
+    ]
+
+
+def test_transform_topology_unavail_disk_not_cached(service):
+    service.transform_topology(topology())
+    call_sync = service.middleware.call_sync.side_effect
+    service.middleware.call_sync.side_effect = lambda method, *args: (
+        {'12': {'identifier': 'b', 'expiretime': '2024-01-01'}} if method == 'disk.disks_by_zfs_guid'
+        else call_sync(method, *args)
+    )
+
+    result = service.transform_topology(topology())
+
+    assert result['data'][0]['children'][1]['unavail_disk'] == {'identifier': 'b', 'expiretime': '2024-01-01'}
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('event,invalidated', [
+    ('resource.fs.zfs.statechange', True),
+    ('sysevent.fs.zfs.config_sync', True),
+    ('sysevent.fs.zfs.history_event', False),
+])
+async def test_zfs_events_invalidate(service, event, invalidated):
+    service.transform_topology(topology())
+
+    async def call(method, *args):
+        return getattr(service, method.split('.')[-1])(*args)
+
+    middleware = Mock(call=Mock(side_effect=call))
+    await zfs_events_hook(middleware, {'class': event})
+    service.transform_topology(topology())
+
+    assert service.middleware.call_sync.call_count == (4 if invalidated else 3)
@@ -0,0 +1,103 @@
+import subprocess
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from middlewared.plugins.cloud import incremental
+from middlewared.plugins.cloud.incremental import incremental_config_digest, incremental_files, parse_zfs_diff
+
+CLOUD_SYNC = {
+    "credentials": {"id": 1},
+    "path": "/mnt/tank/data",
+    "attributes": {"bucket": "bucket", "folder": ""},
+    "transfer_mode": "SYNC",
+    "encryption": False,
+    "filename_encryption": False,
+    "encryption_password": "",
+    "encryption_salt": "",
+    "include": [],
+    "exclude": [],
+    "args": "",
+    "follow_symlinks": False,
+    "create_empty_src_dirs": False,
+    "incremental_full_interval": 3,
+}
+
+
+def test_parse_zfs_diff():
+    output = (
+        b"M\t/\t/mnt/tank/data/dir\n"
+        b"+\tF\t/mnt/tank/data/dir/new\\0040file\n"
+        b"M\tF\t/mnt/tank/data/modified\n"
+        b"-\tF\t/mnt/tank/data/removed\n"
+        b"R\tF\t/mnt/tank/data/old\t/mnt/tank/data/dir/renamed\n"
+        b"R\tF\t/mnt/tank/other/file\t/mnt/tank/data/moved-in\n"
+        b"+\t@\t/mnt/tank/data/link\n"
+        b"+\tP\t/mnt/tank/data/fifo\n"
+        b"+\t/\t/mnt/tank/data/new-dir\n"
+        b"M\tF\t/mnt/tank/other/file\n"
+        b"M\tF\t/mnt/tank/database\n"
+    )
+
+    assert parse_zfs_diff(output, "/mnt/tank/data/") == (
+        ["dir/new file", "dir/renamed", "link", "modified", "moved-in", "old", "removed"],
+        {"created": 2, "modified": 1, "removed": 1, "renamed": 2},
+    )
+
+
+@pytest.mark.parametrize("output", [
+    b"R\t/\t/mnt/tank/data/a\t/mnt/tank/data/b\n",
+    b"R\t/\t/mnt/tank/other\t/mnt/tank/data/other\n",
+    b"+\tF\t/mnt/tank/data/new\\0012line\n",
+])
+def test_parse_zfs_diff_not_incremental(output):
+    assert parse_zfs_diff(output, "/mnt/tank/data") is None
+
+
+def state(**kwargs):
+    return {
+        "snapshot": "tank/data@cloud_sync-1-1",
+        "recursive": False,
+        "config": incremental_config_digest(CLOUD_SYNC),
+        "runs": 0,
+        "files": 100,
+    } | kwargs
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("state,reason", [
+    ({}, "there is no previous snapshot"),
+    (state(recursive=True), "the path contains child datasets which zfs diff does not compare"),
+    (state(config="0"), "task settings were changed since the previous snapshot"),
+    (state(runs=2), "full compare is performed every 3 runs"),
+    (state(snapshot="tank/old@cloud_sync-1-1"), "the path was moved to a different dataset"),
+])
+async def test_incremental_files_full_compare(state, reason):
+    with patch.object(incremental, "run", AsyncMock()) as run:
+        assert await incremental_files(CLOUD_SYNC, state, "tank/data@cloud_sync-1-2", False) == (None, None, reason)
+
+    run.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_incremental_files():
+    with patch.object(incremental, "run", AsyncMock(return_value=subprocess.CompletedProcess(
+        [], 0, b"M\tF\t/mnt/tank/data/file\n", b"",
+    ))) as run:
+        assert await incremental_files(CLOUD_SYNC, state(runs=1), "tank/data@cloud_sync-1-2", False) == (
+            ["file"], {"created": 0, "modified": 1, "removed": 0, "renamed": 0}, None,
+        )
+
+    assert run.call_args.args[0] == [
+        "zfs", "diff", "-F", "-H", "tank/data@cloud_sync-1-1", "tank/data@cloud_sync-1-2",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_incremental_files_recursive_snapshot():
+    with patch.object(incremental, "run", AsyncMock()) as run:
+        assert await incremental_files(CLOUD_SYNC, state(), "tank/data@cloud_sync-1-2", True) == (
+            None, None, "the path contains child datasets which zfs diff does not compare",
+        )
+
+    run.assert_not_called()
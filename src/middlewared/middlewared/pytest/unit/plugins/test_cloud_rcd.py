@@ -0,0 +1,83 @@
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from middlewared.plugins.cloud import rcd
+from middlewared.plugins.cloud.rcd import RcloneRcd
+from middlewared.service_exception import CallError
+
+
+@pytest.fixture
+def daemon():
+    daemon = RcloneRcd()
+    daemon._start = AsyncMock()
+    daemon.call = AsyncMock()
+    return daemon
+
+
+def configure(cleanup):
+    async def configure(name):
+        return {
+            name: {"type": "s3", "access_key_id": "key", "use_accelerate_endpoint": False, "max_upload_parts": 1000},
+            f"{name}_encrypted": {"type": "crypt", "remote": f"{name}:bucket"},
+        }, cleanup
+
+    return AsyncMock(side_effect=configure)
+
+
+@pytest.mark.asyncio
+async def test_remote_is_reused(daemon):
+    c = configure(AsyncMock())
+
+    async with daemon.remote("0123456789abcdef0123", c) as name:
+        assert name == "remote_0123456789abcdef"
+    async with daemon.remote("0123456789abcdef0123", c) as name:
+        assert name == "remote_0123456789abcdef"
+
+    c.assert_called_once_with("remote_0123456789abcdef")
+    assert [call.args for call in daemon.call.mock_calls] == [
+        ("config/create", {
+            "name": "remote_0123456789abcdef",
+            "type": "s3",
+            "parameters": {"access_key_id": "key", "use_accelerate_endpoint": "false", "max_upload_parts": "1000"},
+            "opt": {"nonInteractive": True, "noObscure": True},
+        }),
+        ("config/create", {
+            "name": "remote_0123456789abcdef_encrypted",
+            "type": "crypt",
+            "parameters": {"remote": "remote_0123456789abcdef:bucket"},
+            "opt": {"nonInteractive": True, "noObscure": True},
+        }),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_failed_remote_is_cleaned_up(daemon):
+    cleanup = AsyncMock()
+    daemon.call.side_effect = [None, CallError("invalid crypt remote"), None]
+
+    with pytest.raises(CallError):
+        async with daemon.remote("key", configure(cleanup)):
+            pass
+
+    assert daemon.remotes == {}
+    assert daemon.call.mock_calls[-1].args == ("config/delete", {"name": "remote_key"})
+    cleanup.assert_called_once_with()
+
+
+@pytest.mark.asyncio
+async def test_reap_idle_remotes(daemon):
+    idle_cleanup = AsyncMock()
+    used_cleanup = AsyncMock()
+    async with daemon.remote("idle", configure(idle_cleanup)):
+        pass
+
+    with patch.object(rcd, "RCD_REMOTE_IDLE_TIMEOUT", 0):
+        async with daemon.remote("used", configure(used_cleanup)):
+            with patch("asyncio.sleep", AsyncMock(side_effect=[None, StopAsyncIteration])):
+                with pytest.raises(StopAsyncIteration):
+                    await daemon._reap()
+
+    assert list(daemon.remotes) == ["used"]
+    idle_cleanup.assert_called_once_with()
+    used_cleanup.assert_not_called()
@@ -1,12 +1,15 @@
 # flake8: noqa
 import io
 import textwrap
-from unittest.mock import Mock
+from unittest.mock import AsyncMock, Mock
 
 import pytest
 
-from middlewared.plugins.cloud_sync import FsLockManager, lsjson_error_excerpt, RcloneVerboseLogCutter
+from middlewared.plugins.cloud_sync import (
+    CloudSyncService, FsLockManager, lsjson_error_excerpt, rclone_stats_progress, RcloneVerboseLogCutter,
+)
 from middlewared.plugins.cloud.snapshot import get_dataset_recursive
+from middlewared.service_exception import CallError
 
 
 def test__get_dataset_recursive_1():
@@ -350,3 +353,38 @@ def test__RcloneVerboseLogCutter(input, output):
         out += result
 
     assert out == output
+
+
+@pytest.mark.parametrize("stats,progress,description", [
+    ({"bytes": 0, "totalBytes": 0, "transfers": 0, "totalTransfers": 0, "speed": 0, "eta": None},
+     None, "0 bytes / 0 bytes, 0 bytes/s, transfers: 0 / 0"),
+    ({"bytes": 1048576, "totalBytes": 4194304, "transfers": 1, "totalTransfers": 4, "speed": 1048576.5, "eta": 3,
+      "checks": 9, "totalChecks": 10, "errors": 1},
+     25, "1 MiB / 4 MiB, 1 MiB/s, ETA 0:00:03, transfers: 1 / 4, checks: 9 / 10, errors: 1"),
+])
+def test__rclone_stats_progress(stats, progress, description):
+    result = rclone_stats_progress(stats)
+
+    assert result[:2] == (progress, description)
+    assert result[2]["total_bytes"] == stats["totalBytes"]
+
+
+@pytest.mark.asyncio
+async def test__decrypt_names():
+    names = [f"encrypted-{i}" for i in range(1000)]
+    names[10] = names[500] = "plain"
+
+    async def call(method, params):
+        if "plain" in params["arg"]:
+            raise CallError("failed to decode")
+
+        return {"result": [name.removeprefix("encrypted-") for name in params["arg"]]}
+
+    service = CloudSyncService(Mock())
+    service.rcd = Mock(call=AsyncMock(side_effect=call))
+
+    result = await service._decrypt_names("remote_encrypted:", names)
+
+    assert result == [None if name == "plain" else name.removeprefix("encrypted-") for name in names]
+    # Only the batches that contain names that can't be decrypted are split
+    assert service.rcd.call.call_count < 50
@@ -0,0 +1,76 @@
+from unittest.mock import AsyncMock, Mock, patch
+
+import pytest
+
+from middlewared.plugins.etc import EtcService, FileShouldNotExist
+
+GROUPS = {
+    'cached': {
+        'ctx': [{'method': 'test.config'}, {'method': 'test.query', 'ctx_prefix': 'prefix'}],
+        'depends': ['test_table'],
+        'entries': [{'type': 'mako', 'path': 'cached'}, {'type': 'mako', 'path': 'removed'}],
+    },
+    'uncached': {
+        'ctx': [{'method': 'test.config'}],
+        'entries': [{'type': 'mako', 'path': 'uncached'}],
+    },
+}
+
+
+@pytest.fixture
+def etc():
+    ctx = {'test.config': {'value': 1}, 'test.query': []}
+
+    async def call(method, *args):
+        return ctx[method]
+
+    async def render(path, render_ctx):
+        if path.endswith('removed'):
+            raise FileShouldNotExist()
+
+        return str(render_ctx['test.config']['value'])
+
+    middleware = Mock()
+    middleware.call = AsyncMock(side_effect=call)
+    middleware.run_in_thread = AsyncMock(side_effect=lambda fn, *args: fn(*args))
+
+    service = EtcService(middleware)
+    service.ctx = ctx
+    service._renderers['mako'] = Mock(render=AsyncMock(side_effect=render))
+    with patch.object(EtcService, 'GROUPS', GROUPS):
+        with patch.object(service, 'make_changes', Mock(return_value=0)):
+            with patch('middlewared.plugins.etc.os.unlink', Mock(side_effect=FileNotFoundError)):
+                yield service
+
+
+@pytest.mark.asyncio
+async def test_gather_ctx(etc):
+    assert await etc.gather_ctx(GROUPS['cached']['ctx']) == {'test.config': {'value': 1}, 'prefix.test.query': []}
+
+
+@pytest.mark.asyncio
+async def test_generate_cached(etc):
+    render = etc._renderers['mako'].render
+
+    await etc.generate('cached')
+    await etc.generate('cached')
+    assert render.call_count == 2
+    assert etc.render_timings['cached']['cached'] == 2
+    assert [c.args[2] for c in etc.make_changes.mock_calls] == ['1', '1']
+
+    etc.ctx['test.config'] = {'value': 2}
+    await etc.generate('cached')
+    assert render.call_count == 4
+    assert etc.make_changes.mock_calls[-1].args[2] == '2'
+
+    etc.table_written('test_table')
+    await etc.generate('cached')
+    assert render.call_count == 6
+    assert etc.render_timings['cached']['cached'] == 0
+
+
+@pytest.mark.asyncio
+async def test_generate_uncached(etc):
+    await etc.generate('uncached')
+    await etc.generate('uncached')
+    assert etc._renderers['mako'].render.call_count == 2
@@ -0,0 +1,81 @@
+import json
+import os
+from unittest.mock import Mock
+
+import pytest
+
+from middlewared.plugins import filesystem
+from middlewared.plugins.filesystem import FilesystemService
+from middlewared.service_exception import CallError
+
+
+FILES = 25
+
+
+@pytest.fixture
+def directory(tmp_path):
+    for i in range(FILES):
+        (tmp_path / f'file{i}').write_text('')
+
+    os.mkdir(tmp_path / 'dir')
+    return str(tmp_path)
+
+
+def call(method, *args):
+    return getattr(FilesystemService, method).wraps(FilesystemService(Mock()), *args)
+
+
+def test_listdir_limit(directory):
+    result = call('listdir', directory, [['type', '=', 'FILE']], {'select': ['name'], 'limit': 5, 'offset': 3})
+
+    assert len(result) == 5
+    assert all(entry['name'].startswith('file') for entry in result)
+
+
+def test_listdir_cursor(directory):
+    names = []
+    page = call('listdir_cursor', directory, [['type', '=', 'FILE']], {'cursor': None, 'limit': 10, 'select': ['name']})
+    names.extend(entry['name'] for entry in page['entries'])
+    while page['cursor']:
+        page = call('listdir_cursor', directory, [], {'cursor': page['cursor'], 'limit': 10, 'select': ['name']})
+        names.extend(entry['name'] for entry in page['entries'])
+
+    assert sorted(names) == sorted(f'file{i}' for i in range(FILES))
+    assert FilesystemService.listdir_cursors == {}
+
+
+def test_listdir_cursor_errors(directory):
+    page = call('listdir_cursor', directory, [], {'cursor': None, 'limit': 1, 'select': ['name']})
+
+    with pytest.raises(CallError):
+        call('listdir_cursor', '/tmp', [], {'cursor': page['cursor'], 'limit': 1, 'select': ['name']})
+
+    with pytest.raises(CallError):
+        call('listdir_cursor', directory, [], {'cursor': page['cursor'], 'limit': 1, 'select': ['name']})
+
+
+def test_listdir_cursor_limit(directory, monkeypatch):
+    monkeypatch.setattr(filesystem, 'LISTDIR_CURSOR_MAX', 2)
+    cursors = [
+        call('listdir_cursor', directory, [], {'cursor': None, 'limit': 1, 'select': ['name']})['cursor']
+        for i in range(3)
+    ]
+
+    assert list(FilesystemService.listdir_cursors) == cursors[1:]
+
+    for cursor in cursors[1:]:
+        FilesystemService.listdir_cursors.pop(cursor)['close']()
+
+
+def test_listdir_stream(directory):
+    r, w = os.pipe()
+    job = Mock()
+    job.pipes.output.w = os.fdopen(w, 'wb')
+
+    assert call('listdir_stream', job, directory, [['type', '=', 'FILE']], {'select': ['name']}) == FILES
+
+    job.pipes.output.w.close()
+    with os.fdopen(r, 'rb') as f:
+        entries = [json.loads(line) for line in f]
+
+    assert sorted(entry['name'] for entry in entries) == sorted(f'file{i}' for i in range(FILES))
@@ -0,0 +1,173 @@
+import threading
+import time
+from unittest.mock import Mock, patch
+
+import pytest
+
+from middlewared.plugins.kmip import connection
+from middlewared.plugins.kmip.connection import KMIPConnectionPool, KMIPServerMixin, SECRET_DATA_CACHE
+from middlewared.plugins.kmip.zfs_keys import KMIPService
+
+SERVER = {'server': 'kmip.example.com', 'port': 5696}
+
+
+class FakeKmipClient:
+    """
+    Keeps secret data in `store`. Fails if a single client is used by multiple threads at once.
+    """
+
+    store = {}
+    opened = []
+    reachable = True
+
+    def __init__(self, **kwargs):
+        self.busy = threading.Lock()
+        self.gets = 0
+
+    def open(self):
+        if not self.reachable:
+            raise connection.ClientConnectionFailure('Connection refused')
+
+        self.opened.append(self)
+
+    def close(self):
+        pass
+
+    def get(self, uid):
+        assert self.busy.acquire(blocking=False), 'Client used concurrently'
+        try:
+            time.sleep(0.01)
+            self.gets += 1
+            return connection.SecretData(self.store[uid], connection.enums.SecretDataType.PASSWORD)
+        finally:
+            self.busy.release()
+
+    def revoke(self, reason, uid):
+        pass
+
+    def destroy(self, uid):
+        self.store.pop(uid)
+
+
+@pytest.fixture(autouse=True)
+def kmip_client():
+    SECRET_DATA_CACHE.clear()
+    FakeKmipClient.store = {str(i): f'key-{i}'.encode() for i in range(20)}
+    FakeKmipClient.opened = []
+    FakeKmipClient.reachable = True
+    with patch.object(connection, 'ProxyKmipClient', FakeKmipClient):
+        yield FakeKmipClient
+
+    SECRET_DATA_CACHE.clear()
+
+
+def mixin():
+    m = KMIPServerMixin()
+    m.middleware = Mock()
+    return m
+
+
+def server_gets(client):
+    return sum(conn.gets for conn in client.opened)
+
+
+def test_pool_map(kmip_client):
+    m = mixin()
+    with m._connection_pool(SERVER) as pool:
+        keys = pool.map(lambda uid: m._retrieve_cached_secret_data(uid, pool), [str(i) for i in range(20)])
+
+    assert keys == [f'key-{i}' for i in range(20)]
+    assert 1 < len(kmip_client.opened) <= connection.KMIP_POOL_SIZE
+
+
+def test_secret_data_cache(kmip_client):
+    m = mixin()
+    with m._connection_pool(SERVER) as pool:
+        assert m._retrieve_cached_secret_data('1', pool) == 'key-1'
+        assert m._retrieve_cached_secret_data('1', pool) == 'key-1'
+        assert server_gets(kmip_client) == 1
+
+        assert m._retrieve_cached_secret_data('1', pool, cached=False) == 'key-1'
+        assert server_gets(kmip_client) == 2
+
+        assert m._revoke_and_destroy_keys(pool, [('1', None)]) == [True]
+        assert SECRET_DATA_CACHE.get(pool.server, '1') is None
+
+
+def test_broken_connection_not_reused(kmip_client):
+    pool = KMIPConnectionPool(SERVER)
+    with pytest.raises(connection.CallError):
+        with pool.connection():
+            raise connection.ClientConnectionNotOpen()
+
+    assert pool.connections == [] and pool.idle == []
+    with pool.connection():
+        pass
+
+    assert len(kmip_client.opened) == 2
+
+
+def kmip_service(datasets, zfs_keys=None):
+    def call_sync(method, *args):
+        match method:
+            case 'datastore.query':
+                return datasets
+            case 'pool.dataset.query':
+                return [{'name': ds['name']} for ds in datasets]
+            case 'kmip.test_connection':
+                return True
+            case 'kmip.connection_config':
+                return SERVER
+            case 'zfs.dataset.check_key':
+                return args[1]['key'] == (zfs_keys or {}).get(args[0])
+            case 'failover.licensed':
+                return False
+
+    service = KMIPService(Mock())
+    service.middleware.call_sync = Mock(side_effect=call_sync)
+    service.zfs_keys = dict(zfs_keys or {})
+    return service
+
+
+def datastore_updates(service):
+    return {
+        c.args[2]: c.args[3] for c in service.middleware.call_sync.mock_calls if c.args[0] == 'datastore.update'
+    }
+
+
+def test_pull_zfs_keys(kmip_client):
+    service = kmip_service([
+        {'id': 1, 'name': 'tank/db', 'encryption_key': 'db-key', 'kmip_uid': '1'},
+        {'id': 2, 'name': 'tank/memory', 'encryption_key': None, 'kmip_uid': '2'},
+        {'id': 3, 'name': 'tank/server', 'encryption_key': None, 'kmip_uid': '3'},
+    ], {'tank/memory': 'memory-key'})
+
+    assert service.pull_zfs_keys() == []
+    assert {id_: data['encryption_key'] for id_, data in datastore_updates(service).items()} == {
+        1: 'db-key', 2: 'memory-key', 3: 'key-3',
+    }
+    assert not {'1', '2', '3'} & kmip_client.store.keys()
+
+
+def test_pull_zfs_keys_server_unreachable(kmip_client):
+    kmip_client.reachable = False
+    service = kmip_service([
+        {'id': 1, 'name': 'tank/db', 'encryption_key': 'db-key', 'kmip_uid': '1'},
+        {'id': 2, 'name': 'tank/memory', 'encryption_key': None, 'kmip_uid': '2'},
+        {'id': 3, 'name': 'tank/server', 'encryption_key': None, 'kmip_uid': '3'},
+    ], {'tank/memory': 'memory-key'})
+
+    # Keys available locally are still pulled
+    assert service.pull_zfs_keys() == ['tank/server']
+    assert {id_: data['encryption_key'] for id_, data in datastore_updates(service).items()} == {
+        1: 'db-key', 2: 'memory-key',
+    }
+
+
+def test_push_zfs_key_retrieved_from_server(kmip_client):
+    service = kmip_service([])
+    ds = {'id': 1, 'name': 'tank/data', 'encryption_key': None, 'kmip_uid': '1'}
+    with service._connection_pool(SERVER) as pool:
+        SECRET_DATA_CACHE.set(pool.server, '1', 'stale-key')
+
+        assert service._push_zfs_key(ds, pool) == ('key-1', {}, True)
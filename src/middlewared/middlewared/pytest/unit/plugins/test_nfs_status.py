@@ -0,0 +1,77 @@
+from unittest.mock import Mock, patch
+
+import pytest
+
+from middlewared.plugins.nfs_ import status
+from middlewared.plugins.nfs_.status import NFSService, query_references
+
+
+INFO = '''clientid: 0x7e49a1d6652d1d31
+address: "192.168.40.247:790"
+status: confirmed
+name: "Linux NFSv4.2 debian12-hv"
+minor version: 2
+'''
+STATES = '''- 0x00000001a1d6652d7e49a1d600000000: { type: deleg, access: r, superblock: "00:39:5", filename: "/a" }
+- 0x00000002a1d6652d7e49a1d600000000: { type: open, access: rw, deny: --, filename: "/b", owner: "open id:\\x00" }
+'''
+
+
+@pytest.fixture
+def clients_dir(tmp_path):
+    for client_id in ('4', '5'):
+        (tmp_path / client_id).mkdir()
+        (tmp_path / client_id / 'info').write_text(INFO)
+        (tmp_path / client_id / 'states').write_text(STATES if client_id == '4' else '')
+
+    with patch.object(status, 'NFS4_CLIENTS_DIR', str(tmp_path)):
+        yield tmp_path
+
+
+def get_nfs4_clients(filters, options):
+    service = NFSService(Mock())
+    with patch.object(service, 'get_nfs4_client_states', wraps=service.get_nfs4_client_states) as get_states:
+        result = NFSService.get_nfs4_clients.wraps(service, filters, options)
+
+    return result, get_states.call_count
+
+
+@pytest.mark.parametrize('value,result', [
+    ([['states', '!=', []]], True),
+    ([['OR', [[['id', '=', '4']], [['states.0.type', '=', 'open']]]]], True),
+    ([['info.status', '=', 'confirmed']], False),
+    (['-states'], True),
+    (['id', 'info'], False),
+    ([['states', 'client_states']], True),
+])
+def test_query_references(value, result):
+    assert query_references(value, 'states') == result
+
+
+def test_get_nfs4_clients(clients_dir):
+    clients, states_read = get_nfs4_clients([], {})
+
+    clients = sorted(clients, key=lambda c: c['id'])
+    assert states_read == 2
+    assert clients[0]['info']['address'] == '192.168.40.247:790'
+    assert [list(state.values())[0]['type'] for state in clients[0]['states']] == ['deleg', 'open']
+    assert clients[1]['states'] == []
+
+
+@pytest.mark.parametrize('filters,options,result,states_read', [
+    ([], {'count': True}, 2, 0),
+    ([['info.status', '=', 'confirmed']], {'count': True}, 2, 0),
+    ([['states', '!=', []]], {'count': True}, 1, 2),
+    ([], {'select': ['id']}, [{'id': '4'}], 0),
+])
+def test_get_nfs4_clients_lazy_states(clients_dir, filters, options, result, states_read):
+    if isinstance(result, list):
+        filters = filters + [['id', '=', '4']]
+
+    assert get_nfs4_clients(filters, options) == (result, states_read)
+
+
+def test_malformed_state(clients_dir):
+    (clients_dir / '4' / 'states').write_text(STATES + '- 0x3: { type: open, filename: "/c\n')
+
+    assert len(NFSService(Mock()).get_nfs4_client_states('4')) == 2
@@ -0,0 +1,56 @@
+from unittest.mock import Mock, patch
+
+import pytest
+
+from middlewared.plugins.smb_.status import count_status_entries, InfoLevel, SMBService
+
+
+STATUS_OPTIONS = {
+    'verbose': True, 'fast': True, 'restrict_user': '', 'restrict_session': '', 'resolve_uids': True,
+}
+
+
+def status(*args):
+    return SMBService.status.wraps(SMBService(Mock()), *args)
+
+
+def smbstatus(sessions):
+    return Mock(returncode=0, stdout=f'{{"sessions": {{{", ".join(f"{i}: {{}}" for i in sessions)}}}}}'.encode())
+
+
+@pytest.mark.parametrize('info_level,filters,status_options,native', [
+    ('SESSIONS', [], {}, True),
+    ('SHARES', [], {}, True),
+    ('SESSIONS', [['uid', '=', 1000]], {}, False),
+    ('SESSIONS', [], {'fast': False}, False),
+    ('SESSIONS', [], {'restrict_user': 'bob'}, False),
+    ('LOCKS', [], {}, False),
+])
+def test_status_count(info_level, filters, status_options, native):
+    with patch('middlewared.plugins.smb_.status.count_status_entries', Mock(return_value=5)) as count:
+        with patch('middlewared.plugins.smb_.status.subprocess.run', Mock(return_value=smbstatus(['"1"']))):
+            result = status(info_level, filters, {'count': True}, STATUS_OPTIONS | status_options)
+
+    assert count.called == native
+    if native:
+        assert result == 5
+
+
+def test_status_count_fallback():
+    with patch('middlewared.plugins.smb_.status.count_status_entries', Mock(side_effect=FileNotFoundError())):
+        with patch('middlewared.plugins.smb_.status.subprocess.run', Mock(return_value=smbstatus([]))) as run:
+            assert status('SESSIONS', [], {'count': True}, STATUS_OPTIONS) == 0
+
+    run.assert_called_once()
+
+
+def test_count_status_entries_reopens_database():
+    with patch('middlewared.plugins.smb_.status.TDBHandle') as tdb_handle:
+        tdb_handle.return_value.count.side_effect = [3, 1]
+
+        assert count_status_entries(InfoLevel.SESSIONS) == 3
+        assert count_status_entries(InfoLevel.SESSIONS) == 1
+
+    # smbd rewrites the database in place, so it must not be read through a cached handle
+    assert tdb_handle.call_count == 2
+    assert tdb_handle.return_value.close.call_count == 2
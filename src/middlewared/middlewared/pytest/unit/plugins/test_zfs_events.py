@@ -0,0 +1,166 @@
+import asyncio
+from unittest.mock import AsyncMock, Mock, patch
+
+import pytest
+
+from middlewared.plugins.zfs_ import zfs_events
+from middlewared.plugins.zfs_.zfs_events import DatasetEventsCoalescer
+
+
+def coalescer(datasets):
+    middleware = Mock()
+    middleware.create_task = asyncio.create_task
+    middleware.call = AsyncMock(side_effect=lambda method, filters, options: [
+        {'id': name, 'children': []} for name in filters[0][2] if name in datasets
+    ])
+    return DatasetEventsCoalescer(middleware)
+
+
+def sent_events(c):
+    return [
+        (call.args[1], call.kwargs['id'], call.kwargs.get('fields')) for call in c.middleware.send_event.mock_calls
+    ]
+
+
+@pytest.mark.asyncio
+async def test_coalesce():
+    c = coalescer(['tank/a', 'tank/b'])
+    with patch.object(zfs_events, 'DATASET_EVENTS_WINDOW', 0):
+        c.add('tank/a', 'ADDED')
+        c.add('tank/a', 'CHANGED')
+        c.add('tank/b', 'CHANGED')
+        c.add('tank/b', 'CHANGED')
+        c.add('tank/c', 'CHANGED')
+        c.add('tank/c/d', 'CHANGED')
+        c.discard('tank/c')
+        await c.task
+
+    c.middleware.call.assert_called_once()
+    assert c.middleware.call.call_args.args[1] == [['id', 'in', ['tank/a', 'tank/b']]]
+    assert c.middleware.call.call_args.args[2]['extra']['retrieve_children'] is False
+    assert sent_events(c) == [
+        ('ADDED', 'tank/a', {'id': 'tank/a', 'children': []}),
+        ('CHANGED', 'tank/b', {'id': 'tank/b'}),
+    ]
+    assert c.task is None
+
+
+@pytest.mark.asyncio
+async def test_batches_and_backpressure():
+    names = [f'tank/{i}' for i in range(5)]
+    c = coalescer(names)
+    with patch.object(zfs_events, 'DATASET_EVENTS_WINDOW', 0):
+        with patch.object(zfs_events, 'DATASET_EVENTS_BATCH', 2):
+            with patch.object(zfs_events, 'DATASET_EVENTS_MAX_PENDING', 4):
+                for name in names:
+                    c.add(name, 'CHANGED')
+
+                await c.task
+
+    assert [len(call.args[1][0][2]) for call in c.middleware.call.mock_calls] == [2, 2]
+    assert [event[1] for event in sent_events(c)] == names[:4]
+    assert c.dropped == 0
+    c.middleware.logger.warning.assert_called()
+
+
+@pytest.mark.asyncio
+async def test_batch_failure_retried_individually():
+    c = coalescer(['tank/a', 'tank/b'])
+    query = c.middleware.call.side_effect
+
+    async def call(method, filters, options):
+        if len(filters[0][2]) > 1 or filters[0][2] == ['tank/broken']:
+            raise ValueError('Broken dataset')
+
+        return query(method, filters, options)
+
+    c.middleware.call.side_effect = call
+    with patch.object(zfs_events, 'DATASET_EVENTS_WINDOW', 0):
+        for name in ['tank/a', 'tank/broken', 'tank/b']:
+            c.add(name, 'CHANGED')
+
+        await c.task
+
+    assert sorted(event[1] for event in sent_events(c)) == ['tank/a', 'tank/b']
+    assert c.middleware.call.call_count == 4
+
+
+@pytest.mark.asyncio
+async def test_api_reported_datasets_skipped():
+    c = coalescer(['tank/a', 'tank/a/child', 'tank/b'])
+    with patch.object(zfs_events, 'DATASET_EVENTS', c), patch.object(zfs_events, 'DATASET_EVENTS_WINDOW', 0):
+        c.add('tank/a', 'ADDED')
+        c.add('tank/a/child', 'ADDED')
+        c.add('tank/b', 'CHANGED')
+        await zfs_events.dataset_post_create_hook(c.middleware, {'name': 'tank/a'})
+        await zfs_events.dataset_post_update_hook(c.middleware, 'tank/b')
+        await c.task
+
+    c.middleware.call.assert_called_once()
+    assert c.middleware.call.call_args.args[1] == [['id', 'in', ['tank/a/child']]]
+
+
+@pytest.mark.asyncio
+async def test_rename():
+    child = {'id': 'tank/new/child', 'children': []}
+    parent = {'id': 'tank/new', 'children': [child]}
+
+    async def call(method, *args):
+        if method == 'pool.dataset.is_internal_dataset':
+            return False
+
+        assert args[1]['extra']['retrieve_children'] is True
+        return [parent]
+
+    c = coalescer([])
+    c.middleware.call = AsyncMock(side_effect=call)
+    with patch.object(zfs_events, 'DATASET_EVENTS', c), patch.object(zfs_events, 'DATASET_EVENTS_WINDOW', 0):
+        c.add('tank/old', 'CHANGED')
+        c.add('tank/old/child', 'CHANGED')
+        await zfs_events.zfs_events(c.middleware, {
+            'class': 'sysevent.fs.zfs.history_event',
+            'history_dsname': 'tank/old',
+            'history_internal_name': 'rename',
+            'history_internal_str': '-> tank/new',
+        })
+        assert c.pending == {}
+        await c.task
+
+    assert sent_events(c) == [
+        ('REMOVED', 'tank/old', None),
+        ('REMOVED', 'tank/old/child', None),
+        ('ADDED', 'tank/new', parent),
+        ('ADDED', 'tank/new/child', child),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_receive():
+    c = coalescer(['tank/new', 'tank/existing'])
+    query = c.middleware.call.side_effect
+
+    async def call(method, *args):
+        match method:
+            case 'pool.dataset.is_internal_dataset':
+                return False
+            case 'zfs.dataset.query':
+                return [
+                    {'id': name, 'properties': {'createtxg': {'rawvalue': '100'}}} for name in args[0][0][2]
+                ]
+            case _:
+                return query(method, *args)
+
+    c.middleware.call = AsyncMock(side_effect=call)
+    with patch.object(zfs_events, 'DATASET_EVENTS', c), patch.object(zfs_events, 'DATASET_EVENTS_WINDOW', 0):
+        # Full receive creates the dataset in the txg the event is logged in, incremental one does not
+        for name, txg in [('tank/new', 100), ('tank/existing', 200)]:
+            await zfs_events.zfs_events(c.middleware, {
+                'class': 'sysevent.fs.zfs.history_event',
+                'history_dsname': name,
+                'history_internal_name': 'receive',
+                'history_txg': txg,
+            })
+
+        await c.task
+
+    assert [(event[0], event[1]) for event in sent_events(c)] == [('ADDED', 'tank/new'), ('CHANGED', 'tank/existing')]
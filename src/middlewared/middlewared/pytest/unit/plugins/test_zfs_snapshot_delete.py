@@ -0,0 +1,97 @@
+from unittest.mock import Mock, patch
+
+import pytest
+
+from middlewared.plugins.zfs_.snapshot import delete_bulk_group, ZFSSnapshot
+
+
+class ZFSException(Exception):
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+
+
+NOENT = 2
+EBUSY = 16
+
+
+def mock_libzfs(zfs):
+    libzfs = Mock(ZFSException=ZFSException, Error=Mock(NOENT=NOENT))
+    libzfs.ZFS.return_value.__enter__ = Mock(return_value=zfs)
+    libzfs.ZFS.return_value.__exit__ = Mock(return_value=False)
+    return patch('middlewared.plugins.zfs_.snapshot.libzfs', libzfs)
+
+
+def mock_zfs(existing, delete_snapshots_error=None):
+    zfs = Mock()
+    snapshots = {}
+
+    def get_snapshot(name):
+        if name not in existing:
+            raise ZFSException(NOENT, f'{name}: dataset does not exist')
+
+        return snapshots.setdefault(name, Mock(holds={}))
+
+    zfs.get_snapshot = Mock(side_effect=get_snapshot)
+    zfs.get_dataset.return_value.delete_snapshots = Mock(side_effect=delete_snapshots_error)
+    return zfs, snapshots
+
+
+@pytest.mark.parametrize('args,key', [
+    (['tank/data@snap-1'], 'tank'),
+    (['tank@snap-1', {'defer': True}], 'tank'),
+    (['tank/data'], None),
+    ([], None),
+])
+def test_delete_bulk_group(args, key):
+    assert delete_bulk_group(args) == key
+
+
+def test_delete_batch():
+    zfs, snapshots = mock_zfs({'tank/a@1', 'tank/a@2', 'tank/b@1', 'tank/b@2'})
+
+    with mock_libzfs(zfs):
+        statuses = ZFSSnapshot(Mock()).delete_batch([
+            ['tank/a@1'],
+            ['tank/b@1', {'defer': True}],
+            ['tank/a@2', {}],
+            ['tank/a@3'],
+        ])
+
+    assert [status['result'] for status in statuses] == [True, True, True, None]
+    assert 'dataset does not exist' in statuses[3]['error']
+    zfs.get_dataset.assert_called_once_with('tank/a')
+    zfs.get_dataset.return_value.delete_snapshots.assert_called_once_with({'snapshots': ['1', '2']})
+    snapshots['tank/b@1'].delete.assert_called_once_with(defer=True, recursive=False)
+
+
+def test_delete_batch_fallback():
+    zfs, snapshots = mock_zfs({'tank/a@1', 'tank/a@2'}, ZFSException(EBUSY, 'dataset is busy'))
+
+    with mock_libzfs(zfs):
+        zfs.get_snapshot('tank/a@2').holds = {'hold-tag': 0}
+        zfs.get_snapshot('tank/a@2').delete.side_effect = ZFSException(EBUSY, 'dataset is busy')
+
+        statuses = ZFSSnapshot(Mock()).delete_batch([['tank/a@1'], ['tank/a@2']])
+
+    assert statuses[0] == {'result': True, 'error': None}
+    assert statuses[1]['result'] is None
+    assert 'hold-tag' in statuses[1]['error']
+    snapshots['tank/a@1'].delete.assert_called_once_with(defer=False, recursive=False)
+
+
+def test_delete_batch_invalid_call():
+    zfs, snapshots = mock_zfs({'tank/a@1', 'tank/a@2', 'tank/a@3'})
+
+    with mock_libzfs(zfs):
+        statuses = ZFSSnapshot(Mock()).delete_batch([
+            ['tank/a@1'],
+            ['tank/a@2', 'defer'],
+            ['tank/a@3', {'unknown': True}],
+        ])
+
+    assert statuses[0] == {'result': True, 'error': None}
+    assert [status['result'] for status in statuses[1:]] == [None, None]
+    assert 'A dict was expected' in statuses[1]['error']
+    assert 'Field was not expected' in statuses[2]['error']
+    zfs.get_dataset.return_value.delete_snapshots.assert_called_once_with({'snapshots': ['1']})
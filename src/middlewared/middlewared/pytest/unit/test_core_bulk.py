@@ -0,0 +1,101 @@
+import asyncio
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+
+from middlewared.schema import accepts, Bool, Dict, Int
+from middlewared.service import bulk_group, CoreService, Service
+
+
+class BulkTestService(Service):
+
+    class Config:
+        namespace = 'bulk_test'
+
+    def __init__(self, middleware):
+        super().__init__(middleware)
+        self.calls = []
+        self.running = 0
+        self.max_running = 0
+
+    async def run(self, value):
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        await asyncio.sleep(0.01)
+        self.running -= 1
+
+        if value < 0:
+            raise ValueError('Negative value')
+
+        self.calls.append([value])
+        return value * 2
+
+    @bulk_group(lambda args: args[0] % 2 if args[0] else None, 'run_group', max_size=2)
+    async def run_grouped(self, value):
+        self.calls.append([value])
+        return value * 2
+
+    async def run_group(self, params):
+        self.calls.append([p[0] for p in params])
+        return [{'result': p[0] * 2, 'error': None} for p in params]
+
+    @accepts(Int('value'), Dict('options', Bool('negate', default=False)))
+    @bulk_group(lambda args: 'all', 'run_validated_group')
+    async def run_validated(self, value, options):
+        self.calls.append([value])
+        return -value if options['negate'] else value
+
+    async def run_validated_group(self, params):
+        self.calls.append(params)
+        return [{'result': -value if options['negate'] else value, 'error': None} for value, options in params]
+
+
+def create_core_service():
+    middleware = Mock()
+    service = BulkTestService(middleware)
+    middleware.get_method = Mock(side_effect=lambda name: (service, getattr(service, name.split('.')[-1])))
+    middleware._mock_method = Mock(return_value=None)
+
+    async def call(name, *args):
+        return await getattr(service, name.split('.')[-1])(*args)
+
+    middleware.call = AsyncMock(side_effect=call)
+    return CoreService(middleware), service
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize('concurrency', [1, 3])
+async def test_bulk_concurrency(concurrency):
+    core, service = create_core_service()
+
+    result = await core.bulk(None, Mock(), 'bulk_test.run', [[1], [-1], [3], [4], [5]], None, concurrency)
+
+    assert [status['result'] for status in result] == [2, None, 6, 8, 10]
+    assert [status['error'] for status in result] == [None, 'Negative value', None, None, None]
+    assert all(status['duration'] > 0 for status in result)
+    assert service.max_running == concurrency
+
+
+@pytest.mark.asyncio
+async def test_bulk_group():
+    core, service = create_core_service()
+
+    result = await core.bulk(None, Mock(), 'bulk_test.run_grouped', [[1], [2], [3], [0], [5], [4]], None, 1)
+
+    assert [status['result'] for status in result] == [2, 4, 6, 0, 10, 8]
+    assert service.calls == [[1, 3], [2, 4], [0], [5]]
+
+
+@pytest.mark.asyncio
+async def test_bulk_group_validation():
+    core, service = create_core_service()
+
+    result = await core.bulk(None, Mock(), 'bulk_test.run_validated', [
+        [1], ['invalid'], [2, {'negate': True}], [3, {'unknown': True}],
+    ], None, 1)
+
+    assert [status['result'] for status in result] == [1, None, -2, None]
+    assert 'Not an integer' in result[1]['error']
+    assert 'Field was not expected' in result[3]['error']
+    # Invalid calls are not passed to the group method and the valid ones are passed with default values filled in
+    assert service.calls == [[[1, {'negate': False}], [2, {'negate': True}]]]
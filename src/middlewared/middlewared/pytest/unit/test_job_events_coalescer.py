@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+
+from middlewared.job import JobEventsCoalescer
+
+
+def job_fields(state='RUNNING', percent=0, description=''):
+    return {
+        'id': 1,
+        'method': 'test.method',
+        'state': state,
+        'progress': {'percent': percent, 'description': description, 'extra': None},
+        'result': None,
+    }
+
+
+def create_coalescer(**kwargs):
+    sent = []
+    coalescer = JobEventsCoalescer(
+        asyncio.get_running_loop(),
+        lambda event_type, **kw: sent.append((event_type, kw)),
+        **kwargs,
+    )
+    return coalescer, sent
+
+
+@pytest.mark.asyncio
+async def test_coalesce_progress():
+    coalescer, sent = create_coalescer(interval=0.05)
+    coalescer.send_event('ADDED', id=1, fields=job_fields('WAITING'))
+    coalescer.send_event('CHANGED', id=1, fields=job_fields())
+    for i in range(1, 10):
+        coalescer.send_event('CHANGED', id=1, fields=job_fields(percent=i))
+
+    assert [event_type for event_type, kwargs in sent] == ['ADDED', 'CHANGED']
+
+    await asyncio.sleep(0.1)
+
+    assert len(sent) == 3
+    assert sent[-1][1]['fields']['progress']['percent'] == 9
+
+
+@pytest.mark.asyncio
+async def test_state_transitions_are_not_delayed():
+    coalescer, sent = create_coalescer(interval=10)
+    coalescer.send_event('CHANGED', id=1, fields=job_fields())
+    coalescer.send_event('CHANGED', id=1, fields=job_fields(percent=50))
+    coalescer.send_event('CHANGED', id=1, fields=job_fields('SUCCESS', percent=100))
+
+    assert [kwargs['fields']['state'] for event_type, kwargs in sent] == ['RUNNING', 'SUCCESS']
+    assert coalescer.pending == {}
+
+
+@pytest.mark.asyncio
+async def test_delta():
+    coalescer, sent = create_coalescer(delta=True)
+    coalescer.send_event('ADDED', id=1, fields=job_fields('WAITING'))
+    coalescer.send_event('CHANGED', id=1, fields=job_fields())
+    coalescer.send_event('CHANGED', id=1, fields=job_fields(percent=10))
+    coalescer.send_event('CHANGED', id=1, fields=job_fields(percent=10))
+
+    assert sent[1:] == [
+        ('CHANGED', {'id': 1, 'fields': {'id': 1, 'state': 'RUNNING'}}),
+        ('CHANGED', {'id': 1, 'fields': {
+            'id': 1, 'progress': {'percent': 10, 'description': '', 'extra': None},
+        }}),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_in_place_progress_update():
+    coalescer, sent = create_coalescer(delta=True)
+    fields = job_fields()
+    coalescer.send_event('CHANGED', id=1, fields=fields)
+    fields['progress']['percent'] = 50
+    coalescer.send_event('CHANGED', id=1, fields=fields)
+
+    assert sent[-1][1]['fields']['progress']['percent'] == 50
+
+
+@pytest.mark.asyncio
+async def test_close():
+    coalescer, sent = create_coalescer(interval=0.01)
+    coalescer.send_event('CHANGED', id=1, fields=job_fields())
+    coalescer.send_event('CHANGED', id=1, fields=job_fields(percent=50))
+    coalescer.close()
+
+    await asyncio.sleep(0.05)
+
+    assert len(sent) == 1
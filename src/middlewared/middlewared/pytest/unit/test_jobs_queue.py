@@ -0,0 +1,148 @@
+import asyncio
+import errno
+from unittest.mock import Mock
+
+import pytest
+
+from middlewared.job import Job, JobsQueue
+from middlewared.service_exception import CallError
+
+
+def job_options(**kwargs):
+    return {
+        'lock': None,
+        'lock_queue_size': None,
+        'logs': False,
+        'process': False,
+        'pipes': [],
+        'check_pipes': True,
+        'transient': False,
+        'description': None,
+        'abortable': False,
+        'read_roles': [],
+        'priority': 0,
+        'max_concurrency': None,
+        **kwargs,
+    }
+
+
+def create_queue(**kwargs):
+    middleware = Mock(loop=asyncio.get_running_loop())
+    return JobsQueue(middleware, **kwargs)
+
+
+def create_job(queue, method_name, args=None, **options):
+    return Job(queue.middleware, method_name, None, None, args or [], job_options(**options), None, None, None, None)
+
+
+async def dispatch_all(queue):
+    dispatched = []
+    while True:
+        try:
+            dispatched.append(await asyncio.wait_for(queue.next(), 0.01))
+        except asyncio.TimeoutError:
+            return dispatched
+
+
+@pytest.mark.asyncio
+async def test_fifo_order():
+    queue = create_queue()
+    jobs = [queue.add(create_job(queue, 'test.method')) for i in range(3)]
+
+    assert await dispatch_all(queue) == jobs
+
+
+@pytest.mark.asyncio
+async def test_lock():
+    queue = create_queue()
+    job1 = queue.add(create_job(queue, 'test.method', lock='lock'))
+    job2 = queue.add(create_job(queue, 'test.method', lock='lock'))
+    job3 = queue.add(create_job(queue, 'test.method'))
+
+    assert await dispatch_all(queue) == [job1, job3]
+
+    queue.job_finished(job1)
+    assert await dispatch_all(queue) == [job2]
+
+    queue.job_finished(job2)
+    assert queue.job_locks == {}
+
+
+@pytest.mark.asyncio
+async def test_lock_queue_size():
+    queue = create_queue()
+    job1 = queue.add(create_job(queue, 'test.method', lock='lock', lock_queue_size=1))
+    assert await dispatch_all(queue) == [job1]
+
+    job2 = queue.add(create_job(queue, 'test.method', lock='lock', lock_queue_size=1))
+    assert queue.add(create_job(queue, 'test.method', lock='lock', lock_queue_size=1)) is job2
+    assert len(queue.job_locks['lock'].get_jobs()) == 2
+
+
+@pytest.mark.asyncio
+async def test_lock_queue_size_zero():
+    queue = create_queue()
+    job1 = queue.add(create_job(queue, 'test.method', lock='lock', lock_queue_size=0))
+    assert await dispatch_all(queue) == [job1]
+
+    with pytest.raises(CallError) as ve:
+        queue.add(create_job(queue, 'test.method', lock='lock', lock_queue_size=0))
+
+    assert ve.value.errno == errno.EBUSY
+
+
+@pytest.mark.asyncio
+async def test_priority():
+    queue = create_queue()
+    job1 = queue.add(create_job(queue, 'test.method1'))
+    job2 = queue.add(create_job(queue, 'test.method2', priority=10))
+
+    assert await dispatch_all(queue) == [job2, job1]
+
+
+@pytest.mark.asyncio
+async def test_method_max_concurrency():
+    queue = create_queue()
+    job1 = queue.add(create_job(queue, 'test.method1', max_concurrency=1))
+    job2 = queue.add(create_job(queue, 'test.method1', max_concurrency=1))
+    job3 = queue.add(create_job(queue, 'test.method2'))
+
+    assert await dispatch_all(queue) == [job1, job3]
+
+    queue.job_finished(job1)
+    assert await dispatch_all(queue) == [job2]
+
+
+@pytest.mark.asyncio
+async def test_global_max_concurrency():
+    queue = create_queue(max_concurrency=1)
+    job1 = queue.add(create_job(queue, 'test.method'))
+    job2 = queue.add(create_job(queue, 'test.method'))
+
+    assert await dispatch_all(queue) == [job1]
+
+    queue.job_finished(job1)
+    assert await dispatch_all(queue) == [job2]
+
+
+@pytest.mark.asyncio
+async def test_stats():
+    queue = create_queue()
+    job1 = queue.add(create_job(queue, 'test.method', lock='lock'))
+    queue.add(create_job(queue, 'test.method', lock='lock'))
+
+    await dispatch_all(queue)
+
+    stats = queue.get_stats()
+    assert stats['running'] == 1
+    assert stats['waiting'] == 1
+    assert stats['methods']['test.method']['waiting'] == 1
+    assert stats['methods']['test.method']['running'] == 1
+    assert stats['methods']['test.method']['dispatched'] == 1
+
+    queue.job_finished(job1)
+    await dispatch_all(queue)
+
+    stats = queue.get_stats()
+    assert stats['waiting'] == 0
+    assert stats['methods']['test.method']['dispatched'] == 2
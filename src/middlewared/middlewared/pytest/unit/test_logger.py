@@ -0,0 +1,108 @@
+import json
+import logging
+import sys
+from unittest.mock import patch
+
+import pytest
+
+from middlewared import logger
+from middlewared.logger import BoundedQueueHandler, LogRateLimiter
+from middlewared.logging.json_formatter import JsonLogFormatter
+
+
+def record(name='test', msg='message %d', args=(1,), exc_info=None, level=logging.INFO):
+    return logging.LogRecord(name, level, __file__, 1, msg, args, exc_info)
+
+
+def messages(handler):
+    result = []
+    while not handler.queue.empty():
+        result.append(handler.queue.get_nowait().getMessage())
+    return result
+
+
+def test_log_rate_limiter():
+    limiter = LogRateLimiter(rate=1, burst=2)
+    with patch.object(logger.time, 'monotonic', return_value=0):
+        assert [limiter.acquire('a') for i in range(3)] == [(True, 0), (True, 0), (False, 0)]
+        assert limiter.acquire('b') == (True, 0)
+        assert limiter.acquire('a') == (False, 0)
+
+    with patch.object(logger.time, 'monotonic', return_value=1):
+        assert limiter.acquire('a') == (True, 2)
+        assert limiter.acquire('a') == (False, 0)
+
+
+def test_bounded_queue_handler_drops():
+    handler = BoundedQueueHandler(maxsize=2)
+    for i in range(4):
+        handler.handle(record(args=(i,)))
+
+    assert handler.dropped == 2
+    assert messages(handler) == ['message 0', 'message 1']
+
+    handler.handle(record(args=(4,)))
+    assert handler.dropped == 0
+    assert messages(handler) == ['2 messages were dropped because the log queue was full', 'message 4']
+
+
+def test_bounded_queue_handler_rate_limit():
+    handler = BoundedQueueHandler(rate_limiter=LogRateLimiter(rate=1, burst=1))
+    with patch.object(logger.time, 'monotonic', return_value=0):
+        for i in range(3):
+            handler.handle(record(args=(i,)))
+
+    with patch.object(logger.time, 'monotonic', return_value=1):
+        handler.handle(record(args=(3,)))
+
+    assert messages(handler) == ['message 0', '2 messages were suppressed by rate limiting', 'message 3']
+
+
+def test_bounded_queue_handler_rate_limit_warnings():
+    handler = BoundedQueueHandler(rate_limiter=LogRateLimiter(rate=1, burst=1))
+    with patch.object(logger.time, 'monotonic', return_value=0):
+        handler.handle(record(args=(0,)))
+        handler.handle(record(args=(1,)))
+        handler.handle(record(args=(2,), level=logging.WARNING))
+        handler.handle(record(args=(3,), level=logging.ERROR))
+
+    assert messages(handler) == ['message 0', 'message 2', 'message 3']
+
+
+def test_json_log_formatter():
+    try:
+        raise ValueError('error')
+    except ValueError:
+        prepared = BoundedQueueHandler().prepare(record(exc_info=sys.exc_info()))
+
+    entry = json.loads(JsonLogFormatter().format(prepared))
+    assert entry['logger'] == 'test'
+    assert entry['level'] == 'INFO'
+    assert entry['message'] == 'message 1'
+    assert entry['exception'].endswith('ValueError: error')
+
+
+@pytest.mark.parametrize('log_handler,formatter', [
+    ('json', JsonLogFormatter),
+    ('file', logging.Formatter),
+])
+def test_setup_logging_file_formatter(log_handler, formatter):
+    loggers = [logging.getLogger(name) for name in (
+        None, 'app_lifecycle', 'app_migrations', 'docker_image', 'failover', 'netdata_api', 'zettarepl',
+    )]
+    saved = [(log, list(log.handlers), log.propagate, log.level) for log in loggers]
+    try:
+        with (
+            patch.object(logger.logging.handlers, 'RotatingFileHandler') as file_handler,
+            patch.object(logger.logging.handlers, 'QueueListener'),
+            patch.object(logger.os, 'chmod'),
+        ):
+            logger.setup_logging('middleware', 'DEBUG', log_handler)
+    finally:
+        for log, handlers, propagate, level in saved:
+            log.handlers[:] = handlers
+            log.propagate = propagate
+            log.setLevel(level)
+
+    formatters = [c.args[0] for c in file_handler.return_value.setFormatter.mock_calls]
+    assert formatters and all(type(f) is formatter for f in formatters)
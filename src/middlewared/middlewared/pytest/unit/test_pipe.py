@@ -0,0 +1,62 @@
+import asyncio
+import threading
+from unittest.mock import Mock
+
+import pytest
+
+from middlewared import pipe as pipe_module
+from middlewared.pipe import Pipe
+
+
+class Response:
+    def __init__(self):
+        self.data = b''
+
+    async def write(self, data):
+        self.data += data
+
+
+class Multipart:
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    async def read_chunk(self, size):
+        return self.chunks.pop(0) if self.chunks else b''
+
+
+@pytest.mark.asyncio
+async def test_copy_to_response():
+    pipe = Pipe(Mock())
+    data = b'x' * (3 * pipe_module.PIPE_SIZE)
+
+    def write():
+        pipe.w.write(data)
+        pipe.w.close()
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    resp = Response()
+    assert await pipe.copy_to_response(resp) == len(data)
+    writer.join()
+
+    assert resp.data == data
+
+
+@pytest.mark.asyncio
+async def test_copy_from_multipart():
+    pipe = Pipe(Mock())
+    chunks = [b'a' * pipe_module.PIPE_SIZE, b'b' * pipe_module.PIPE_SIZE, b'c']
+    expected = b''.join(chunks)
+
+    read = asyncio.get_running_loop().run_in_executor(None, pipe.r.read)
+    assert await pipe.copy_from_multipart(Multipart(chunks)) == len(expected)
+
+    assert await read == expected
+
+
+@pytest.mark.asyncio
+async def test_copy_from_multipart_reader_closed():
+    pipe = Pipe(Mock())
+    pipe.r.close()
+
+    assert await pipe.copy_from_multipart(Multipart([b'a' * pipe_module.PIPE_SIZE] * 4)) < 4 * pipe_module.PIPE_SIZE
@@ -0,0 +1,75 @@
+import os
+from unittest.mock import patch
+
+import pytest
+
+from middlewared.utils.filesystem import acl_tree
+from middlewared.utils.filesystem.acl_tree import AclTemplate, AclTreeConfig, apply_acl_tree
+
+# tests use user namespace xattrs in place of ACL xattrs so that they do not depend on ACL support
+ACL_XATTR = 'user.test_acl'
+TEMPLATES = (
+    AclTemplate(dir={ACL_XATTR: b'dir1'}, file={ACL_XATTR: b'file1'}),
+    AclTemplate(dir={ACL_XATTR: b'dir2'}, file={ACL_XATTR: b'file2'}),
+)
+
+
+@pytest.fixture
+def tree(tmp_path):
+    for i in range(3):
+        subdir = tmp_path / f'dir{i}' / 'subdir'
+        subdir.mkdir(parents=True)
+        (tmp_path / f'dir{i}' / 'file').write_text('data')
+        (subdir / 'file').write_text('data')
+        os.symlink('/etc/passwd', subdir / 'link')
+
+    (tmp_path / 'file').write_text('data')
+    os.setxattr(tmp_path / 'dir0' / 'file', 'user.test_stale', b'stale')
+
+    with patch.object(acl_tree, 'ACL_XATTRS', frozenset([ACL_XATTR, 'user.test_stale'])):
+        yield tmp_path
+
+
+def fd_count():
+    return len(os.listdir('/proc/self/fd'))
+
+
+@pytest.mark.parametrize('workers,max_open_dirs', [(1, 128), (4, 128), (4, 1)])
+def test_apply_acl_tree(tree, workers, max_open_dirs):
+    fds = fd_count()
+    with patch.object(acl_tree, 'ACLTREE_MAX_OPEN_DIRS', max_open_dirs):
+        stats = apply_acl_tree(str(tree), AclTreeConfig(templates=TEMPLATES, workers=workers))
+
+    assert (stats.dirs, stats.files, stats.skipped) == (6, 7, 0)
+    assert os.listxattr(tree) == []
+    assert os.getxattr(tree / 'file', ACL_XATTR) == b'file1'
+    assert os.listxattr(tree / 'dir0' / 'file') == [ACL_XATTR]
+    for i in range(3):
+        assert os.getxattr(tree / f'dir{i}', ACL_XATTR) == b'dir1'
+        assert os.getxattr(tree / f'dir{i}' / 'file', ACL_XATTR) == b'file2'
+        assert os.getxattr(tree / f'dir{i}' / 'subdir', ACL_XATTR) == b'dir2'
+        assert os.getxattr(tree / f'dir{i}' / 'subdir' / 'file', ACL_XATTR) == b'file2'
+
+    assert fd_count() == fds
+
+
+def test_apply_acl_tree_skip_unchanged(tree):
+    config = AclTreeConfig(templates=TEMPLATES, skip_unchanged=True)
+    apply_acl_tree(str(tree), config)
+    os.setxattr(tree / 'dir1' / 'file', ACL_XATTR, b'changed')
+
+    with patch.object(acl_tree, 'setxattr', wraps=os.setxattr) as setxattr:
+        stats = apply_acl_tree(str(tree), config)
+
+    assert stats.skipped == stats.dirs + stats.files - 1
+    setxattr.assert_called_once()
+    assert os.getxattr(tree / 'dir1' / 'file', ACL_XATTR) == b'file2'
+
+
+def test_apply_acl_tree_error(tree):
+    fds = fd_count()
+    with patch.object(acl_tree, 'setxattr', side_effect=PermissionError()):
+        with pytest.raises(PermissionError):
+            apply_acl_tree(str(tree), AclTreeConfig(templates=TEMPLATES, workers=4))
+
+    assert fd_count() == fds
@@ -0,0 +1,88 @@
+import asyncio
+from unittest.mock import Mock, patch
+
+import pytest
+
+from middlewared.service import periodic
+from middlewared.utils import periodic as periodic_utils
+from middlewared.utils.periodic import PeriodicTaskScheduler
+
+
+def create_scheduler(call):
+    middleware = Mock()
+    middleware.loop = asyncio.get_running_loop()
+    middleware.create_task = lambda coro, name: middleware.loop.create_task(coro)
+    middleware._call = call
+    return PeriodicTaskScheduler(middleware)
+
+
+def task_method(delay=0, **kwargs):
+    @periodic(**kwargs)
+    def method():
+        pass
+
+    calls = []
+
+    async def call(name, serviceobj, methodobj, params):
+        calls.append(name)
+        await asyncio.sleep(delay)
+
+    return method, calls, call
+
+
+@pytest.mark.asyncio
+@patch.object(periodic_utils, 'PERIODIC_JITTER', 0)
+async def test_periodic_task_runs():
+    method, calls, call = task_method(interval=0.1)
+    scheduler = create_scheduler(call)
+    scheduler.add('service.task', None, method)
+
+    with patch.object(periodic_utils.random, 'uniform', lambda a, b: b):
+        scheduler._start()
+        await asyncio.sleep(0.25)
+
+    assert calls == ['service.task', 'service.task']
+    stats = scheduler.get_stats()['service.task']
+    assert stats['runs'] == 2
+    assert stats['skipped'] == 0
+
+
+@pytest.mark.asyncio
+@patch.object(periodic_utils, 'PERIODIC_JITTER', 0)
+async def test_periodic_task_skipped_if_running():
+    method, calls, call = task_method(delay=0.25, interval=0.1, run_on_start=False)
+    scheduler = create_scheduler(call)
+    scheduler.add('service.task', None, method)
+
+    scheduler._start()
+    await asyncio.sleep(0.32)
+
+    stats = scheduler.get_stats()['service.task']
+    assert calls == ['service.task']
+    assert stats['running'] is True
+    assert stats['skipped'] == 2
+
+    await asyncio.sleep(0.1)
+    stats = scheduler.get_stats()['service.task']
+    assert calls == ['service.task', 'service.task']
+    assert stats['runs'] == 1
+    assert stats['runtime_max'] >= 0.25
+
+
+@pytest.mark.asyncio
+@patch.object(periodic_utils, 'PERIODIC_JITTER', 0)
+@patch.object(periodic_utils, 'PERIODIC_LOAD_DEFERRAL', 0.1)
+async def test_periodic_task_deferred_under_load():
+    method, calls, call = task_method(interval=0.4, run_on_start=False)
+    scheduler = create_scheduler(call)
+    scheduler.add('service.task', None, method)
+
+    with patch.object(PeriodicTaskScheduler, '_overloaded', Mock(return_value=True)):
+        scheduler._start()
+        await asyncio.sleep(0.65)
+
+    # Deferred twice (for half of the interval in total) and then run regardless of the load
+    assert calls == ['service.task']
+    stats = scheduler.get_stats()['service.task']
+    assert stats['deferred'] == 2
+    assert stats['next_run_in'] > 0.1
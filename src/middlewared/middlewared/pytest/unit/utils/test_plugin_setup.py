@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+
+from middlewared.utils.plugins import plugin_setup_graph, plugin_setup_profile, run_plugin_setups
+
+
+def setup_func(log, name, delay=0):
+    async def setup(middleware):
+        log.append(f'{name} begin')
+        await asyncio.sleep(delay)
+        log.append(f'{name} end')
+
+    return setup
+
+
+def test_plugin_setup_graph():
+    setups = plugin_setup_graph([
+        ('b', None, None),
+        ('declared', None, ['c', 'missing']),
+        ('datastore', None, None),
+        ('c', None, None),
+    ], ['config', 'datastore'])
+
+    assert [(s.name, s.depends) for s in setups] == [
+        ('datastore', []),
+        ('b', ['datastore']),
+        ('declared', ['datastore', 'c']),
+        ('c', ['b']),
+    ]
+
+
+def test_plugin_setup_graph_cycle():
+    with pytest.raises(ValueError, match='Circular'):
+        plugin_setup_graph([('a', None, ['b']), ('b', None, ['a'])], [])
+
+
+@pytest.mark.asyncio
+async def test_run_plugin_setups():
+    log = []
+    setups = plugin_setup_graph([
+        ('slow', setup_func(log, 'slow', 0.1), []),
+        ('a', setup_func(log, 'a'), None),
+        ('b', setup_func(log, 'b'), None),
+        ('after_slow', setup_func(log, 'after_slow'), ['slow']),
+        ('datastore', setup_func(log, 'datastore'), None),
+    ], ['datastore'])
+
+    await run_plugin_setups(None, setups)
+
+    assert log == [
+        'datastore begin', 'datastore end',
+        'slow begin', 'a begin', 'a end', 'b begin', 'b end', 'slow end',
+        'after_slow begin', 'after_slow end',
+    ]
+
+    profile = plugin_setup_profile(setups, min(s.started_at for s in setups))
+    assert profile['critical_path'] == ['datastore', 'slow', 'after_slow']
+    assert profile['total'] >= 0.1
+    assert [p['name'] for p in profile['plugins']][0] == 'datastore'
+
+
+@pytest.mark.asyncio
+async def test_run_plugin_setups_error():
+    log = []
+
+    def failing(middleware):
+        raise RuntimeError('setup failed')
+
+    setups = plugin_setup_graph([
+        ('failing', failing, None),
+        ('next', setup_func(log, 'next'), None),
+    ], [])
+
+    with pytest.raises(RuntimeError, match='setup failed'):
+        await run_plugin_setups(None, setups)
+
+    await asyncio.sleep(0)
+    assert log == []
@@ -0,0 +1,81 @@
+from unittest.mock import Mock
+
+from middlewared.schema import accepts, Dict, Int, List, Patch, Ref, Str
+from middlewared.service import Service
+from middlewared.utils.plugins import process_pool_modules
+
+
+class ProviderService(Service):
+    class Config:
+        namespace = 'provider'
+        private = True
+
+    @accepts(Dict('provided-schema', Int('id'), register=True), List('provided-list', register=True))
+    def provide(self, data, items):
+        pass
+
+
+class NestedProviderService(Service):
+    class Config:
+        namespace = 'nested_provider'
+        private = True
+
+    @accepts(Dict('outer', Str('name', register=True)))
+    def provide(self, data):
+        pass
+
+
+class PoolService(Service):
+    class Config:
+        namespace = 'pool_service'
+        private = True
+        process_pool = True
+
+    @accepts(Ref('provided-schema'), Dict('options', Ref('name')))
+    def run(self, data, options):
+        pass
+
+
+class PoolPatchService(Service):
+    class Config:
+        namespace = 'pool_patch_service'
+        private = True
+        process_pool = True
+
+    @accepts(Patch('provided-schema', 'patched-schema', ('rm', {'name': 'id'})))
+    def run(self, data):
+        pass
+
+
+class UnrelatedService(Service):
+    class Config:
+        namespace = 'unrelated'
+        private = True
+
+    @accepts(Ref('provided-list'))
+    def run(self, items):
+        pass
+
+
+for module, cls in (
+    ('plugins.provider', ProviderService),
+    ('plugins.nested_provider', NestedProviderService),
+    ('plugins.pool', PoolService),
+    ('plugins.pool_patch', PoolPatchService),
+    ('plugins.unrelated', UnrelatedService),
+):
+    cls.__module__ = module
+
+
+def test_process_pool_modules():
+    services = [cls(Mock()) for cls in (
+        ProviderService, NestedProviderService, PoolService, PoolPatchService, UnrelatedService,
+    )]
+
+    assert process_pool_modules(services) == [
+        'plugins.nested_provider', 'plugins.pool', 'plugins.pool_patch', 'plugins.provider',
+    ]
+
+
+def test_process_pool_modules_no_process_pool():
+    assert process_pool_modules([ProviderService(Mock()), UnrelatedService(Mock())]) == []
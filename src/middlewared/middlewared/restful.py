@@ -510,7 +510,7 @@ class Resource(object):
                 self.rest._openapi.add_path(path, i, operation, self.service_config)
             self.__map_method_params(operation)
 
-        self.middleware.logger.trace(f"add route {self.get_path()}")
+        self.middleware.logger.trace("add route %s", self.get_path())
 
     def __map_method_params(self, method_name):
         """
@@ -862,7 +862,7 @@ class Resource(object):
                 resp.set_status(403)
                 return resp
             if upload_pipe:
-                await self.middleware.run_in_thread(copy_multipart_to_pipe, self.middleware.loop, filepart, upload_pipe)
+                await upload_pipe.copy_from_multipart(filepart)
             if method['downloadable'] and download_pipe is None:
                 result = await result.wait()
         except CallError as e:
@@ -910,16 +910,7 @@ class Resource(object):
             })
             await resp.prepare(req)
 
-            loop = asyncio.get_event_loop()
-
-            def do_copy():
-                while True:
-                    read = download_pipe.r.read(1048576)
-                    if read == b'':
-                        break
-                    asyncio.run_coroutine_threadsafe(resp.write(read), loop=loop).result()
-
-            await self.middleware.run_in_thread(do_copy)
+            await download_pipe.copy_to_response(resp)
 
             await resp.drain()
             return resp
@@ -933,20 +924,3 @@ class Resource(object):
         resp.headers['Content-type'] = 'application/json'
         resp.text = json.dumps(result, indent=True)
         return resp
-
-
-def copy_multipart_to_pipe(loop, filepart, pipe):
-    try:
-        try:
-            while True:
-                read = asyncio.run_coroutine_threadsafe(
-                    filepart.read_chunk(filepart.chunk_size),
-                    loop=loop,
-                ).result()
-                if read == b'':
-                    break
-                pipe.w.write(read)
-        finally:
-            pipe.w.close()
-    except BrokenPipeError:
-        pass
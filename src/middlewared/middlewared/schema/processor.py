@@ -168,6 +168,11 @@ def accepts(*schema, audit=None, audit_callback=False, audit_extended=None, depr
 
             return args, kwargs
 
+        def clean_and_validate_call_args(params):
+            # Validate method call arguments (without common arguments like `self` or `job`) and fill in defaults
+            args, kwargs = clean_and_validate_args([None] * args_index + list(params), {})
+            return args[args_index:] + list(kwargs.values())
+
         if asyncio.iscoroutinefunction(func):
             async def nf(*args, **kwargs):
                 args, kwargs = clean_and_validate_args(args, kwargs)
@@ -188,6 +193,7 @@ def accepts(*schema, audit=None, audit_callback=False, audit_extended=None, depr
         nf.roles = roles or []
         nf.wraps = f
         nf.wrap = wrap
+        nf.clean_and_validate_call_args = clean_and_validate_call_args
 
         return nf
 
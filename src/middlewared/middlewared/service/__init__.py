@@ -9,7 +9,7 @@ from .config_service import ConfigService # noqa
 from .core_service import CoreService, MIDDLEWARE_RUN_DIR, MIDDLEWARE_STARTED_SENTINEL_PATH # noqa
 from .crud_service import CRUDService # noqa
 from .decorators import ( # noqa
-    cli_private, filterable, filterable_returns, item_method, job, lock, no_auth_required,
+    bulk_group, cli_private, filterable, filterable_returns, item_method, job, lock, no_auth_required,
     no_authz_required, pass_app, periodic, private, rest_api_metadata, skip_arg, threaded,
     filterable_api_method
 )
@@ -35,6 +35,7 @@ from middlewared.schema import accepts, Any, Bool, Datetime, Dict, Int, List, St
 from middlewared.service_exception import CallError, ValidationErrors
 from middlewared.utils import BOOTREADY, filter_list, MIDDLEWARE_RUN_DIR
 from middlewared.utils.debug import get_frame_details, get_threads_stacks
+from middlewared.utils.service.crud import real_crud_method
 from middlewared.validators import IpAddress, Range
 
 from .compound_service import CompoundService
@@ -217,6 +218,39 @@ class CoreService(Service):
                 extra=progress.get('extra'),
             )
 
+    @private
+    def jobs_queue_stats(self):
+        """
+        Returns jobs scheduler statistics: queue depth, running jobs count and queue wait time per job method.
+        """
+        return self.middleware.jobs.get_stats()
+
+    @private
+    def file_transfer_stats(self):
+        """
+        Returns statistics of file downloads and uploads: number of transfers (and failed ones), bytes transferred
+        and last, average and maximum throughput in bytes per second.
+        """
+        return self.middleware.fileapp.get_stats()
+
+    @private
+    def periodic_tasks_stats(self):
+        """
+        Returns periodic tasks statistics: whether each task is running, when it is going to run next, how many times
+        it ran, was skipped (because the previous run was still in progress), postponed (due to high system load) or
+        failed and its last, average and maximum run time.
+        """
+        return self.middleware.periodic_tasks.get_stats()
+
+    @private
+    def startup_profile(self):
+        """
+        Returns timeline of plugins setup during middleware startup: when setup of each plugin started and finished
+        (in seconds since setup of the first plugin started) and `critical_path`, the chain of setups (each waiting
+        for the previous one) that ended with the last setup to finish.
+        """
+        return self.middleware.plugins_setup_profile()
+
     @private
     def is_starting_during_boot(self):
         # Returns True if middleware is being currently started during boot
@@ -748,10 +782,15 @@ class CoreService(Service):
         return None
 
     @no_authz_required
-    @accepts(Str("method"), List("params", items=[List("params")]), Str("description", null=True, default=None))
+    @accepts(
+        Str("method"),
+        List("params", items=[List("params")]),
+        Str("description", null=True, default=None),
+        Int("concurrency", default=1, validators=[Range(min_=1, max_=64)]),
+    )
     @job(lock=lambda args: f"bulk:{args[0]}")
     @pass_app()
-    async def bulk(self, app, job, method, params, description):
+    async def bulk(self, app, job, method, params, description, concurrency):
         """
         Will sequentially call `method` with arguments from the `params` list. For example, running
 
@@ -765,20 +804,31 @@ class CoreService(Service):
         If the first call fails and the seconds succeeds (returning `true`), the result of the overall call will be:
 
             [
-                {"result": null, "error": "Error deleting snapshot"},
-                {"result": true, "error": null}
+                {"result": null, "error": "Error deleting snapshot", "duration": 0.01},
+                {"result": true, "error": null, "duration": 0.02}
             ]
 
+        `duration` is the time (in seconds) it took to perform the call.
+
         Important note: the execution status of `core.bulk` will always be a `SUCCESS` (unless an unlikely internal
         error occurs). Caller must check for individual call results to ensure the absence of any call errors.
 
         `description` contains format string for job progress (e.g. "Deleting snapshot {0[dataset]}@{0[name]}")
+
+        `concurrency` specifies how many calls can be performed at the same time. Results are always returned in the
+        order of `params`.
+
+        Some methods (e.g. `zfs.snapshot.delete`) are able to perform multiple calls that share a common resource at
+        once. For such methods calls will be grouped and every call in a group will report the duration of the whole
+        group.
         """
         serviceobj, methodobj = self.middleware.get_method(method)
 
+        mocked = False
         if params:
             if mock := self.middleware._mock_method(method, params[0]):
                 methodobj = mock
+                mocked = True
 
         if app is not None:
             if not app.authenticated_credentials.authorize("CALL", method):
@@ -788,39 +838,141 @@ class CoreService(Service):
 
                 raise CallError("Not authorized", errno.EPERM)
 
-        statuses = []
+        statuses = [None] * len(params)
         if not params:
             return statuses
 
-        for i, p in enumerate(params):
-            progress_description = f"{i} / {len(params)}"
-            if description is not None:
-                progress_description += ": " + description.format(*p)
+        if mocked:
+            units, group_params = [[i] for i in range(len(params))], {}
+        else:
+            units, group_params = self._bulk_units(methodobj, params)
+        units_iter = iter(units)
+        completed = 0
 
-            job.set_progress(100 * i / len(params), progress_description)
+        async def worker():
+            nonlocal completed
+            for unit in units_iter:
+                progress_description = f"{completed} / {len(params)}"
+                if description is not None:
+                    progress_description += ": " + description.format(*params[unit[0]])
 
-            try:
-                # Convention for the auditing backend is to only generate audit
-                # entries for external callers to methods. app is only None
-                # on internal calls to core.bulk.
-                if app:
-                    msg = await self.middleware.call_with_audit(method, serviceobj, methodobj, p, app=app)
+                job.set_progress(100 * completed / len(params), progress_description)
+
+                if len(unit) == 1:
+                    statuses[unit[0]] = await self._bulk_call(app, method, serviceobj, methodobj, params[unit[0]])
                 else:
-                    msg = await self.middleware.call(method, *p)
+                    statuses_ = await self._bulk_group_call(app, method, methodobj, params, group_params, unit)
+                    for i, status in zip(unit, statuses_):
+                        statuses[i] = status
+
+                completed += len(unit)
+
+        await asyncio.gather(*[worker() for i in range(min(concurrency, len(units)))])
+
+        return statuses
 
-                status = {"result": msg, "error": None}
+    def _bulk_units(self, methodobj, params):
+        """
+        Splits `core.bulk` calls into units of work. Each unit is a list of `params` indexes that will be performed
+        by a single call.
+
+        Returns units and a dictionary of validated (and filled with default values) call arguments for the calls
+        that will be performed in groups. Calls that do not pass validation are performed one by one so that the
+        validation error is reported as usual.
+        """
+        group_methodobj = self._bulk_group_methodobj(methodobj)
+        if group_methodobj is None:
+            return [[i] for i in range(len(params))], {}
+
+        descriptor = group_methodobj._bulk_group
+        validate = getattr(group_methodobj, "clean_and_validate_call_args", None)
+        units = []
+        groups = defaultdict(list)
+        group_params = {}
+        for i, p in enumerate(params):
+            if validate is not None:
+                try:
+                    p = validate(p)
+                except Exception:
+                    units.append([i])
+                    continue
+
+            try:
+                key = descriptor.group(p)
+            except Exception:
+                key = None
 
-                if isinstance(msg, Job):
-                    b_job = msg
-                    status["job_id"] = b_job.id
-                    status["result"] = await msg.wait()
+            if key is None:
+                units.append([i])
+            else:
+                groups[key].append(i)
+                group_params[i] = p
+
+        for indexes in groups.values():
+            for j in range(0, len(indexes), descriptor.max_size):
+                units.append(indexes[j:j + descriptor.max_size])
+
+        # Preserve the order in which calls were requested as much as possible
+        return sorted(units, key=lambda unit: unit[0]), group_params
+
+    def _bulk_group_methodobj(self, methodobj):
+        if getattr(methodobj, "_bulk_group", None) is not None:
+            return methodobj
+
+        if (crud_methodobj := real_crud_method(methodobj)) and getattr(crud_methodobj, "_bulk_group", None):
+            return crud_methodobj
+
+    async def _bulk_call(self, app, method, serviceobj, methodobj, p):
+        start = time.monotonic()
+        try:
+            # Convention for the auditing backend is to only generate audit
+            # entries for external callers to methods. app is only None
+            # on internal calls to core.bulk.
+            if app:
+                msg = await self.middleware.call_with_audit(method, serviceobj, methodobj, p, app=app)
+            else:
+                msg = await self.middleware.call(method, *p)
 
-                    if b_job.error:
-                        status["error"] = b_job.error
+            status = {"result": msg, "error": None}
 
-                statuses.append(status)
-            except Exception as e:
-                statuses.append({"result": None, "error": str(e)})
+            if isinstance(msg, Job):
+                b_job = msg
+                status["job_id"] = b_job.id
+                status["result"] = await msg.wait()
+
+                if b_job.error:
+                    status["error"] = b_job.error
+        except Exception as e:
+            status = {"result": None, "error": str(e)}
+
+        status["duration"] = time.monotonic() - start
+        return status
+
+    async def _bulk_group_call(self, app, method, methodobj, params, group_params, unit):
+        descriptor = self._bulk_group_methodobj(methodobj)._bulk_group
+
+        start = time.monotonic()
+        try:
+            result = await self.middleware.call(
+                f"{method.rsplit('.', 1)[0]}.{descriptor.method}", [group_params[i] for i in unit],
+            )
+            if isinstance(result, Job):
+                result = await result.wait(raise_error=True)
+
+            if len(result) != len(unit):
+                raise CallError(f"{descriptor.method!r} returned {len(result)} results for {len(unit)} calls")
+
+            statuses = [{"result": status["result"], "error": status["error"]} for status in result]
+        except Exception as e:
+            statuses = [{"result": None, "error": str(e)} for i in unit]
+
+        duration = time.monotonic() - start
+        for i, status in zip(unit, statuses):
+            status["duration"] = duration
+            if app:
+                await self.middleware.log_audit_message_for_method(
+                    method, methodobj, params[i], app, True, True, status["error"] is None,
+                )
 
         return statuses
 
@@ -886,6 +1038,14 @@ class CoreService(Service):
         if "py_exceptions" in options:
             app.py_exceptions = options["py_exceptions"]
 
+        if app.websocket and ("job_events_coalesce_interval" in options or "job_events_delta" in options):
+            app.configure_job_events(
+                interval=options.get(
+                    "job_events_coalesce_interval", app.job_events.interval if app.job_events else 0,
+                ),
+                delta=options.get("job_events_delta", app.job_events.delta if app.job_events else False),
+            )
+
     @no_auth_required
     @api_method(CoreSubscribeArgs, CoreSubscribeResult)
     @pass_app()
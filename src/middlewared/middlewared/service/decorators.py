@@ -10,11 +10,31 @@ from middlewared.api.current import QueryArgs, GenericQueryResult
 from middlewared.schema import accepts, Int, List, OROperator, Ref, returns
 
 
+BulkGroupDescriptor = namedtuple('BulkGroupDescriptor', ['group', 'method', 'max_size'])
 LOCKS = defaultdict(asyncio.Lock)
 PeriodicTaskDescriptor = namedtuple('PeriodicTaskDescriptor', ['interval', 'run_on_start'])
 THREADING_LOCKS = defaultdict(threading.Lock)
 
 
+def bulk_group(group, method, max_size=1000):
+    """
+    Allow `core.bulk` to pass multiple calls of the decorated method to another method of the same service at once.
+
+    :param group: A callable that accepts the raw call arguments list and returns a hashable group key (e.g. the pool
+        name). Calls with the same group key are passed to `method` together. Calls for which `None` is returned are
+        performed one by one as usual.
+    :param method: Name of the method of the same service that accepts a list of call arguments lists (all belonging
+        to the same group) and returns a list of `{"result": ..., "error": ...}` dicts, one for each call, in the
+        same order.
+    :param max_size: Maximum number of calls passed to `method` at once. Bigger groups will be split.
+    """
+    def wrapper(fn):
+        fn._bulk_group = BulkGroupDescriptor(group, method, max_size)
+        return fn
+
+    return wrapper
+
+
 def cli_private(fn):
     """Do not expose method in CLI"""
     fn._cli_private = True
@@ -84,7 +104,7 @@ def item_method(fn):
 
 def job(
     lock=None, lock_queue_size=5, logs=False, process=False, pipes=None, check_pipes=True, transient=False,
-    description=None, abortable=False, read_roles: list[str] | None = None,
+    description=None, abortable=False, read_roles: list[str] | None = None, priority=0, max_concurrency=None,
 ):
     """
     Flag method as a long-running job. This must be the first decorator to be applied (meaning that it must be specified
@@ -168,6 +188,13 @@ def job(
 
         By default, non-full-admin users already can see their own jobs and download their logs, so this only should
         be used when the job is launched externally (i.e., using crontab).
+
+    :param priority: Jobs with higher priority are dispatched first when several jobs are ready to run at the same
+        time. Jobs with equal priority are dispatched in the order they were queued. Default value is `0`.
+
+    :param max_concurrency: How many jobs of this method can be in the `RUNNING` state at the same time. Excess jobs
+        will stay in the `WAITING` state until one of the running jobs completes. Unlike `lock`, this does not limit
+        the lock queue size. Default value is `None` meaning that there is no limit.
     """
     def check_job(fn):
         fn._job = {
@@ -181,6 +208,8 @@ def job(
             'description': description,
             'abortable': abortable,
             'read_roles': read_roles or [],
+            'priority': priority,
+            'max_concurrency': max_concurrency,
         }
         return fn
     return check_job
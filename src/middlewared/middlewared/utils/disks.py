@@ -1,10 +1,12 @@
 import os
 import re
+from collections import defaultdict
 
 import pyudev
 
 
 DISKS_TO_IGNORE = ('sr', 'md', 'dm-', 'loop', 'zd')
+RE_IDENT = re.compile(r'^\{(?P<type>.+?)\}(?P<value>.+)$')
 RE_IS_PART = re.compile(r'p\d{1,3}$')
 # sda, vda, nvme0n1 but not sda1/vda1/nvme0n1p1
 VALID_WHOLE_DISK = re.compile(r'^sd[a-z]+$|^vd[a-z]+$|^nvme\d+n\d+$')
@@ -58,6 +60,58 @@ def dev_to_ident(name, sys_disks):
     return f'{{devicename}}{name}'
 
 
+class DiskInventory:
+    """
+    In-memory index of system disks (as returned by `device.get_disks`) that resolves disk identifiers
+    (i.e. "{serial_lunid}AAAA_012345") to device names in constant time and can be updated one disk at a time.
+    """
+
+    def __init__(self, sys_disks: dict[str, dict] | None = None):
+        self.disks = {}
+        # {identifier type: {identifier value: [device name, ...]}}
+        self.index = defaultdict(lambda: defaultdict(list))
+        for name, disk in (sys_disks or {}).items():
+            self.update(name, disk)
+
+    def __contains__(self, name):
+        return name in self.disks
+
+    def update(self, name: str, disk: dict):
+        self.remove(name)
+        self.disks[name] = disk
+        for type_, value, dev in self._identifiers(name, disk):
+            self.index[type_][value].append(dev)
+
+    def remove(self, name: str):
+        if (disk := self.disks.pop(name, None)) is None:
+            return
+
+        for type_, value, dev in self._identifiers(name, disk):
+            devs = self.index[type_][value]
+            devs.remove(dev)
+            if not devs:
+                del self.index[type_][value]
+
+    def ident_to_dev(self, ident: str) -> str | None:
+        if not ident or not (search := RE_IDENT.search(ident)):
+            return
+
+        if devs := self.index.get(search.group('type'), {}).get(search.group('value')):
+            return devs[0]
+
+    def dev_to_ident(self, name: str) -> str:
+        return dev_to_ident(name, self.disks)
+
+    def _identifiers(self, name, disk):
+        for type_, key in (('devicename', 'name'), ('serial_lunid', 'serial_lunid'), ('serial', 'serial')):
+            if disk.get(key):
+                yield type_, disk[key], name
+
+        for part in disk.get('parts') or []:
+            if part.get('partition_uuid'):
+                yield 'uuid', part['partition_uuid'], part.get('disk', name)
+
+
 def get_disk_names() -> list[str]:
     """
     NOTE: The return of this method should match the keys retrieve when running `self.get_disks`.
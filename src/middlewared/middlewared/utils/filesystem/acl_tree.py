@@ -0,0 +1,277 @@
+# Utilities for applying an ACL to a whole directory tree.
+# test coverage provided by pytest/unit/utils/test_acl_tree.py
+
+import os
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from errno import ENODATA
+from os import (
+    close,
+    fchown,
+    getxattr,
+    listxattr,
+    removexattr,
+    setxattr,
+    O_DIRECTORY,
+    O_NOFOLLOW,
+    O_RDONLY,
+)
+from middlewared.job import Job
+from .acl import ACL_XATTRS
+from .directory import DirectoryIterator
+from .stat_x import statx, ATFlags, StatxEtype
+from .utils import path_in_ctldir
+
+ACLTREE_WORKERS = min(8, os.cpu_count() or 1)
+ACLTREE_MAX_OPEN_DIRS = 128  # directories queued for workers (each holds an open file)
+ACLTREE_PROGRESS_INTERVAL = 2  # seconds between job progress updates
+
+
+@dataclass(frozen=True, slots=True)
+class AclTemplate:
+    """
+    Raw ACL xattrs (xattr name -> value) to be written to directories and
+    files. Any other ACL xattr present on a file is removed.
+    """
+    dir: dict[str, bytes]
+    file: dict[str, bytes]
+
+
+@dataclass(frozen=True, slots=True)
+class AclTreeConfig:
+    """
+    Configuration for apply_acl_tree() operation.
+
+    templates: ACLs for entries directly under the root of the tree and ACLs for
+        entries deeper in tree. These differ if the ACL of the root contains entries
+        with NO_PROPAGATE_INHERIT flag.
+
+    uid / gid: new owner of entries. -1 to leave it unchanged.
+
+    traverse: recurse into child datasets
+
+    skip_unchanged: read current ACL and skip writing it if it already matches
+
+    workers: number of threads walking tree and writing ACLs
+
+    job: middleware Job object. This is optional and may be passed if the API user
+        wants to report via job.set_progress
+
+    job_msg_prefix: prefix for progress messages
+    """
+    templates: tuple[AclTemplate, AclTemplate]
+    uid: int = -1
+    gid: int = -1
+    traverse: bool = False
+    skip_unchanged: bool = False
+    workers: int = ACLTREE_WORKERS
+    job: Job | None = None
+    job_msg_prefix: str = ''
+
+
+@dataclass(slots=True)
+class AclTreeStats:
+    dirs: int = 0
+    files: int = 0
+    skipped: int = 0  # entries whose ACL already matched (see skip_unchanged)
+
+
+def _acl_matches(fd: int, xattrs: dict[str, bytes]) -> bool:
+    """ check whether ACL xattrs of the file already are the ones in `xattrs` """
+    if set(listxattr(fd)) & ACL_XATTRS != set(xattrs):
+        return False
+
+    for xat_name, xat_buf in xattrs.items():
+        try:
+            if getxattr(fd, xat_name) != xat_buf:
+                return False
+        except OSError as e:
+            if e.errno != ENODATA:
+                raise
+
+            return False
+
+    return True
+
+
+def _apply_acl(fd: int, xattrs: dict[str, bytes], config: AclTreeConfig) -> bool:
+    """
+    Write ACL and owner to the open file. Returns False if file was skipped
+    because its ACL already matched.
+    """
+    if config.skip_unchanged and _acl_matches(fd, xattrs):
+        if config.uid != -1 or config.gid != -1:
+            fchown(fd, config.uid, config.gid)
+
+        return False
+
+    for xat_name in set(listxattr(fd)) & ACL_XATTRS - set(xattrs):
+        removexattr(fd, xat_name)
+
+    for xat_name, xat_buf in xattrs.items():
+        setxattr(fd, xat_name, xat_buf)
+
+    if config.uid != -1 or config.gid != -1:
+        fchown(fd, config.uid, config.gid)
+
+    return True
+
+
+class _AclTreeContext:
+    """
+    State shared between threads applying ACL to tree.
+
+    Each directory is a unit of work. A thread that finds a subdirectory queues it for
+    other threads if fewer than ACLTREE_MAX_OPEN_DIRS directories are queued and walks
+    it itself otherwise. This keeps all threads busy on wide trees while bounding the
+    number of open files on deep ones.
+    """
+
+    def __init__(self, config: AclTreeConfig, stats: AclTreeStats):
+        self.config = config
+        self.stats = stats
+        self.stats_lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max(config.workers, 1), thread_name_prefix='acltree')
+        self.dir_budget = threading.Semaphore(ACLTREE_MAX_OPEN_DIRS)
+        self.cond = threading.Condition()
+        self.pending = 0
+        self.error = None
+
+    def queue_dir(self, fd: int, path: str, depth: int, mnt_id: int) -> None:
+        with self.cond:
+            self.pending += 1
+
+        self.executor.submit(self.walk_queued, fd, path, depth, mnt_id)
+
+    def walk_queued(self, fd: int, path: str, depth: int, mnt_id: int) -> None:
+        try:
+            if self.error is None:
+                self.walk(fd, path, depth, mnt_id)
+        except Exception as e:
+            with self.cond:
+                if self.error is None:
+                    self.error = e
+        finally:
+            close(fd)
+            self.dir_budget.release()
+            with self.cond:
+                self.pending -= 1
+                self.cond.notify_all()
+
+    def walk(self, fd: int, path: str, depth: int, mnt_id: int) -> None:
+        config = self.config
+        template = config.templates[min(depth, 1)]
+        with DirectoryIterator('.', request_mask=0, dir_fd=fd, as_dict=False) as d_iter:
+            for entry in d_iter:
+                if self.error is not None:
+                    return
+
+                if not config.traverse and entry.stat.stx_mnt_id != mnt_id:
+                    # traversal is disabled and entry is in different filesystem
+                    continue
+
+                entry_path = os.path.join(path, entry.name)
+                match entry.etype:
+                    case StatxEtype.DIRECTORY.name:
+                        if entry.name == '.zfs' and path_in_ctldir(entry_path):
+                            continue
+
+                        # This can fail with OSError and errno set to ELOOP if target was maliciously
+                        # replaced with symlink between our first stat and the open call
+                        entry_fd = os.open(entry.name, O_DIRECTORY | O_NOFOLLOW, dir_fd=d_iter.dir_fd)
+                        try:
+                            applied = _apply_acl(entry_fd, template.dir, config)
+                        except Exception:
+                            close(entry_fd)
+                            raise
+
+                        self.update_stats(dirs=1, skipped=int(not applied))
+                        if self.dir_budget.acquire(blocking=False):
+                            self.queue_dir(entry_fd, entry_path, depth + 1, entry.stat.stx_mnt_id)
+                        else:
+                            try:
+                                self.walk(entry_fd, entry_path, depth + 1, entry.stat.stx_mnt_id)
+                            finally:
+                                close(entry_fd)
+
+                    case StatxEtype.FILE.name:
+                        entry_fd = os.open(entry.name, O_RDONLY | O_NOFOLLOW, dir_fd=d_iter.dir_fd)
+                        try:
+                            applied = _apply_acl(entry_fd, template.file, config)
+                        finally:
+                            close(entry_fd)
+
+                        self.update_stats(files=1, skipped=int(not applied))
+
+                    case _:
+                        # ACLs are not applied to symlinks and special files
+                        continue
+
+    def update_stats(self, dirs: int = 0, files: int = 0, skipped: int = 0) -> None:
+        with self.stats_lock:
+            self.stats.dirs += dirs
+            self.stats.files += files
+            self.stats.skipped += skipped
+
+    def wait(self) -> None:
+        """ wait for tree walk to complete while reporting progress """
+        config = self.config
+        with self.cond:
+            while self.pending:
+                self.cond.wait(ACLTREE_PROGRESS_INTERVAL)
+                if config.job and self.pending:
+                    config.job.set_progress(None, (
+                        f'{config.job_msg_prefix}'
+                        f'Applied ACL to {self.stats.dirs} directories and {self.stats.files} files.'
+                    ))
+
+        self.executor.shutdown(wait=True)
+        if self.error is not None:
+            raise self.error
+
+
+def apply_acl_tree(path: str, config: AclTreeConfig) -> AclTreeStats:
+    """
+    Apply ACL templates and owner to all directories and files below `path`.
+    The ACL and owner of `path` itself are not changed. Child datasets are skipped
+    unless config.traverse is set and ZFS snapshot directory is always skipped.
+
+    Params:
+        path: root of the tree
+        config: configuration parameters
+
+    Returns:
+        AclTreeStats
+
+    Raises:
+        OSError: ELOOP: path was replaced with symbolic link while recursing
+        OSError: EOPNOTSUPP: ACL type of a child dataset is different
+        OSError: <generic>: various reasons listed in syscall manpages
+    """
+    if not os.path.isabs(path):
+        raise ValueError(f'{path}: absolute path is required')
+
+    stats = AclTreeStats()
+
+    fd = os.open(path, O_DIRECTORY)
+    try:
+        mnt_id = statx('', dir_fd=fd, flags=ATFlags.EMPTY_PATH.value).stx_mnt_id
+    except Exception:
+        close(fd)
+        raise
+
+    ctx = _AclTreeContext(config, stats)
+    ctx.dir_budget.acquire()
+    ctx.queue_dir(fd, path, 0, mnt_id)
+    ctx.wait()
+
+    if config.job:
+        config.job.set_progress(None, (
+            f'{config.job_msg_prefix}'
+            f'Applied ACL to {stats.dirs} directories and {stats.files} files '
+            f'({stats.skipped} already up to date).'
+        ))
+
+    return stats
@@ -2,8 +2,11 @@
 # test coverage provided by pytest/unit/utils/test_copytree.py
 
 import enum
+import json
 import os
+import threading
 
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from errno import EXDEV
 from middlewared.job import Job
@@ -48,6 +51,10 @@ from .utils import path_in_ctldir, timespec_convert_int
 
 CLONETREE_ROOT_DEPTH = 0
 MAX_RW_SZ = 2147483647 & ~4096  # maximum size of read/write in kernel
+COPYTREE_WORKERS = min(8, os.cpu_count() or 1)
+COPYTREE_MAX_OPEN_FDS = 256  # budget of file descriptors held by in-flight file copies
+COPYTREE_BATCH_FILES = 64  # maximum number of files handed to a worker at once
+COPYTREE_BATCH_BYTES = 64 * 1024 * 1024  # flush batch to worker once it contains this much data
 
 
 class CopyFlags(enum.IntFlag):
@@ -97,6 +104,17 @@ class CopyTreeConfig:
     op: copy tree operation that will be performed (see CopyTreeOp class)
 
     flags: bitmask of metadata to preserve as part of copy
+
+    workers: number of threads copying file data and metadata. The directory tree
+        is walked by the calling thread. A value of 1 performs the copy serially.
+
+    max_open_fds: maximum number of file descriptors held open by file copies
+        that have been queued but not yet completed (two per file).
+
+    checkpoint: optional path of a file used to record directories whose files
+        have been completely copied. If the copy fails, running it again with the
+        same checkpoint resumes it by skipping files in these directories. The
+        checkpoint file is removed once the copy completes successfully.
     """
     job: Job | None = None
     job_msg_prefix: str = ''
@@ -106,6 +124,9 @@ class CopyTreeConfig:
     traverse: bool = False
     op: CopyTreeOp = CopyTreeOp.DEFAULT
     flags: CopyFlags = DEF_CP_FLAGS  # flags specifying which metadata to copy
+    workers: int = COPYTREE_WORKERS
+    max_open_fds: int = COPYTREE_MAX_OPEN_FDS
+    checkpoint: str | None = None
 
 
 @dataclass(slots=True)
@@ -114,6 +135,7 @@ class CopyTreeStats:
     files: int = 0
     symlinks: int = 0
     bytes: int = 0
+    skipped_dirs: int = 0  # directories whose files were skipped due to checkpoint
 
 
 def _copytree_conf_to_dir_request_mask(config: CopyTreeConfig) -> DirectoryRequestMask:
@@ -300,9 +322,8 @@ def _do_mkfile(
     src_fd: int,
     dst_fd: int,
     config: CopyTreeConfig,
-    stats: CopyTreeStats,
     c_fn: callable
-) -> None:
+) -> int:
     """ Perform copy / clone of file, possibly preserving metadata.
 
     Params:
@@ -310,11 +331,10 @@ def _do_mkfile(
         src_fd: handle of file being copied
         dst_fd: handle of target file
         config: configuration of the copy operation
-        stats: counters to be update with bytes written
         c_fn: the copy / clone function to use for writing data to the destination
 
     Returns:
-        None
+        int: bytes written
 
     Raises:
         OSError
@@ -339,7 +359,7 @@ def _do_mkfile(
     if config.flags.value & CopyFlags.OWNER.value:
         fchown(dst_fd, src.stat.stx_uid, src.stat.stx_gid)
 
-    stats.bytes += c_fn(src_fd, dst_fd)
+    written = c_fn(src_fd, dst_fd)
 
     # We need to write timestamps after file data to ensure reset atime / mtime
     if config.flags.value & CopyFlags.TIMESTAMPS.value:
@@ -353,6 +373,8 @@ def _do_mkfile(
             if config.raise_error:
                 raise
 
+    return written
+
 
 def _do_mkdir(
     src: dirent_struct,
@@ -402,14 +424,201 @@ def _do_mkdir(
     return new_dir_hdl
 
 
+def _copy_fn(op: CopyTreeOp) -> callable:
+    """ internal method to convert CopyTreeOp to the function used to write file data """
+    match op:
+        case CopyTreeOp.DEFAULT:
+            return clone_or_copy_file
+        case CopyTreeOp.CLONE:
+            return clone_file
+        case CopyTreeOp.SENDFILE:
+            return copy_sendfile
+        case CopyTreeOp.USERSPACE:
+            return copy_file_userspace
+        case _:
+            raise ValueError(f'{op}: unexpected copy operation')
+
+
+class _CopyTreeDir:
+    """ files of a directory that are still being copied by workers """
+    __slots__ = ('relpath', 'pending', 'walked')
+
+    def __init__(self, relpath: str):
+        self.relpath = relpath
+        self.pending = 0
+        self.walked = False
+
+
+class _CopyTreeContext:
+    """
+    State shared between the thread walking the source tree and the worker threads
+    copying files.
+
+    The walker opens source and destination files and queues them in batches. Workers
+    copy data and metadata of a batch and close its file descriptors. The number of
+    queued files is bounded by `fd_budget` so that the walker blocks instead of
+    exhausting file descriptors on trees with millions of small files.
+    """
+
+    def __init__(self, config: CopyTreeConfig, stats: CopyTreeStats, target_st: stat_result):
+        self.config = config
+        self.stats = stats
+        self.target_st = target_st
+        self.c_fn = _copy_fn(config.op)
+        self.lock = threading.Lock()
+        self.fd_budget = threading.Semaphore(max(config.max_open_fds // 2, 1))
+        self.executor = None
+        if config.workers > 1:
+            self.executor = ThreadPoolExecutor(config.workers, thread_name_prefix='copytree')
+
+        self.batch = []
+        self.batch_bytes = 0
+        self.error = None
+        self.next_progress = config.job_msg_inc
+        self.checkpoint = set()
+        self.checkpoint_file = None
+
+    def open_checkpoint(self) -> None:
+        try:
+            with open(self.config.checkpoint) as f:
+                self.checkpoint = {json.loads(line) for line in f if line.endswith('\n')}
+        except FileNotFoundError:
+            pass
+
+        if self.checkpoint and not self.config.exist_ok:
+            raise ValueError(f'{self.config.checkpoint}: resuming copy from checkpoint requires exist_ok')
+
+        self.checkpoint_file = open(self.config.checkpoint, 'a')
+
+    def dir_done(self, cdir: _CopyTreeDir) -> None:
+        """ record directory in checkpoint file. Must be called with lock held. """
+        if self.checkpoint_file is not None and self.error is None:
+            self.checkpoint_file.write(json.dumps(cdir.relpath) + '\n')
+            self.checkpoint_file.flush()
+
+    def walk_done(self, cdir: _CopyTreeDir) -> None:
+        with self.lock:
+            cdir.walked = True
+            if cdir.pending == 0:
+                self.dir_done(cdir)
+
+    def check_error(self) -> None:
+        if self.error is not None:
+            raise self.error
+
+    def queue_file(self, entry: dirent_struct, src_dir_fd: int, dst_dir_fd: int, cdir: _CopyTreeDir) -> None:
+        if not self.fd_budget.acquire(blocking=False):
+            # Our queued files hold all of the budget. Hand them over to workers before
+            # waiting for some of them to complete.
+            self.flush()
+            self.fd_budget.acquire()
+            self.check_error()
+
+        try:
+            src_fd = posix_open(entry.name, O_RDONLY | O_NOFOLLOW, dir_fd=src_dir_fd)
+            try:
+                flags = O_RDWR | O_NOFOLLOW | O_CREAT | O_TRUNC
+                if not self.config.exist_ok:
+                    flags |= O_EXCL
+
+                dst_fd = posix_open(entry.name, flags, dir_fd=dst_dir_fd)
+            except Exception:
+                close(src_fd)
+                raise
+        except Exception:
+            self.fd_budget.release()
+            raise
+
+        with self.lock:
+            cdir.pending += 1
+
+        self.batch.append((entry, src_fd, dst_fd, cdir))
+        self.batch_bytes += entry.stat.stx_size
+        if len(self.batch) >= COPYTREE_BATCH_FILES or self.batch_bytes >= COPYTREE_BATCH_BYTES:
+            self.flush()
+
+    def flush(self) -> None:
+        batch = self.batch
+        if not batch:
+            return
+
+        self.batch = []
+        self.batch_bytes = 0
+        if self.executor is None:
+            self.copy_batch(batch)
+            self.check_error()
+        else:
+            self.executor.submit(self.copy_batch, batch)
+
+    def copy_batch(self, batch: list) -> None:
+        for entry, src_fd, dst_fd, cdir in batch:
+            try:
+                if self.error is None:
+                    written = _do_mkfile(entry, src_fd, dst_fd, self.config, self.c_fn)
+                    with self.lock:
+                        self.stats.files += 1
+                        self.stats.bytes += written
+                        cdir.pending -= 1
+                        if cdir.walked and cdir.pending == 0:
+                            self.dir_done(cdir)
+            except Exception as e:
+                with self.lock:
+                    if self.error is None:
+                        self.error = e
+            finally:
+                close(dst_fd)
+                close(src_fd)
+                self.fd_budget.release()
+
+    def report_progress(self) -> None:
+        if not self.config.job or self.stats.dirs + self.stats.files < self.next_progress:
+            return
+
+        self.next_progress = self.stats.dirs + self.stats.files + self.config.job_msg_inc
+        self.config.job.set_progress(100, (
+            f'{self.config.job_msg_prefix}'
+            f'Copied {self.stats.dirs} directories, {self.stats.files} files '
+            f'({self.stats.bytes} bytes of data).'
+        ))
+
+    def wait(self) -> None:
+        """ wait for all queued files to be copied and raise first error that workers encountered """
+        self.flush()
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+
+        self.check_error()
+
+    def close(self) -> None:
+        """ release all resources. Any files that are still queued are not copied. """
+        if self.batch or self.executor is not None:
+            # stop workers from copying remaining queued files
+            with self.lock:
+                if self.error is None:
+                    self.error = RuntimeError('copy aborted')
+
+        for entry, src_fd, dst_fd, cdir in self.batch:
+            close(dst_fd)
+            close(src_fd)
+
+        self.batch = []
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+
+        if self.checkpoint_file is not None:
+            self.checkpoint_file.close()
+            self.checkpoint_file = None
+
+
 def _copytree_impl(
     d_iter: DirectoryIterator,
     dst_str: str,
     dst_fd: int,
     depth: int,
-    config: CopyTreeConfig,
-    target_st: stat_result,
-    stats: CopyTreeStats
+    ctx: _CopyTreeContext,
+    relpath: str
 ):
     """ internal implementation of our copytree method
 
@@ -417,15 +626,17 @@ def _copytree_impl(
     This means additional O_DIRECTORY open for duration of life of each DirectoryIterator
     object (closed when DirectoryIterator context manager exits).
 
+    Files are not copied here but queued in `ctx` for worker threads.
+
     Params:
         d_iter: directory iterator for current directory
         dst_str: target directory of copy
         dst_fd: open file handle for target directory
         depth: current depth in src directory tree
-        config: CopyTreeConfig - used to determine what to copy
-        target_st: stat_result of target directory for initial copy. This is used
-            to provide device + inode number so that we can avoid copying destination into
-            itself.
+        ctx: copy state shared with workers. ctx.config is used to determine what to
+            copy and ctx.target_st provides device + inode number of target directory
+            so that we can avoid copying destination into itself.
+        relpath: path of current directory relative to root of copy
 
     Returns:
         None
@@ -434,20 +645,18 @@ def _copytree_impl(
         OSError
         PermissionError
     """
+    config = ctx.config
+    target_st = ctx.target_st
+    stats = ctx.stats
+    resumed = relpath in ctx.checkpoint
+    if resumed:
+        stats.skipped_dirs += 1
 
-    match config.op:
-        case CopyTreeOp.DEFAULT:
-            c_fn = clone_or_copy_file
-        case CopyTreeOp.CLONE:
-            c_fn = clone_file
-        case CopyTreeOp.SENDFILE:
-            c_fn = copy_sendfile
-        case CopyTreeOp.USERSPACE:
-            c_fn = copy_file_userspace
-        case _:
-            raise ValueError(f'{config.op}: unexpected copy operation')
+    cdir = _CopyTreeDir(relpath)
 
     for entry in d_iter:
+        ctx.check_error()
+
         # We match on `etype` key because our statx wrapper will initially lstat a file
         # and if it's a symlink, perform a stat call to get information from symlink target
         # This means that S_ISLNK on mode will fail to detect whether it's a symlink.
@@ -497,11 +706,12 @@ def _copytree_impl(
                             path.join(dst_str, entry.name),
                             new_dst_fd,
                             depth + 1,
-                            config,
-                            target_st,
-                            stats
+                            ctx,
+                            path.join(relpath, entry.name)
                         )
 
+                    # Directory timestamps may be set while workers are still copying its files
+                    # since only creating the files (done by this thread) changes them.
                     if config.flags.value & CopyFlags.TIMESTAMPS.value:
                         ns_ts = (
                             timespec_convert_int(entry.stat.stx_atime),
@@ -520,23 +730,15 @@ def _copytree_impl(
                 stats.dirs += 1
 
             case StatxEtype.FILE.name:
-                entry_fd = posix_open(entry.name, O_RDONLY | O_NOFOLLOW, dir_fd=d_iter.dir_fd)
-                try:
-                    flags = O_RDWR | O_NOFOLLOW | O_CREAT | O_TRUNC
-                    if not config.exist_ok:
-                        flags |= O_EXCL
+                if resumed:
+                    continue
 
-                    dst = posix_open(entry.name, flags, dir_fd=dst_fd)
-                    try:
-                        _do_mkfile(entry, entry_fd, dst, config, stats, c_fn)
-                    finally:
-                        close(dst)
-                finally:
-                    close(entry_fd)
-
-                stats.files += 1
+                ctx.queue_file(entry, d_iter.dir_fd, dst_fd, cdir)
 
             case StatxEtype.SYMLINK.name:
+                if resumed:
+                    continue
+
                 stats.symlinks += 1
                 dst = readlink(entry.name, dir_fd=d_iter.dir_fd)
                 try:
@@ -550,11 +752,10 @@ def _copytree_impl(
             case _:
                 continue
 
-        if config.job and ((stats.dirs + stats.files) % config.job_msg_inc) == 0:
-            config.job.set_progress(100, (
-                f'{config.job_msg_prefix}'
-                f'Copied {entry.path} -> {os.path.join(dst_str, entry.name)}.'
-            ))
+        ctx.report_progress()
+
+    if not resumed:
+        ctx.walk_done(cdir)
 
 
 def copytree(
@@ -568,6 +769,9 @@ def copytree(
     metadata to preserve in the copy. This method also has protection against copying
     the zfs snapshot directory if for some reason the user has set it to visible.
 
+    The source tree is walked by the calling thread while file data and metadata are
+    copied by a pool of `config.workers` threads.
+
     Params:
         src: the source directory
         dst: the destination directory
@@ -585,6 +789,7 @@ def copytree(
         OSError: <generic>: various reasons listed in syscall manpages
         PermissionError:
             Attempt to chmod on destination failed due to RESTRICTED aclmode on dataset.
+        ValueError: checkpoint exists, but exist_ok is not set
 
     """
     for p in (src, dst):
@@ -603,34 +808,46 @@ def copytree(
     stats = CopyTreeStats()
 
     try:
-        with DirectoryIterator(src, request_mask=int(dir_request_mask), as_dict=False) as d_iter:
-            _copytree_impl(d_iter, dst, dst_fd, CLONETREE_ROOT_DEPTH, config, fstat(dst_fd), stats)
+        ctx = _CopyTreeContext(config, stats, fstat(dst_fd))
+        try:
+            if config.checkpoint:
+                ctx.open_checkpoint()
 
-            # Ensure that root level directory also gets metadata copied
-            try:
-                xattrs = listxattr(d_iter.dir_fd)
-                if config.flags.value & CopyFlags.PERMISSIONS.value:
-                    copy_permissions(d_iter.dir_fd, dst_fd, xattrs, d_iter.stat.stx_mode)
-
-                if config.flags.value & CopyFlags.XATTRS.value:
-                    copy_xattrs(d_iter.dir_fd, dst_fd, xattrs)
-
-                if config.flags.value & CopyFlags.OWNER.value:
-                    fchown(dst_fd, d_iter.stat.stx_uid, d_iter.stat.stx_gid)
-
-                if config.flags.value & CopyFlags.TIMESTAMPS.value:
-                    ns_ts = (
-                        timespec_convert_int(d_iter.stat.stx_atime),
-                        timespec_convert_int(d_iter.stat.stx_mtime)
-                    )
-                    utime(dst_fd, ns=ns_ts)
-            except Exception:
-                if config.raise_error:
-                    raise
+            with DirectoryIterator(src, request_mask=int(dir_request_mask), as_dict=False) as d_iter:
+                _copytree_impl(d_iter, dst, dst_fd, CLONETREE_ROOT_DEPTH, ctx, '')
+                ctx.wait()
+
+                # Ensure that root level directory also gets metadata copied
+                try:
+                    xattrs = listxattr(d_iter.dir_fd)
+                    if config.flags.value & CopyFlags.PERMISSIONS.value:
+                        copy_permissions(d_iter.dir_fd, dst_fd, xattrs, d_iter.stat.stx_mode)
+
+                    if config.flags.value & CopyFlags.XATTRS.value:
+                        copy_xattrs(d_iter.dir_fd, dst_fd, xattrs)
+
+                    if config.flags.value & CopyFlags.OWNER.value:
+                        fchown(dst_fd, d_iter.stat.stx_uid, d_iter.stat.stx_gid)
+
+                    if config.flags.value & CopyFlags.TIMESTAMPS.value:
+                        ns_ts = (
+                            timespec_convert_int(d_iter.stat.stx_atime),
+                            timespec_convert_int(d_iter.stat.stx_mtime)
+                        )
+                        utime(dst_fd, ns=ns_ts)
+                except Exception:
+                    if config.raise_error:
+                        raise
+
+        finally:
+            ctx.close()
 
     finally:
         close(dst_fd)
 
+    if config.checkpoint:
+        os.unlink(config.checkpoint)
+
     if config.job:
         config.job.set_progress(100, (
             f'{config.job_msg_prefix}'
@@ -0,0 +1,154 @@
+import os
+import random
+import time
+
+# Tasks that run on start are spread over this many seconds (or their interval, whichever is shorter) so that they
+# do not all fire at once right after boot
+PERIODIC_STARTUP_STAGGER = 120
+# Each interval is randomly shortened or lengthened by up to this fraction to keep tasks from aligning over time
+PERIODIC_JITTER = 0.1
+# When the 1 minute load average per CPU is above this threshold, a run is postponed by `PERIODIC_LOAD_DEFERRAL`
+# seconds. A run is never postponed by more than half of the task's interval in total.
+PERIODIC_LOAD_THRESHOLD = 2.0
+PERIODIC_LOAD_DEFERRAL = 30
+
+
+class PeriodicTask:
+    """
+    A `@periodic` method along with its scheduling state and run statistics.
+    """
+
+    __slots__ = ('name', 'serviceobj', 'method', 'interval', 'run_on_start', 'handle', 'next_run_at', 'deferred_for',
+                 'running', 'runs', 'skipped', 'deferred', 'failed', 'runtime_last', 'runtime_total', 'runtime_max')
+
+    def __init__(self, name, serviceobj, method):
+        self.name = name
+        self.serviceobj = serviceobj
+        self.method = method
+        self.interval = method._periodic.interval
+        self.run_on_start = method._periodic.run_on_start
+        self.handle = None
+        self.next_run_at = None
+        self.deferred_for = 0
+        self.running = False
+        self.runs = 0
+        self.skipped = 0
+        self.deferred = 0
+        self.failed = 0
+        self.runtime_last = 0.0
+        self.runtime_total = 0.0
+        self.runtime_max = 0.0
+
+    def finish(self, runtime):
+        self.running = False
+        self.runs += 1
+        self.runtime_last = runtime
+        self.runtime_total += runtime
+        self.runtime_max = max(self.runtime_max, runtime)
+
+    def __encode__(self):
+        return {
+            'interval': self.interval,
+            'running': self.running,
+            'next_run_in': None if self.next_run_at is None else max(self.next_run_at - time.monotonic(), 0.0),
+            'runs': self.runs,
+            'skipped': self.skipped,
+            'deferred': self.deferred,
+            'failed': self.failed,
+            'runtime_last': self.runtime_last,
+            'runtime_avg': self.runtime_total / self.runs if self.runs else 0.0,
+            'runtime_max': self.runtime_max,
+        }
+
+
+class PeriodicTaskScheduler:
+    """
+    Runs `@periodic` service methods.
+
+    Runs are scheduled at a fixed rate (with jitter) rather than an interval after the previous run finished. If the
+    previous run (or the job it started) is still running when the next one is due, the next one is skipped. Methods
+    are called the same way API calls are, so `@threaded` and service `thread_pool` select the executor they run in.
+    """
+
+    def __init__(self, middleware):
+        self.middleware = middleware
+        self.tasks = {}
+        self.started = False
+
+    def add(self, name, serviceobj, method):
+        self.tasks[name] = PeriodicTask(name, serviceobj, method)
+
+    def start(self):
+        """
+        Schedule all tasks. Can be called from any thread.
+        """
+        self.middleware.loop.call_soon_threadsafe(self._start)
+
+    def get_stats(self):
+        return {name: task.__encode__() for name, task in self.tasks.items()}
+
+    def _start(self):
+        if self.started:
+            return
+
+        self.started = True
+        for task in self.tasks.values():
+            if task.run_on_start:
+                delay = random.uniform(0, min(PERIODIC_STARTUP_STAGGER, task.interval))
+            else:
+                delay = self._jitter(task.interval)
+
+            self.middleware.logger.debug(
+                'Setting up periodic task %s to run every %d seconds', task.name, task.interval
+            )
+            self._schedule(task, delay)
+
+    def _jitter(self, interval):
+        return interval * random.uniform(1 - PERIODIC_JITTER, 1 + PERIODIC_JITTER)
+
+    def _schedule(self, task, delay):
+        task.next_run_at = time.monotonic() + delay
+        task.handle = self.middleware.loop.call_later(delay, self._fire, task)
+
+    def _fire(self, task):
+        if task.running:
+            self.middleware.logger.debug(
+                'Skipping periodic task %s as its previous run is still in progress', task.name
+            )
+            task.skipped += 1
+            task.deferred_for = 0
+            self._schedule(task, self._jitter(task.interval))
+            return
+
+        if task.deferred_for + PERIODIC_LOAD_DEFERRAL <= task.interval / 2 and self._overloaded():
+            self.middleware.logger.debug('Postponing periodic task %s due to high system load', task.name)
+            task.deferred += 1
+            task.deferred_for += PERIODIC_LOAD_DEFERRAL
+            self._schedule(task, PERIODIC_LOAD_DEFERRAL)
+            return
+
+        # The next run is due an interval after this one was originally scheduled to start
+        delay = max(self._jitter(task.interval) - task.deferred_for, 0)
+        task.deferred_for = 0
+        task.running = True
+        self._schedule(task, delay)
+        self.middleware.create_task(self._run(task), name=f'periodic:{task.name}')
+
+    def _overloaded(self):
+        try:
+            return os.getloadavg()[0] / (os.cpu_count() or 1) > PERIODIC_LOAD_THRESHOLD
+        except OSError:
+            return False
+
+    async def _run(self, task):
+        self.middleware.logger.trace('Calling periodic task %s', task.name)
+        started_at = time.monotonic()
+        try:
+            result = await self.middleware._call(task.name, task.serviceobj, task.method, [])
+            if getattr(task.method, '_job', None):
+                await result.wait(raise_error=True)
+        except Exception:
+            task.failed += 1
+            self.middleware.logger.warning('Exception while calling periodic task %s', task.name, exc_info=True)
+        finally:
+            task.finish(time.monotonic() - started_at)
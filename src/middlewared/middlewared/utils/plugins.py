@@ -1,3 +1,4 @@
+import asyncio
 import functools
 import importlib
 import inspect
@@ -5,8 +6,12 @@ import itertools
 import logging
 import os
 import sys
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Callable
 
-from middlewared.schema import Schemas
+from middlewared.schema import Dict, List, OROperator, Patch, Ref, Schemas
 
 logger = logging.getLogger(__name__)
 
@@ -53,6 +58,191 @@ def load_classes(module, base, blacklist):
     return classes
 
 
+def _schema_names(schema_objs, refs, registered):
+    """
+    Collect names of schemas referenced (`refs`) and registered (`registered`) by unresolved method schemas.
+    """
+    for obj in schema_objs:
+        if isinstance(obj, (Patch, Ref)):
+            refs.add(obj.schema_name)
+        if getattr(obj, 'register', False):
+            registered.add(obj.name)
+
+        if isinstance(obj, Dict):
+            _schema_names(obj.attrs.values(), refs, registered)
+        elif isinstance(obj, List):
+            _schema_names(obj.items, refs, registered)
+        elif isinstance(obj, OROperator):
+            _schema_names(obj.schemas, refs, registered)
+
+
+def process_pool_modules(services):
+    """
+    Names of plugin modules that process pool workers have to import: modules that define (parts of)
+    services with `process_pool` enabled and modules with services registering schemas that these
+    reference.
+
+    Must be called before method schemas are resolved.
+    """
+    refs = defaultdict(set)
+    providers = defaultdict(set)
+    needed = set()
+    for service in services:
+        for part in getattr(service, 'parts', [service]):
+            module = part.__class__.__module__
+            if service._config.process_pool:
+                needed.add(module)
+
+            registered = set()
+            for attr in dir(part):
+                method = getattr(part, attr)
+                if not callable(method):
+                    continue
+
+                for key in ('accepts', 'returns'):
+                    if isinstance(schema_objs := getattr(method, key, None), list):
+                        _schema_names(schema_objs, refs[module], registered)
+
+            for name in registered:
+                providers[name].add(module)
+
+    queue = list(needed)
+    while queue:
+        for name in refs[queue.pop()]:
+            if providers[name] and not providers[name] & needed:
+                provider = min(providers[name])
+                needed.add(provider)
+                queue.append(provider)
+
+    return sorted(needed)
+
+
+@dataclass(slots=True)
+class PluginSetup:
+    name: str
+    func: Callable
+    depends: list[str] = field(default_factory=list)
+    declared: bool = False  # plugin declared its dependencies via SETUP_DEPENDS
+    started_at: float | None = None
+    finished_at: float | None = None
+
+
+def plugin_setup_graph(setup_funcs, bootstrap):
+    """
+    Determine order of setup of plugins.
+
+    `setup_funcs` is a list of (plugin name, setup function, SETUP_DEPENDS of the plugin module or None).
+
+    Plugins in `bootstrap` are set up first, one after another in the given order. Plugins may declare
+    names of other plugins whose setup must complete before their own by defining module-level
+    `SETUP_DEPENDS` list. Setup of these plugins runs concurrently with other setups as soon as their
+    dependencies and all of `bootstrap` complete. Plugins that do not declare dependencies are set up
+    one after another in the order in which they were loaded.
+    """
+    def sort_key(setup_func):
+        try:
+            return bootstrap.index(setup_func[0])
+        except ValueError:
+            return len(bootstrap)
+
+    setups = []
+    names = {setup_func[0] for setup_func in setup_funcs}
+    bootstrap_names = [name for name in bootstrap if name in names]
+    previous = None
+    for name, func, depends in sorted(setup_funcs, key=sort_key):
+        if depends is None or name in bootstrap:
+            setups.append(PluginSetup(name, func, [previous] if previous else []))
+            previous = name
+            continue
+
+        for dependency in depends:
+            if dependency not in names:
+                logger.warning('Plugin %r depends on plugin %r that has no setup function', name, dependency)
+
+        setups.append(PluginSetup(name, func, list(dict.fromkeys(
+            bootstrap_names + [dependency for dependency in depends if dependency in names]
+        )), True))
+
+    # Make sure that declared dependencies do not contain a cycle
+    remaining = {setup.name: set(setup.depends) for setup in setups}
+    while remaining:
+        ready = [name for name, depends in remaining.items() if not depends & remaining.keys()]
+        if not ready:
+            raise ValueError(f'Circular setup dependencies between plugins: {", ".join(sorted(remaining))}')
+
+        for name in ready:
+            remaining.pop(name)
+
+    return setups
+
+
+async def run_plugin_setups(middleware, setups, on_setup_begin=None):
+    """
+    Run setup functions of plugins (see `plugin_setup_graph`) recording when each one started and finished.
+    """
+    done = {setup.name: asyncio.Event() for setup in setups}
+
+    async def run(setup):
+        for dependency in setup.depends:
+            await done[dependency].wait()
+
+        if on_setup_begin:
+            on_setup_begin(setup)
+
+        setup.started_at = time.monotonic()
+        call = setup.func(middleware)
+        # Allow setup to be a coroutine
+        if asyncio.iscoroutinefunction(setup.func):
+            await call
+
+        setup.finished_at = time.monotonic()
+        done[setup.name].set()
+
+    tasks = [asyncio.create_task(run(setup), name=f'setup:{setup.name}') for setup in setups]
+    try:
+        finished, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        for task in finished:
+            if exc := task.exception():
+                raise exc
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def plugin_setup_profile(setups, started_at):
+    """
+    Timeline of setup of plugins relative to `started_at` along with the chain of setups that
+    determined when the last one finished (i.e. the setups that held up the boot).
+    """
+    by_name = {setup.name: setup for setup in setups}
+    plugins = []
+    for setup in sorted(setups, key=lambda s: (s.started_at is None, s.started_at or 0)):
+        plugins.append({
+            'name': setup.name,
+            'depends': setup.depends,
+            'declared': setup.declared,
+            'started': None if setup.started_at is None else setup.started_at - started_at,
+            'finished': None if setup.finished_at is None else setup.finished_at - started_at,
+            'duration': None if setup.finished_at is None else setup.finished_at - setup.started_at,
+        })
+
+    critical_path = []
+    finished = [setup for setup in setups if setup.finished_at is not None]
+    setup = max(finished, key=lambda s: s.finished_at, default=None)
+    while setup is not None:
+        critical_path.insert(0, setup.name)
+        setup = max(
+            (by_name[name] for name in setup.depends if by_name[name].finished_at is not None),
+            key=lambda s: s.finished_at, default=None,
+        )
+
+    return {
+        'total': max((setup.finished_at - started_at for setup in finished), default=0),
+        'plugins': plugins,
+        'critical_path': critical_path,
+    }
+
+
 class SchemasMixin:
     def __init__(self):
         self._schemas = Schemas()
@@ -92,15 +282,24 @@ class LoadPluginsMixin(SchemasMixin):
         self._services_aliases = {}
         super().__init__()
 
-    def _load_plugins(self, on_module_begin=None, on_module_end=None, on_modules_loaded=None):
+    def _load_plugins(self, on_module_begin=None, on_module_end=None, on_modules_loaded=None, modules=None):
+        """
+        Load services from all plugins or, if `modules` (a list of module names) is given, only from these
+        plugin modules.
+        """
         from middlewared.service import Service, CompoundService, ABSTRACT_SERVICES
 
         services = []
-        plugins_dir = os.path.realpath(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'plugins'))
-        if not os.path.exists(plugins_dir):
-            raise ValueError(f'plugins dir not found: {plugins_dir}')
+        if modules is None:
+            plugins_dir = os.path.realpath(os.path.join(os.path.dirname(os.path.realpath(__file__)), '..', 'plugins'))
+            if not os.path.exists(plugins_dir):
+                raise ValueError(f'plugins dir not found: {plugins_dir}')
+
+            modules = load_modules(plugins_dir, depth=1)
+        else:
+            modules = map(importlib.import_module, modules)
 
-        for mod in load_modules(plugins_dir, depth=1):
+        for mod in modules:
             if on_module_begin:
                 on_module_begin(mod)
 
@@ -239,6 +239,15 @@ class TDBHandle:
             else:
                 yield tdb_val
 
+    def count(self) -> int:
+        """
+        Count entries in TDB file without retrieving their values
+
+        Raises:
+            RuntimeError
+        """
+        return sum(1 for key in self.hdl.keys())
+
     def batch_op(self, ops: list[TDBBatchOperation]) -> dict:
         """
         Perform a list of operations under a transaction lock so that
@@ -298,6 +307,14 @@ class TDBHandle:
                 tdb_flags = tdb.DEFAULT
                 open_flags = os.O_RDWR
                 open_mode = 0o600
+            case 'smbXsrv_session_global.tdb' | 'smbXsrv_tcon_global.tdb':
+                # Volatile smbd databases. See smbXsrv_session_global_init() in
+                # source3/smbd/smbXsrv_session.c in Samba. These are owned by smbd
+                # and so we never create them or write to them. smbd truncates them
+                # in place on start, so handles should not be cached in TDB_HANDLES.
+                tdb_flags = tdb.INCOMPATIBLE_HASH | MUTEX_LOCKING
+                open_flags = os.O_RDWR
+                open_mode = 0o600
             case 'group_mapping.tdb' | 'group_mapping_rejects.tdb' | 'passdb.tdb':
                 tdb_flags = tdb.DEFAULT
                 open_flags = os.O_RDWR
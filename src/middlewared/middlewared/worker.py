@@ -7,6 +7,7 @@ from truenas_api_client import Client
 
 from . import logger
 from .common.environ import environ_update
+from .service_exception import CallError
 from .utils import MIDDLEWARE_RUN_DIR
 from .utils.plugins import LoadPluginsMixin
 from .utils.prctl import die_with_parent
@@ -49,7 +50,14 @@ class FakeMiddleware(LoadPluginsMixin, ServiceCallMixin):
         """
         Calls a method using middleware client
         """
-        serviceobj, methodobj = self.get_method(method)
+        try:
+            serviceobj, methodobj = self.get_method(method)
+        except CallError as e:
+            if e.errno != CallError.ENOMETHOD:
+                raise
+
+            # Worker only loads plugins providing process pool services, the rest live in the main process
+            return self.client.call(method, *params, timeout=timeout, **kwargs)
 
         if serviceobj._config.process_pool and not hasattr(method, '_job'):
             if asyncio.iscoroutinefunction(methodobj):
@@ -126,11 +134,24 @@ def receive_events():
     environ_update(c.call('core.environ'))
 
 
-def worker_init(debug_level, log_handler):
+def worker_init(debug_level, log_handler, modules=None):
+    """
+    `modules` is a list of plugin modules providing process pool services (see `process_pool_modules`).
+    If it is not specified, all plugins are loaded.
+    """
     global MIDDLEWARE
     MIDDLEWARE = FakeMiddleware()
     os.environ['MIDDLEWARED_LOADING'] = 'True'
-    MIDDLEWARE._load_plugins()
+    try:
+        MIDDLEWARE._load_plugins(modules=modules)
+    except Exception:
+        if modules is None:
+            raise
+
+        MIDDLEWARE.logger.warning('Failed to load process pool plugins %r, loading all plugins', modules,
+                                  exc_info=True)
+        MIDDLEWARE = FakeMiddleware()
+        MIDDLEWARE._load_plugins()
     os.environ['MIDDLEWARED_LOADING'] = 'False'
     setproctitle.setproctitle('middlewared (worker)')
     die_with_parent()
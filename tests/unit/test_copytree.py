@@ -3,6 +3,7 @@ import gc
 import os
 import pytest
 import random
+import shutil
 import stat
 
 from middlewared.utils.filesystem import copy
@@ -381,6 +382,61 @@ def test__force_userspace_copy(directory_for_test, fd_count):
     assert get_fd_count() == fd_count
 
 
+@pytest.mark.parametrize('workers,max_open_fds', [(1, 2), (4, 2), (4, 256)])
+def test__copytree_workers(directory_for_test, fd_count, workers, max_open_fds):
+    """ check that parallel copy with various file descriptor budgets produces same tree """
+
+    src = os.path.join(directory_for_test, 'SOURCE')
+    dst = os.path.join(directory_for_test, 'DEST')
+    config = copy.CopyTreeConfig(workers=workers, max_open_fds=max_open_fds)
+
+    stats = copy.copytree(src, dst, config)
+
+    validate_copy_tree(src, dst, config.flags)
+    assert stats.files == len(TEST_FILES) * (len(TEST_DIRS) + 1)
+    assert stats.bytes == stats.files * TEST_FILE_DATASZ
+    assert stats.dirs == len(TEST_DIRS)
+
+    assert get_fd_count() == fd_count
+
+
+@pytest.mark.parametrize('workers', [1, 4])
+def test__copytree_resume_checkpoint(directory_for_test, fd_count, workers):
+    """ check that failed copy can be resumed from checkpoint """
+
+    src = os.path.join(directory_for_test, 'SOURCE')
+    dst = os.path.join(directory_for_test, 'DEST')
+    checkpoint = os.path.join(directory_for_test, 'CHECKPOINT')
+    config = copy.CopyTreeConfig(workers=workers, checkpoint=checkpoint)
+
+    with patch(
+        'middlewared.utils.filesystem.copy.clone_or_copy_file', Mock(
+            side_effect=OSError(errno.EIO, 'MOCK')
+        )
+    ):
+        with pytest.raises(OSError, match='MOCK'):
+            copy.copytree(src, dst, config)
+
+    assert os.path.exists(checkpoint)
+    assert get_fd_count() == fd_count
+
+    # pretend that files in first directory were copied by the failed attempt
+    shutil.rmtree(dst)
+    os.mkdir(dst)
+    with open(checkpoint, 'w') as f:
+        f.write(f'"{TEST_DIRS[0]}"\n')
+
+    stats = copy.copytree(src, dst, config)
+
+    assert stats.skipped_dirs == 1
+    assert stats.files == len(TEST_FILES) * len(TEST_DIRS)
+    assert os.listdir(os.path.join(dst, TEST_DIRS[0])) == []
+    validate_copy_tree(os.path.join(src, TEST_DIRS[1]), os.path.join(dst, TEST_DIRS[1]), config.flags)
+    assert not os.path.exists(checkpoint)
+
+    assert get_fd_count() == fd_count
+
+
 def test__copytree_into_itself_simple(directory_for_test, fd_count):
     """ perform a basic copy of a tree into a subdirectory of itself.
     This simulates case where user has mistakenly set homedir to FOO